@@ -4,14 +4,24 @@ AI平台适配器模块
 支持多平台智能体统一接口
 """
 
-from .base_adapter import BaseAIAdapter
-from .dify_adapter import DifyAdapter
-from .coze_adapter import CozeAdapter
-from .n8n_adapter import N8NAdapter
+from .base_adapter import BaseAIAdapter, PassthroughAdapter
 from .adapter_factory import AdapterFactory
 
+# 具体平台适配器按需导入，避免启动时加载全部平台代码
+_LAZY_ADAPTERS = {
+    "DifyAdapter": "dify",
+    "CozeAdapter": "coze",
+    "N8NAdapter": "n8n",
+}
+
+def __getattr__(name):
+    if name in _LAZY_ADAPTERS:
+        return AdapterFactory.get_adapter_class(_LAZY_ADAPTERS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = [
     "BaseAIAdapter",
+    "PassthroughAdapter",
     "DifyAdapter", 
     "CozeAdapter",
     "N8NAdapter",
@@ -3,21 +3,43 @@
 AI平台适配器工厂
 """
 
-from typing import Dict, Any
+import importlib
+from typing import Dict, Any, Iterable, Union
 from .base_adapter import BaseAIAdapter
-from .dify_adapter import DifyAdapter
-from .coze_adapter import CozeAdapter
-from .n8n_adapter import N8NAdapter
 
 class AdapterFactory:
     """AI平台适配器工厂"""
     
-    _adapters = {
-        'dify': DifyAdapter,
-        'coze': CozeAdapter,
-        'n8n': N8NAdapter,
+    # 平台类型 -> 适配器类，或 "模块:类名"（首次使用时才导入）
+    _adapters: Dict[str, Union[type, str]] = {
+        'dify': 'app.adapters.dify_adapter:DifyAdapter',
+        'coze': 'app.adapters.coze_adapter:CozeAdapter',
+        'n8n': 'app.adapters.n8n_adapter:N8NAdapter',
     }
     
+    @classmethod
+    def get_adapter_class(cls, platform_type: str) -> type:
+        """获取适配器类，按需导入并缓存"""
+        if platform_type not in cls._adapters:
+            raise ValueError(f"不支持的AI平台类型: {platform_type}")
+        
+        adapter_class = cls._adapters[platform_type]
+        if isinstance(adapter_class, str):
+            module_name, class_name = adapter_class.split(":")
+            adapter_class = getattr(importlib.import_module(module_name), class_name)
+            cls._adapters[platform_type] = adapter_class
+        return adapter_class
+    
+    @classmethod
+    def preload(cls, platform_types: Iterable[str] = None) -> list:
+        """预先导入适配器（启动预热），返回已加载的平台类型"""
+        loaded = []
+        for platform_type in platform_types or list(cls._adapters):
+            if platform_type in cls._adapters:
+                cls.get_adapter_class(platform_type)
+                loaded.append(platform_type)
+        return loaded
+    
     @classmethod
     def create_adapter(cls, platform_type: str, config: Dict[str, Any]) -> BaseAIAdapter:
         """
@@ -33,10 +55,7 @@ class AdapterFactory:
         Raises:
             ValueError: 不支持的AI平台类型
         """
-        if platform_type not in cls._adapters:
-            raise ValueError(f"不支持的AI平台类型: {platform_type}")
-        
-        adapter_class = cls._adapters[platform_type]
+        adapter_class = cls.get_adapter_class(platform_type)
         adapter = adapter_class(config)
         
         if not adapter.validate_config():
@@ -51,5 +70,5 @@ class AdapterFactory:
     
     @classmethod
     def register_adapter(cls, platform_type: str, adapter_class):
-        """注册新的平台适配器"""
+        """注册新的平台适配器（适配器类或 "模块:类名"）"""
         cls._adapters[platform_type] = adapter_class
\ No newline at end of file
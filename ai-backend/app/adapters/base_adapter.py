@@ -10,11 +10,16 @@ import httpx
 class BaseAIAdapter(ABC):
     """AI平台基础适配器"""
     
+    # 是否支持把上游SSE字节原样转发给客户端（见 PassthroughAdapter）
+    supports_passthrough = False
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.base_url = config.get('base_url', '')
         self.api_key = config.get('api_key', '')
         self.agent_key = config.get('agent_key', '')
+        # 上游返回的平台会话ID（解析响应时记录），下一轮对话通过 conversation_id 传回
+        self.conversation_id = None
     
     @abstractmethod
     def build_request_headers(self) -> Dict[str, str]:
@@ -22,8 +27,8 @@ class BaseAIAdapter(ABC):
         pass
     
     @abstractmethod
-    def build_request_payload(self, message: str, user_id: str, is_stream: bool = True) -> Dict[str, Any]:
-        """构建请求载荷"""
+    def build_request_payload(self, message: str, user_id: str, is_stream: bool = True, **kwargs) -> Dict[str, Any]:
+        """构建请求载荷（kwargs 为平台特有参数，如 conversation_id，不支持的平台忽略）"""
         pass
     
     @abstractmethod
@@ -44,4 +49,19 @@ class BaseAIAdapter(ABC):
     def validate_config(self) -> bool:
         """验证配置是否完整"""
         required_fields = ['base_url', 'api_key', 'agent_key']
-        return all(self.config.get(field) for field in required_fields)
\ No newline at end of file
+        return all(self.config.get(field) for field in required_fields)
+
+
+class PassthroughAdapter(BaseAIAdapter):
+    """支持SSE透传的适配器"""
+    
+    supports_passthrough = True
+    
+    @abstractmethod
+    async def stream_passthrough(self, response: httpx.Response) -> AsyncGenerator[bytes, None]:
+        """
+        透传模式：原样输出上游SSE字节
+
+        实现需在 self.scanner 上提供 answer（回答全文）与 total_tokens（用量），供保存消息使用
+        """
+        pass
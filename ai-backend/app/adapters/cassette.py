@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+上游响应录制与回放（cassette）
+
+录制：RecordingTransport 包装 httpx 传输层，把AI平台返回的原始字节连同到达时间
+写入 gzip 压缩的 cassette 文件，请求头中的密钥、载荷中的敏感字段与URL中的
+webhook 标识会被替换为 ***。
+回放：ReplayTransport 把 cassette 作为 httpx 响应重新输出，可按录制时的节奏（speed=1）
+或不等待（speed=0）回放，适配器的 parse_stream_response 无需任何改动。
+
+cassette 文件格式（gzip 后的 JSON lines）:
+    第一行  {"version": 1, "platform": ..., "url": ..., "status": ..., "headers_ms": ..., ...}
+    之后    [毫秒偏移, "文本"] 或 [毫秒偏移, null, "base64"]（非UTF-8完整片段）
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+CASSETTE_SUFFIX = ".cassette.gz"
+SCRUBBED = "***"
+
+SECRET_HEADERS = {"authorization", "x-api-key", "api-key", "cookie", "set-cookie", "proxy-authorization"}
+SECRET_FIELD = re.compile(r"(key|token|secret|password|authorization)", re.IGNORECASE)
+# webhook 等URL中的随机标识：16位以上且含数字的路径段
+SECRET_PATH_SEGMENT = re.compile(r"^(?=.*\d)[A-Za-z0-9_-]{16,}$")
+PRIVATE_FIELDS = {"user", "user_id"}
+
+
+def _scrub_url(url: httpx.URL) -> str:
+    segments = [SCRUBBED if SECRET_PATH_SEGMENT.match(part) else part for part in url.path.split("/")]
+    return f"{url.scheme}://{url.host}{':' + str(url.port) if url.port else ''}{'/'.join(segments)}"
+
+
+def _scrub_headers(headers: httpx.Headers) -> Dict[str, str]:
+    return {
+        key: SCRUBBED if key.lower() in SECRET_HEADERS else value
+        for key, value in headers.items()
+    }
+
+
+def _scrub_payload(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: SCRUBBED if SECRET_FIELD.search(key) or key in PRIVATE_FIELDS else _scrub_payload(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_scrub_payload(item) for item in value]
+    return value
+
+
+def _secret_values(request: httpx.Request) -> List[bytes]:
+    """请求中的密钥原文，录制响应内容时一并替换（上游偶尔会回显）"""
+    values = []
+    for key, value in request.headers.items():
+        if key.lower() in SECRET_HEADERS:
+            token = value.split(" ", 1)[-1].strip()
+            if len(token) >= 8:
+                values.append(token.encode("utf-8"))
+    return values
+
+
+class Cassette:
+    """一次上游响应的录制内容"""
+
+    def __init__(self, meta: Dict[str, Any], frames: List[Tuple[float, bytes]]):
+        self.meta = meta
+        self.frames = frames
+
+    @property
+    def platform(self) -> str:
+        return self.meta.get("platform", "")
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(len(data) for _, data in self.frames)
+
+    @property
+    def duration_ms(self) -> float:
+        return self.frames[-1][0] if self.frames else 0.0
+
+    def save(self, path: str) -> None:
+        lines = [json.dumps(self.meta, ensure_ascii=False)]
+        for offset, data in self.frames:
+            offset = round(offset, 3)
+            try:
+                lines.append(json.dumps([offset, data.decode("utf-8")], ensure_ascii=False))
+            except UnicodeDecodeError:
+                lines.append(json.dumps([offset, None, base64.b64encode(data).decode("ascii")]))
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            meta = json.loads(f.readline())
+            if meta.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"不支持的 cassette 版本: {meta.get('version')}")
+            frames = []
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                data = item[1].encode("utf-8") if item[1] is not None else base64.b64decode(item[2])
+                frames.append((item[0], data))
+        return cls(meta, frames)
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, cassette: Cassette, path: str,
+                 secrets: List[bytes], started_at: float):
+        self.stream = stream
+        self.cassette = cassette
+        self.path = path
+        self.secrets = secrets
+        self.started_at = started_at
+        self.saved = False
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            data = chunk
+            for secret in self.secrets:
+                data = data.replace(secret, SCRUBBED.encode())
+            self.cassette.frames.append(((time.perf_counter() - self.started_at) * 1000, data))
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self.stream.aclose()
+        if not self.saved:
+            self.saved = True
+            try:
+                self.cassette.save(self.path)
+            except OSError:
+                logger.exception("保存 cassette 失败: %s", self.path)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """透传请求并把响应原始字节录制为 cassette"""
+
+    def __init__(self, directory: str, platform: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.directory = directory
+        self.platform = platform
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        os.makedirs(directory, exist_ok=True)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # 要求上游不压缩，录制到的就是可读、可脱敏的原始字节
+        request.headers["accept-encoding"] = "identity"
+        sent_at = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        headers_at = time.perf_counter()
+
+        try:
+            payload = _scrub_payload(json.loads(request.content)) if request.content else None
+        except ValueError:
+            payload = None
+        meta = {
+            "version": CASSETTE_VERSION,
+            "platform": self.platform,
+            "method": request.method,
+            "url": _scrub_url(request.url),
+            "request_headers": _scrub_headers(request.headers),
+            "request": payload,
+            "status": response.status_code,
+            "headers": _scrub_headers(response.headers),
+            "headers_ms": round((headers_at - sent_at) * 1000, 3),
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        name = f"{self.platform}-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}{CASSETTE_SUFFIX}"
+        stream = _RecordingStream(
+            response.stream, Cassette(meta, []), os.path.join(self.directory, name),
+            _secret_values(request), headers_at
+        )
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=stream,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, speed: float):
+        self.cassette = cassette
+        self.speed = speed
+
+    async def __aiter__(self):
+        started_at = time.perf_counter()
+        for offset, data in self.cassette.frames:
+            if self.speed > 0:
+                delay = offset / 1000 / self.speed - (time.perf_counter() - started_at)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield data
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    按 cassette 回放响应（忽略请求内容）
+    speed=1 按录制节奏，speed=0 不等待（测吞吐），其他值按倍速
+    """
+
+    def __init__(self, cassette: Cassette, speed: float = 1.0):
+        self.cassette = cassette
+        self.speed = speed
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.speed > 0:
+            await asyncio.sleep(self.cassette.meta.get("headers_ms", 0) / 1000 / self.speed)
+        headers = {
+            key: value for key, value in self.cassette.meta.get("headers", {}).items()
+            # 录制时已要求不压缩；长度与分块方式由回放流决定
+            if key.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        }
+        return httpx.Response(
+            status_code=self.cassette.meta.get("status", 200),
+            headers=headers,
+            stream=_ReplayStream(self.cassette, self.speed),
+            request=request,
+        )
+
+
+def recording_transport(platform: str) -> Optional[RecordingTransport]:
+    """CASSETTE_RECORD_DIR 已配置时返回录制传输层，否则返回 None（使用默认传输层）"""
+    from app.core.config import settings
+    if not settings.CASSETTE_RECORD_DIR:
+        return None
+    return RecordingTransport(settings.CASSETTE_RECORD_DIR, platform)
@@ -23,14 +23,16 @@ class CozeAdapter(BaseAIAdapter):
             "Content-Type": "application/json"
         }
     
-    def build_request_payload(self, message: str, user_id: str, is_stream: bool = True) -> Dict[str, Any]:
-        """构建Coze请求载荷"""
+    def build_request_payload(self, message: str, user_id: str, is_stream: bool = True, **kwargs) -> Dict[str, Any]:
+        """构建Coze请求载荷（带上Coze返回的 conversation_id 时在原会话中继续）"""
         payload = {
             "bot_id": self.bot_id,
             "user_id": str(user_id),
             "query": message,
             "stream": is_stream
         }
+        if kwargs.get("conversation_id"):
+            payload["conversation_id"] = kwargs["conversation_id"]
         return payload
     
     def get_request_url(self) -> str:
@@ -50,6 +52,8 @@ class CozeAdapter(BaseAIAdapter):
             
             try:
                 data = json.loads(line)
+                if self.conversation_id is None and isinstance(data, dict):
+                    self.conversation_id = data.get("conversation_id") or None
                 
                 # Coze流式响应格式
                 if 'choices' in data and data['choices']:
@@ -68,6 +72,7 @@ class CozeAdapter(BaseAIAdapter):
             raise Exception(f"Coze API调用失败: {response.status_code}")
         
         response_data = response.json()
+        self.conversation_id = response_data.get("conversation_id") or None
         
         if 'choices' in response_data and response_data['choices']:
             choice = response_data['choices'][0]
@@ -1,67 +1,112 @@
-from typing import AsyncGenerator, Dict, Any, Optional
+#!/usr/bin/env python3
+"""
+Dify平台适配器
+"""
+
 import json
+import httpx
 import logging
-from app.utils.dify_parser import DifyParser
+from typing import Dict, Any, AsyncGenerator, Optional
+from .base_adapter import PassthroughAdapter
+from app.utils.dify_parser import DifyParser, DifySSEScanner
 
 logger = logging.getLogger(__name__)
 
-class DifyAdapter:
-    def __init__(self):
+class DifyAdapter(PassthroughAdapter):
+    """Dify平台适配器（chat-messages 接口）"""
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
         self.parser = DifyParser()
-        self.sent_events_set = set()
-
-    async def parse_stream_response(self, response: AsyncGenerator[bytes, None]) -> AsyncGenerator[Dict[str, Any], None]:
-        """
-        解析Dify流式响应，转换为标准化的事件格式
+        self.scanner = None
+    
+    def build_request_headers(self) -> Dict[str, str]:
+        """构建Dify请求头"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def build_request_payload(self, message: str, user_id: str, is_stream: bool = True, **kwargs) -> Dict[str, Any]:
         """
-        buffer = b""
-        
-        async for chunk in response:
-            if chunk:
-                buffer += chunk
-                parsed_events = self.parser.parse_chunk(buffer)
-                
-                for event in parsed_events:
-                    event_key = f"{event.get('event')}_{event.get('task_id', '')}"
-                    
-                    # 事件去重
-                    if event_key in self.sent_events_set:
-                        continue
-                    
-                    self.sent_events_set.add(event_key)
-                    
-                    # 标准化事件格式
-                    standardized_event = self._standardize_event(event)
-                    if standardized_event:
-                        yield standardized_event
+        构建Dify请求载荷
         
-        # 发送DONE事件表示流结束
-        yield {
-            "event": "DONE",
-            "data": {"message": "Stream completed"}
+        conversation_id 必须是Dify返回的会话ID（本地会话ID不能直接使用），
+        为空时开启新对话，上下文由Dify在服务端保存
+        """
+        return {
+            "inputs": {},
+            "query": message,
+            "response_mode": "streaming" if is_stream else "blocking",
+            "conversation_id": kwargs.get("conversation_id") or "",
+            "user": str(user_id)
         }
+    
+    def get_request_url(self) -> str:
+        """获取Dify请求URL"""
+        return f"{self.base_url.rstrip('/')}/chat-messages"
+    
+    async def parse_stream_response(self, response: httpx.Response) -> AsyncGenerator[str, None]:
+        """解析Dify流式响应（SSE），输出回答文本片段"""
+        if response.status_code != 200:
+            yield json.dumps({"error": f"Dify API调用失败: {response.status_code}"})
+            return
+        
+        async for chunk in response.aiter_bytes():
+            for event in self.parser.parse_chunk(chunk):
+                if self.conversation_id is None:
+                    self.conversation_id = self._event_conversation_id(event)
+                text = self._event_text(event)
+                if text:
+                    yield text
+    
+    async def stream_passthrough(self, response: httpx.Response) -> AsyncGenerator[bytes, None]:
+        """透传Dify的SSE字节（客户端直接消费Dify事件格式），旁路扫描回答文本、用量与会话ID"""
+        self.scanner = DifySSEScanner()
+        async for chunk in response.aiter_bytes():
+            self.scanner.feed(chunk)
+            if self.conversation_id is None:
+                self.conversation_id = self.scanner.conversation_id
+            yield chunk
+    
+    def _event_text(self, event: Dict[str, Any]) -> Optional[str]:
+        """从Dify事件中取出回答文本"""
+        if event.get("event") == "DONE":
+            return None
+        if "answer" in event:
+            return event.get("answer")
+        data = event.get("data")
+        if isinstance(data, dict):
+            return data.get("text")
+        return None
+    
+    def _event_conversation_id(self, event: Dict[str, Any]) -> Optional[str]:
+        """
+        从Dify事件中取出会话ID
 
-    def _standardize_event(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """标准化Dify事件格式"""
-        event_type = event.get("event")
+        解析器转换过的 message 事件放在 data.id；原始的 node_started / workflow_finished 等事件中
+        data.id 是节点或工作流运行ID，不能当作会话ID
+        """
+        if event.get("conversation_id"):
+            return event["conversation_id"]
+        data = event.get("data")
+        if event.get("event") == "message" and isinstance(data, dict) and "text" in data and data.get("id"):
+            return data["id"]
+        return None
+    
+    async def parse_blocking_response(self, response: httpx.Response) -> str:
+        """解析Dify非流式响应"""
+        if response.status_code != 200:
+            raise Exception(f"Dify API调用失败: {response.status_code}")
         
-        if event_type == "workflow_finished":
-            return {
-                "event": "workflow_finished",
-                "data": event.get("data", {})
-            }
-        elif event_type == "node_started":
-            return {
-                "event": "node_started",
-                "data": event.get("data", {})
-            }
-        elif event_type == "message":
-            return {
-                "event": "message",
-                "data": {
-                    "content": event.get("data", {}).get("text", ""),
-                    "message_id": event.get("data", {}).get("id")
-                }
-            }
+        response_data = response.json()
+        self.conversation_id = response_data.get("conversation_id") or None
+        if "answer" in response_data:
+            return response_data["answer"]
         
-        return None
\ No newline at end of file
+        raise Exception("无法解析Dify响应格式")
+    
+    def validate_config(self) -> bool:
+        """验证Dify配置是否完整"""
+        required_fields = ['base_url', 'api_key']
+        return all(self.config.get(field) for field in required_fields)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+AI平台共享 HTTP 客户端
+
+每个进程复用一个 httpx.AsyncClient，连接在请求之间保持（keep-alive），
+避免每次对话都重新进行 TCP/TLS 握手。启用录制（CASSETTE_RECORD_DIR）时
+每个平台使用单独的录制客户端。
+"""
+
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from .cassette import recording_transport
+
+logger = logging.getLogger(__name__)
+
+# 与 ChatService 中单次请求的超时一致，请求可单独覆盖
+DEFAULT_TIMEOUT = httpx.Timeout(30.0)
+POOL_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=60.0)
+
+_client: Optional[httpx.AsyncClient] = None
+_recording_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_client(platform: str = "") -> httpx.AsyncClient:
+    """获取共享客户端（不要在 async with 中使用，生命周期由应用管理）"""
+    global _client
+    client = _recording_clients.get(platform)
+    if client is not None:
+        return client
+    # 只在未缓存时创建录制传输层（会新建 SSL 上下文与录制目录）
+    transport = recording_transport(platform)
+    if transport is not None:
+        client = httpx.AsyncClient(transport=transport, timeout=DEFAULT_TIMEOUT)
+        _recording_clients[platform] = client
+        return client
+
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT, limits=POOL_LIMITS)
+    return _client
+
+
+async def warm_up(urls: Iterable[str], timeout: float = 3.0) -> int:
+    """
+    预先与各平台建立连接，返回成功连通的主机数
+
+    只发送 HEAD 请求到主机根路径，状态码不重要，目的是让连接进入连接池
+    """
+    origins = set()
+    for url in urls:
+        if not url:
+            continue
+        parts = urlsplit(url)
+        if parts.scheme in ("http", "https") and parts.netloc:
+            origins.add(f"{parts.scheme}://{parts.netloc}/")
+
+    client = get_client()
+
+    async def touch(origin: str) -> bool:
+        try:
+            await client.head(origin, timeout=timeout)
+            return True
+        except httpx.HTTPError as e:
+            logger.info("预热连接 %s 失败: %s", origin, e)
+            return False
+
+    results = await asyncio.gather(*(touch(origin) for origin in origins))
+    return sum(results)
+
+
+async def close_clients() -> None:
+    """关闭全部客户端（应用退出时调用）"""
+    global _client
+    clients = list(_recording_clients.values())
+    if _client is not None:
+        clients.append(_client)
+    _client = None
+    _recording_clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -20,7 +20,7 @@ class N8NAdapter(BaseAIAdapter):
             "Content-Type": "application/json"
         }
     
-    def build_request_payload(self, message: str, user_id: str, is_stream: bool = True) -> Dict[str, Any]:
+    def build_request_payload(self, message: str, user_id: str, is_stream: bool = True, **kwargs) -> Dict[str, Any]:
         """构建n8n请求载荷"""
         return {
             "message": message,
@@ -0,0 +1,17 @@
+from typing import Optional
+from fastapi import APIRouter, Depends
+from app.core.dependencies import require_admin_token
+from app.core.drain import drain_controller
+
+router = APIRouter(prefix="/admin", tags=["运维管理"], dependencies=[Depends(require_admin_token)])
+
+@router.post("/drain")
+async def start_drain(timeout: Optional[float] = None):
+    """进入排空模式：停止接收新对话，等待进行中的对话结束（不会退出进程）"""
+    drain_controller.start("admin", timeout)
+    return {"code": 200, "msg": "已进入排空模式", "data": drain_controller.progress()}
+
+@router.get("/drain")
+async def get_drain_progress():
+    """排空进度"""
+    return {"code": 200, "msg": "获取成功", "data": drain_controller.progress()}
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.services.auth_service import AuthService
 from app.schemas.auth import LoginDTO, RegisterDTO, EmailCodeDTO, BaseResponse
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, security
 from app.models.user import SysUser
 
 router = APIRouter(prefix="/auth", tags=["认证管理"])
@@ -40,6 +41,11 @@ async def get_user_info(current_user: SysUser = Depends(get_current_user)):
     return BaseResponse(code=200, msg="获取成功", data=user_info)
 
 @router.post("/logout", response_model=BaseResponse)
-async def logout(current_user: SysUser = Depends(get_current_user)):
-    """用户登出"""
-    return BaseResponse(code=200, msg="登出成功", data=None)
\ No newline at end of file
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: SysUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """用户登出（吊销当前令牌）"""
+    auth_service = AuthService(db)
+    return auth_service.logout(credentials.credentials, current_user)
\ No newline at end of file
@@ -1,17 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from fastapi.responses import StreamingResponse
-from app.db.database import get_db
+from fastapi.responses import Response, StreamingResponse
+from app.db.database import SessionLocal, get_db
+from app.adapters import AdapterFactory
 from app.services.chat_service import ChatService
-from app.schemas.chat import SendDTO, GetChatListParams
+from app.services.chat_mux import ChatStreamMux, receive_auth_token
+from app.services.batch_service import BatchRunner
+from app.services.job_service import callback_allowed, create_job, job_executor, job_to_dict
+from app.core.config import settings
+from app.models.chat import ChatJob
+from datetime import datetime
+from app.services.export_service import (
+    IMPORT_FORMAT_ERRORS, ImportInterrupted, export_user_history, import_user_history
+)
+from app.services.search_service import SEARCH_DEFAULT_LIMIT
+from app.services.write_behind import flush_pending
+from pydantic import TypeAdapter
+from app.schemas.chat import (
+    SendDTO, BatchSendDTO, JobSubmitDTO, GetChatListParams, CHAT_MESSAGE_LIST_JSON, CHAT_SESSION_LIST_JSON
+)
 from app.schemas.auth import BaseResponse
 from app.core.dependencies import get_current_user
+from app.core.security import SecurityManager
+from app.core.metrics import CHAT_ACTIVE_STREAMS
+from app.core.drain import drain_controller
 from app.models.user import SysUser
 from typing import Optional
 import json
 
 router = APIRouter(prefix="/chat", tags=["聊天管理"])
 
+def list_response(result: BaseResponse, adapter: TypeAdapter) -> Response:
+    """用预编译的 TypeAdapter 把列表结果直接编码为 JSON 字节（输出与默认的 JSONResponse 相同）"""
+    body = {"code": result.code, "data": result.data, "msg": result.msg, "rows": None}
+    return Response(adapter.dump_json(body), media_type="application/json")
+
 @router.post("/send")
 async def send_message(
     send_dto: SendDTO, 
@@ -19,23 +43,36 @@ async def send_message(
     current_user: SysUser = Depends(get_current_user)
 ):
     """发送消息到AI平台（需要认证）"""
+    # 排空期间不再接收新对话，返回503让负载均衡重试其他实例
+    if not drain_controller.admit():
+        return drain_controller.rejection()
+    
     chat_service = ChatService(db)
     
     # 如果stream=false，返回普通JSON响应
     if not send_dto.stream:
         content = ""
-        async for chunk in chat_service.send_message(send_dto, current_user.user_id):
-            try:
-                data = json.loads(chunk)
-                content = data.get("content", "")
-            except:
-                content = chunk
+        with drain_controller.track(current_user.user_id, stream=False):
+            async for chunk in chat_service.send_message(send_dto, current_user.user_id):
+                try:
+                    data = json.loads(chunk)
+                    content = data.get("content", "")
+                except:
+                    content = chunk
         return {"code": 200, "msg": "成功", "data": {"content": content}}
     
     # 如果stream=true，返回SSE流
     async def generate():
-        async for chunk in chat_service.send_message(send_dto, current_user.user_id):
-            yield f"data: {chunk}\n\n"
+        CHAT_ACTIVE_STREAMS.inc()
+        try:
+            with drain_controller.track(current_user.user_id) as handle:
+                async for chunk in chat_service.send_message(
+                    send_dto, current_user.user_id, handle, allow_passthrough=True
+                ):
+                    # 透传模式下为上游原始SSE字节，已是完整的 data 帧
+                    yield chunk if isinstance(chunk, bytes) else f"data: {chunk}\n\n"
+        finally:
+            CHAT_ACTIVE_STREAMS.dec()
     
     return StreamingResponse(
         generate(), 
@@ -50,6 +87,115 @@ async def send_message(
         }
     )
 
+@router.post("/batch")
+async def send_batch(
+    batch_dto: BatchSendDTO,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_user)
+):
+    """批量发送提示到同一智能体，按完成顺序以NDJSON流式返回结果（需要认证）"""
+    if not drain_controller.admit():
+        return drain_controller.rejection()
+    
+    if not batch_dto.prompts or len(batch_dto.prompts) > settings.BATCH_MAX_PROMPTS:
+        return {"code": 400, "msg": f"提示条数需在 1 ~ {settings.BATCH_MAX_PROMPTS} 之间", "data": None}
+    concurrency = batch_dto.concurrency or settings.BATCH_DEFAULT_CONCURRENCY
+    concurrency = max(1, min(concurrency, settings.BATCH_MAX_CONCURRENCY))
+    
+    try:
+        agent_id = int(batch_dto.agent_id)
+    except (ValueError, TypeError):
+        return {"code": 400, "msg": "智能体ID格式无效", "data": None}
+    agent_config = ChatService(db).get_active_agent(agent_id)
+    if not agent_config:
+        return {"code": 500, "msg": "智能体配置不存在", "data": None}
+    
+    try:
+        runner = BatchRunner(agent_config, current_user.user_id, f"u:{current_user.user_name}")
+    except ValueError as e:
+        return {"code": 500, "msg": str(e), "data": None}
+    user_id = current_user.user_id
+    
+    session_id = None
+    if batch_dto.persist:
+        session_id = ChatService(db).create_session(
+            user_id, runner.agent_id, f"批量任务 {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        )
+        db.commit()
+    # 批量执行期间不占用数据库连接（保存时按需重新获取）
+    db.close()
+    
+    async def generate():
+        with drain_controller.track(user_id, stream=False) as handle:
+            async for line in runner.run(batch_dto.prompts, concurrency, handle, db, session_id):
+                yield line
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/jobs")
+async def submit_job(
+    job_dto: JobSubmitDTO,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_user)
+):
+    """提交异步对话任务，立即返回任务ID，结果通过 /chat/jobs/{job_id} 查询或回调（需要认证）"""
+    if not drain_controller.admit():
+        return drain_controller.rejection()
+    
+    try:
+        agent_id = int(job_dto.agent_id)
+    except (ValueError, TypeError):
+        return {"code": 400, "msg": "智能体ID格式无效", "data": None}
+    if not ChatService(db).get_active_agent(agent_id):
+        return {"code": 500, "msg": "智能体配置不存在", "data": None}
+    if job_dto.callback_url and not callback_allowed(job_dto.callback_url):
+        return {"code": 400, "msg": "回调地址不在允许的主机列表中", "data": None}
+    
+    job = create_job(db, job_dto, current_user.user_id, agent_id)
+    job_executor.submit(job.id)
+    return {"code": 200, "msg": "提交成功", "data": {"jobId": job.id, "status": job.status}}
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_user)
+):
+    """查询异步对话任务状态与结果（需要认证）"""
+    job = db.get(ChatJob, job_id)
+    if job is None or job.user_id != current_user.user_id:
+        return {"code": 500, "msg": "任务不存在", "data": None}
+    return {"code": 200, "msg": "获取成功", "data": job_to_dict(job)}
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    多路复用的聊天WebSocket（需要认证，第一个帧发送 ["auth", "<JWT>"]）
+
+    令牌不放在 URL 查询参数中，避免被反向代理与访问日志记录；
+    一个连接可同时进行多个对话流，协议见 app.services.chat_mux
+    """
+    if drain_controller.draining:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    token = await receive_auth_token(websocket)
+    user = None
+    if token:
+        db = SessionLocal()
+        try:
+            user = SecurityManager.get_current_user(db, token)
+        except HTTPException:
+            pass
+        finally:
+            db.close()
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await ChatStreamMux(websocket, user.user_id, user.user_name).serve()
+
 @router.get("/list")
 async def get_chat_list(
     sessionId: Optional[str] = None,
@@ -57,10 +203,12 @@ async def get_chat_list(
     role: Optional[str] = None,
     pageNum: int = 1,
     pageSize: int = 10,
+    fields: Optional[str] = None,
+    previewLength: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: SysUser = Depends(get_current_user)
 ):
-    """获取聊天记录列表（需要认证）"""
+    """获取聊天记录列表（需要认证）；fields 指定返回字段（逗号分隔），previewLength 截断内容"""
     chat_service = ChatService(db)
     params = GetChatListParams(
         sessionId=sessionId,
@@ -69,7 +217,12 @@ async def get_chat_list(
         pageNum=pageNum,
         pageSize=pageSize
     )
-    return chat_service.get_chat_list(params, current_user.user_id)
+    await flush_pending(current_user.user_id)
+    result = chat_service.get_chat_list(params, current_user.user_id, fields, previewLength)
+    # 指定返回字段或截断时列表项的键不固定，按通用方式序列化
+    if fields or previewLength or result.code != 200:
+        return result
+    return list_response(result, CHAT_MESSAGE_LIST_JSON)
 
 @router.get("/sessions")
 async def get_sessions(
@@ -78,7 +231,21 @@ async def get_sessions(
 ):
     """获取用户会话列表（需要认证）"""
     chat_service = ChatService(db)
-    return chat_service.get_sessions(current_user.user_id)
+    await flush_pending(current_user.user_id)
+    return list_response(chat_service.get_sessions(current_user.user_id), CHAT_SESSION_LIST_JSON)
+
+@router.get("/search")
+async def search_messages(
+    q: str,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_user)
+):
+    """按语义相似度搜索当前用户的聊天记录（需要认证）"""
+    # 建索引与向量检索为 CPU 密集操作，放到线程池中执行
+    return await run_in_threadpool(
+        ChatService(db).search_messages, current_user.user_id, q, limit
+    )
 
 @router.delete("/session/{session_id}")
 async def delete_session(
@@ -88,6 +255,7 @@ async def delete_session(
 ):
     """删除会话（需要认证）"""
     chat_service = ChatService(db)
+    await flush_pending(current_user.user_id)
     return chat_service.delete_session(session_id, current_user.user_id)
 
 @router.get("/agents")
@@ -108,8 +276,45 @@ async def get_agents(
                 "agentName": agent.agent_name,
                 "platformType": agent.platform_type,
                 "description": agent.description,
-                "isDefault": agent.is_default
+                "isDefault": agent.is_default,
+                # 为 true 时 /chat/send 的流式响应为平台原始事件格式
+                "streamPassthrough": bool(agent.stream_passthrough and agent.is_stream) and (
+                    agent.platform_type in AdapterFactory.get_supported_platforms()
+                    and AdapterFactory.get_adapter_class(agent.platform_type).supports_passthrough
+                )
             }
             for agent in agents
         ]
     }
+
+@router.get("/export")
+async def export_history(
+    gzip: bool = False,
+    current_user: SysUser = Depends(get_current_user)
+):
+    """流式导出当前用户的全部会话与消息（NDJSON，可选gzip）（需要认证）"""
+    filename = f"chat-export-{current_user.user_id}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_user_history(current_user.user_id, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/import")
+async def import_history(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_user)
+):
+    """导入 /chat/export 导出的文件到当前用户（会话重新分配ID）（需要认证）"""
+    try:
+        result = await run_in_threadpool(
+            import_user_history, db, current_user.user_id, file.file
+        )
+    except IMPORT_FORMAT_ERRORS as e:
+        # 校验阶段发现，未写入任何数据
+        return {"code": 500, "msg": f"导入失败: 文件格式错误 {str(e)}", "data": None}
+    except ImportInterrupted as e:
+        # data 为已提交部分；重新上传整个文件会重复导入这部分会话
+        return {"code": 500, "msg": f"导入中断: {str(e.error)}，已导入部分见 data", "data": e.result}
+    return {"code": 200, "msg": "导入成功", "data": result}
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from app.core.drain import drain_controller
+
+router = APIRouter(prefix="/health", tags=["健康检查"])
+
+@router.get("")
+async def liveness():
+    """存活检查：进程能够处理请求即返回200"""
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def readiness(request: Request):
+    """就绪检查：启动预热完成前与排空期间返回503，负载均衡不应转发流量"""
+    if drain_controller.draining:
+        return JSONResponse(status_code=503, content={"status": "draining"})
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "warmup": request.app.state.warmup}
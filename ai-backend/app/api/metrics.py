@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.core.dependencies import require_admin_token
+from app.core.metrics import registry
+
+router = APIRouter(tags=["运行指标"])
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_admin_token)])
+async def get_metrics():
+    """Prometheus 抓取接口（文本格式 0.0.4，需要管理令牌）"""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,40 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.db.database import get_db
+from app.services.stats_service import StatsService
+from app.schemas.auth import BaseResponse
+from app.core.dependencies import get_current_user, require_admin_token
+from app.models.user import SysUser
+
+router = APIRouter(prefix="/stats", tags=["统计分析"])
+
+@router.get("/user", response_model=BaseResponse)
+async def get_user_stats(
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_user)
+):
+    """获取当前用户的聊天统计（需要认证）"""
+    stats_service = StatsService(db)
+    return stats_service.get_user_stats(current_user.user_id)
+
+# 智能体与每日统计为全平台汇总，只对运维开放（请求头 X-Admin-Token）
+
+@router.get("/agent/{agent_id}", response_model=BaseResponse, dependencies=[Depends(require_admin_token)])
+async def get_agent_stats(
+    agent_id: int,
+    db: Session = Depends(get_db)
+):
+    """获取智能体的聊天统计（需要管理令牌）"""
+    stats_service = StatsService(db)
+    return stats_service.get_agent_stats(agent_id)
+
+@router.get("/daily", response_model=BaseResponse, dependencies=[Depends(require_admin_token)])
+async def get_daily_stats(
+    day: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """获取某天的聊天统计，默认当天（需要管理令牌）"""
+    stats_service = StatsService(db)
+    return stats_service.get_daily_stats(day or date.today())
@@ -2,8 +2,11 @@ from datetime import datetime
 from typing import List, Optional, Any
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.db.database import get_db
 from app.services.chat_service import ChatService
+from app.services.sync_service import SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT, get_changes, wait_for_changes
+from app.services.write_behind import flush_pending
 from app.schemas.auth import BaseResponse
 from app.core.dependencies import get_current_user
 from app.models.user import SysUser
@@ -20,6 +23,7 @@ async def get_session_list(
 ):
     """获取用户会话列表（需要认证）"""
     chat_service = ChatService(db)
+    await flush_pending(current_user.user_id)
     result = chat_service.get_sessions(current_user.user_id)
     
     # 模拟分页处理（因为原get_sessions返回所有数据）
@@ -194,6 +198,7 @@ async def delete_session(
     try:
         # 处理多个ID
         id_list = ids.split(',')
+        await flush_pending(current_user.user_id)
         
         for session_id in id_list:
             try:
@@ -225,10 +230,12 @@ async def get_message_list(
     pageSize: int = 10,
     content: str = None,
     role: str = None,
+    fields: Optional[str] = None,
+    previewLength: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: SysUser = Depends(get_current_user)
 ):
-    """获取聊天记录列表（需要认证）"""
+    """获取聊天记录列表（需要认证）；fields 指定返回字段（逗号分隔），previewLength 截断内容"""
     try:
         chat_service = ChatService(db)
         
@@ -242,7 +249,8 @@ async def get_message_list(
                 self.role = role
         
         params = GetChatListParams(sessionId, pageNum, pageSize, content, role)
-        result = chat_service.get_chat_list(params, current_user.user_id)
+        await flush_pending(current_user.user_id)
+        result = chat_service.get_chat_list(params, current_user.user_id, fields, previewLength)
         
         return result
     except Exception as e:
@@ -250,4 +258,43 @@ async def get_message_list(
             "code": 500,
             "msg": f"获取失败: {str(e)}",
             "data": None
-        }
\ No newline at end of file
+        }
+
+@router.get("/sync")
+async def sync_changes(
+    since: int = 0,
+    wait: float = 0,
+    limit: int = SYNC_DEFAULT_LIMIT,
+    db: Session = Depends(get_db),
+    current_user: SysUser = Depends(get_current_user)
+):
+    """
+    增量同步（需要认证）
+
+    返回水位 since 之后变更的会话、消息与已删除会话ID，下次以返回的 next 作为 since；
+    wait>0 时若没有变更则最多等待 wait 秒（上限 SYNC_MAX_WAIT），有变更立即返回
+    """
+    if since < 0:
+        return {"code": 400, "msg": "since 不能为负数", "data": None}
+    if limit < 1 or limit > SYNC_MAX_LIMIT:
+        return {"code": 400, "msg": f"limit 取值范围为 1~{SYNC_MAX_LIMIT}", "data": None}
+    user_id = current_user.user_id
+    
+    try:
+        # 读己之写：该用户还有未落库的消息时先刷入数据库
+        await flush_pending(user_id)
+        
+        data = get_changes(db, user_id, since, limit)
+        if wait > 0 and data["next"] == since and not data["reset"]:
+            # 等待期间不占用数据库连接
+            db.close()
+            if await wait_for_changes(user_id, since, min(wait, settings.SYNC_MAX_WAIT)):
+                data = get_changes(db, user_id, since, limit)
+        
+        return {"code": 200, "msg": "获取成功", "data": data}
+    except Exception as e:
+        return {
+            "code": 500,
+            "msg": f"同步失败: {str(e)}",
+            "data": None
+        }
@@ -0,0 +1,130 @@
+"""
+响应压缩中间件
+
+只压缩一次性发送的完整响应体（JSON 列表、历史记录等），按请求的 Accept-Encoding
+优先使用 brotli（安装 brotli 包时），否则 gzip。
+流式响应（SSE、NDJSON、导出文件）原样透传：逐块压缩需要缓冲，会推迟 token 到达客户端。
+"""
+
+import gzip
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小于该字节数的响应压缩收益不明显
+MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# 流式或已压缩的类型不处理
+EXCLUDED_TYPES = (
+    b"text/event-stream",
+    b"application/x-ndjson",
+    b"application/gzip",
+    b"application/zip",
+    b"image/",
+    b"audio/",
+    b"video/",
+)
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """按 Accept-Encoding 选择编码（忽略 q=0）"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for key, value in scope.get("headers", ()):
+            if key == b"accept-encoding":
+                encoding = _choose_encoding(value.decode("latin-1"))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers: List[Tuple[bytes, bytes]] = message.get("headers", [])
+                for key, value in headers:
+                    key = key.lower()
+                    if key == b"content-encoding" or (
+                        key == b"content-type" and value.lower().startswith(EXCLUDED_TYPES)
+                    ):
+                        passthrough = True
+                        break
+                if passthrough:
+                    await send(message)
+                else:
+                    # 等第一块 body 确认是否为完整响应后再发送响应头
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            if start_message is not None:
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                start, start_message = start_message, None
+                if more_body or len(body) < self.minimum_size:
+                    # 流式或过小的响应不压缩
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                compressed = _compress(body, encoding)
+                headers = []
+                vary = [b"Accept-Encoding"]
+                for key, value in start.get("headers", []):
+                    lower = key.lower()
+                    if lower == b"vary":
+                        vary.insert(0, value)
+                    elif lower != b"content-length":
+                        headers.append((key, value))
+                headers += [
+                    (b"content-encoding", encoding.encode("latin-1")),
+                    (b"content-length", str(len(compressed)).encode("latin-1")),
+                    (b"vary", b", ".join(vary)),
+                ]
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
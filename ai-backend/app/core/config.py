@@ -11,6 +11,12 @@ class Settings(BaseSettings):
         default="sqlite:///./app.db",
         description="Database connection URL"
     )
+    DB_HOST: str = Field(default="localhost", description="MySQL主机")
+    DB_PORT: int = Field(default=3306, description="MySQL端口")
+    DB_USER: str = Field(default="root", description="MySQL用户")
+    DB_PASSWORD: str = Field(default="", description="MySQL密码")
+    DB_NAME: str = Field(default="ai_chat", description="MySQL数据库名")
+    DB_CHARSET: str = Field(default="utf8mb4", description="MySQL字符集")
     
     # Redis配置
     REDIS_URL: str = Field(
@@ -27,8 +33,185 @@ class Settings(BaseSettings):
         default="https://api.dify.ai/v1",
         description="Dify API base URL"
     )
-    
+
+    # 消息异步批量落库（write-behind）配置
+    WRITE_BEHIND_ENABLED: bool = Field(
+        default=True,
+        description="是否启用消息异步批量落库"
+    )
+    WRITE_BEHIND_FLUSH_INTERVAL: float = Field(
+        default=0.2,
+        description="批量落库刷新间隔（秒）"
+    )
+    WRITE_BEHIND_MAX_BATCH: int = Field(
+        default=500,
+        description="单次批量INSERT的最大行数"
+    )
+    WRITE_BEHIND_JOURNAL_PATH: str = Field(
+        default="./data/write_behind.journal",
+        description="待落库消息的本地追加日志路径"
+    )
+
+    # 消息内容压缩配置
+    MESSAGE_COMPRESS_THRESHOLD: int = Field(
+        default=4096,
+        description="消息内容超过该字节数时压缩存储（内容搜索时压缩消息需逐条解压匹配）"
+    )
+    MESSAGE_COMPRESS_CODEC: str = Field(
+        default="auto",
+        description="消息压缩算法：auto（优先zstd）、zstd、zlib"
+    )
+    MESSAGE_COMPRESSED_SEARCH_MAX_SCAN: int = Field(
+        default=5000,
+        description="内容搜索时每次最多解压匹配的压缩消息数（从最新的消息往前扫描）"
+    )
+
+    # 冷数据归档配置
+    ARCHIVE_DIR: str = Field(
+        default="./data/archive",
+        description="归档段文件目录"
+    )
+    ARCHIVE_AFTER_DAYS: int = Field(
+        default=90,
+        description="会话最后一条消息超过多少天后归档"
+    )
+    ARCHIVE_CODEC: str = Field(
+        default="auto",
+        description="归档压缩算法：auto（优先zstd）、zstd、gzip"
+    )
+    ARCHIVE_SEGMENT_MAX_BYTES: int = Field(
+        default=256 * 1024 * 1024,
+        description="单个归档段文件的最大字节数，超过后切换新段"
+    )
+    ARCHIVE_COMPACT_MIN_GARBAGE: float = Field(
+        default=0.5,
+        description="段文件中不再被引用的字节占比达到该值时合并（复制仍被引用的帧后删除旧段）"
+    )
+
+    # 上游响应录制（压测样本采集）
+    CASSETTE_RECORD_DIR: str = Field(
+        default="",
+        description="录制AI平台原始响应的目录，为空则不录制；录制文件供回放基准测试使用"
+    )
+
+    # 请求链路追踪配置
+    TRACE_SAMPLE_RATE: float = Field(
+        default=0.01,
+        description="请求追踪采样率（0~1）"
+    )
+    TRACE_TRUST_INBOUND_SAMPLED: bool = Field(
+        default=False,
+        description="是否信任请求头 traceparent 中的采样标记（仅在网关会清理外部请求的 traceparent 时开启）"
+    )
+    TRACE_EXPORT_PATH: str = Field(
+        default="./data/traces.jsonl",
+        description="追踪数据输出文件（JSON lines，每行一个span），为空则不输出"
+    )
+    TRACE_EXPORT_MAX_BYTES: int = Field(
+        default=100 * 1024 * 1024,
+        description="追踪数据文件大小上限，超过后轮转为 .1 文件（只保留一份），0 表示不限制"
+    )
+    TRACE_PROPAGATE_HOSTS: str = Field(
+        default="",
+        description="调用时附带 traceparent 的上游主机（逗号分隔，如自建 Dify），为空则不向任何上游传递"
+    )
+
+    # 批量对话配置
+    BATCH_DEFAULT_CONCURRENCY: int = Field(
+        default=8,
+        description="批量对话默认并发数"
+    )
+    BATCH_MAX_CONCURRENCY: int = Field(
+        default=32,
+        description="批量对话并发数上限"
+    )
+    BATCH_MAX_PROMPTS: int = Field(
+        default=10000,
+        description="单次批量对话的最大条数"
+    )
+
+    # 异步对话任务配置
+    JOB_BACKEND: str = Field(
+        default="inprocess",
+        description="异步任务执行方式：inprocess（应用进程内执行）或 celery（需单独启动 celery worker）"
+    )
+    JOB_CONCURRENCY: int = Field(
+        default=8,
+        description="进程内同时执行的异步任务数"
+    )
+    JOB_CALLBACK_ALLOWED_HOSTS: str = Field(
+        default="",
+        description="允许的任务回调主机（逗号分隔），为空则不支持回调"
+    )
+    JOB_CALLBACK_SECRET: str = Field(
+        default="",
+        description="回调请求签名密钥（X-Job-Signature: sha256=HMAC），为空则不签名"
+    )
+
+    # 增量同步配置
+    SYNC_MAX_WAIT: float = Field(
+        default=25.0,
+        description="增量同步长轮询的最长等待秒数（应小于反向代理的读超时）"
+    )
+    SYNC_POLL_INTERVAL: float = Field(
+        default=1.0,
+        description="长轮询期间检查其他进程写入的间隔（秒）；本进程内的写入会立即唤醒"
+    )
+
+    # 限流配置
+    RATE_LIMIT_ENABLED: bool = Field(
+        default=True,
+        description="是否启用请求限流"
+    )
+    RATE_LIMIT_BACKEND: str = Field(
+        default="memory",
+        description="限流计数后端：memory（每个进程单独计数）或 redis（多 worker 共享，使用 REDIS_URL）"
+    )
+    RATE_LIMITS: str = Field(
+        default="",
+        description="覆盖默认限流策略，格式 名称=容量/秒数，逗号分隔，如 chat=60/60,login=20/60"
+    )
+    RATE_LIMIT_TRUST_FORWARDED: bool = Field(
+        default=False,
+        description="按 X-Forwarded-For 识别客户端IP（仅在可信反向代理之后开启）"
+    )
+
+    # 令牌吊销配置
+    REVOCATION_SYNC_INTERVAL: float = Field(
+        default=1.0,
+        description="从数据库拉取其他进程吊销的令牌的间隔（秒），即登出在其他 worker 上生效的最大延迟"
+    )
+
+    # 语义搜索配置
+    SEARCH_ENABLED: bool = Field(
+        default=True,
+        description="是否启用聊天记录语义搜索（需要安装 numpy）"
+    )
+    SEARCH_INDEX_DIR: str = Field(
+        default="./data/search",
+        description="向量索引目录，每个用户一个子目录；多个 worker 须共享同一目录"
+    )
+    SEARCH_EMBEDDER: str = Field(
+        default="hashing",
+        description="文本向量化方式：hashing（特征哈希，无模型）或 模块:工厂函数；修改后索引自动重建"
+    )
+    SEARCH_DIM: int = Field(
+        default=256,
+        description="hashing 嵌入器的向量维度，每条消息占用 4×维度 字节"
+    )
+
+    # 排空（优雅下线）配置
+    DRAIN_TIMEOUT: float = Field(
+        default=30.0,
+        description="排空时等待进行中对话结束的最长秒数，超时后中断并保存已生成内容"
+    )
+    ADMIN_TOKEN: str = Field(
+        default="",
+        description="运维管理接口（/admin、/stats/agent、/stats/daily、/metrics）的访问令牌，请求头 X-Admin-Token；为空则禁用这些接口"
+    )
+
     class Config:
         env_file = ".env"
+        extra = "ignore"
 
 settings = Settings()
\ No newline at end of file
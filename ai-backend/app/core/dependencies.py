@@ -2,12 +2,15 @@
 FastAPI依赖项
 """
 
-from fastapi import Depends, HTTPException, status
+import hmac
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.db.database import get_db
+from app.core.config import settings
 from app.core.security import SecurityManager
 from app.models.user import SysUser
+from app.core import tracing
 
 # JWT认证方案
 security = HTTPBearer()
@@ -18,7 +21,8 @@ async def get_current_user(
 ) -> SysUser:
     """获取当前认证用户"""
     token = credentials.credentials
-    return SecurityManager.get_current_user(db, token)
+    with tracing.span("auth.get_current_user"):
+        return SecurityManager.get_current_user(db, token)
 
 async def get_current_user_optional(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -31,6 +35,13 @@ async def get_current_user_optional(
     except HTTPException:
         return None
 
+async def require_admin_token(x_admin_token: str = Header(default="")) -> None:
+    """运维管理接口校验（请求头 X-Admin-Token 与 ADMIN_TOKEN 一致）"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="管理令牌无效")
+
 def get_db_session():
     """获取数据库会话"""
     return next(get_db())
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+排空模式：发布或回收实例前让进行中的对话流结束
+
+进入排空（SIGTERM 或管理接口触发）后：
+    1. /chat/send 不再接受新请求，返回 503 + Retry-After，/health/ready 返回 503
+    2. 进行中的生成继续直到结束，最多等待 DRAIN_TIMEOUT 秒
+    3. 截止时仍未结束的流被中断，已生成的部分内容照常保存
+排空进度可通过 GET /admin/drain 查看，并定期写入日志。
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Set, TypeVar
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 被拒绝的请求建议多久后重试（负载均衡会转发到其他实例）
+RETRY_AFTER_SECONDS = 5
+# 截止后等待被中断的流保存部分内容的时间
+INTERRUPT_GRACE = 5.0
+PROGRESS_LOG_INTERVAL = 5.0
+POLL_INTERVAL = 0.2
+
+T = TypeVar("T")
+
+
+class StreamHandle:
+    """一个进行中的请求，排空截止时可被中断"""
+
+    def __init__(self, user_id: int, stream: bool):
+        self.user_id = user_id
+        self.stream = stream
+        self.started_at = time.monotonic()
+        self.chars = 0
+        self._stop = asyncio.Event()
+
+    @property
+    def interrupted(self) -> bool:
+        return self._stop.is_set()
+
+    def interrupt(self) -> None:
+        self._stop.set()
+
+    async def until_interrupted(self, awaitable: Awaitable[T]) -> Optional[T]:
+        """等待上游（如响应头），收到中断时取消并返回 None"""
+        task = asyncio.ensure_future(awaitable)
+        stop = asyncio.ensure_future(self._stop.wait())
+        try:
+            await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+        if task.cancelled():
+            return None
+        return task.result()
+
+    async def interruptible(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        逐个转发上游片段，收到中断后立即结束（即使上游还在等待下一个片段）
+
+        每个片段在单独的任务中读取，与中断信号竞争
+        """
+        iterator = chunks.__aiter__()
+        stop = asyncio.ensure_future(self._stop.wait())
+        pending = None
+        try:
+            while True:
+                pending = asyncio.ensure_future(iterator.__anext__())
+                await asyncio.wait({pending, stop}, return_when=asyncio.FIRST_COMPLETED)
+                if not pending.done():
+                    return
+                try:
+                    chunk = pending.result()
+                except StopAsyncIteration:
+                    return
+                pending = None
+                self.chars += len(chunk) if chunk else 0
+                yield chunk
+        finally:
+            stop.cancel()
+            if pending is not None and not pending.done():
+                pending.cancel()
+                # 等待读取任务退出（上游连接随生成器一起关闭），不抛出取消异常
+                await asyncio.wait({pending})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "stream": self.stream,
+            "age_seconds": round(time.monotonic() - self.started_at, 1),
+            "chars": self.chars,
+        }
+
+
+class DrainController:
+    def __init__(self):
+        self._active: Set[StreamHandle] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.draining = False
+        self.reason: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.in_flight_at_start = 0
+        self.completed = 0
+        self.interrupted = 0
+        self.rejected = 0
+
+    def admit(self) -> bool:
+        """是否接受新的对话请求"""
+        if self.draining:
+            self.rejected += 1
+            return False
+        return True
+
+    def rejection(self) -> JSONResponse:
+        return JSONResponse(
+            status_code=503,
+            content={"code": 503, "msg": "服务正在重启，请稍后重试", "data": None},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+    @contextmanager
+    def track(self, user_id: int, stream: bool = True):
+        """登记一个进行中的请求，排空会等待它结束"""
+        handle = StreamHandle(user_id, stream)
+        self._active.add(handle)
+        try:
+            yield handle
+        finally:
+            self._active.discard(handle)
+            if self.draining:
+                if handle.interrupted:
+                    self.interrupted += 1
+                else:
+                    self.completed += 1
+
+    def start(self, reason: str, timeout: Optional[float] = None) -> asyncio.Task:
+        """进入排空模式（重复调用返回同一个排空任务）"""
+        if self._task is None:
+            timeout = settings.DRAIN_TIMEOUT if timeout is None else timeout
+            self.draining = True
+            self.reason = reason
+            self.started_at = time.time()
+            self.deadline = self.started_at + timeout
+            self.in_flight_at_start = len(self._active)
+            logger.info("开始排空（%s）：进行中 %s 个请求，最多等待 %s 秒",
+                        reason, self.in_flight_at_start, timeout)
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+        return self._task
+
+    async def _drain(self) -> None:
+        next_log = time.time() + PROGRESS_LOG_INTERVAL
+        while self._active and time.time() < self.deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            if time.time() >= next_log:
+                logger.info("排空中：剩余 %s 个请求，已完成 %s", len(self._active), self.completed)
+                next_log += PROGRESS_LOG_INTERVAL
+
+        if self._active:
+            logger.warning("排空超时，中断 %s 个请求并保存已生成内容", len(self._active))
+            for handle in list(self._active):
+                handle.interrupt()
+            grace_until = time.time() + INTERRUPT_GRACE
+            while self._active and time.time() < grace_until:
+                await asyncio.sleep(POLL_INTERVAL)
+
+        self.finished_at = time.time()
+        logger.info("排空结束：完成 %s，中断 %s，拒绝 %s，用时 %.1f 秒",
+                    self.completed, self.interrupted, self.rejected,
+                    self.finished_at - self.started_at)
+
+    def progress(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "draining": self.draining,
+            "done": self.finished_at is not None,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "remaining_seconds": round(max(self.deadline - now, 0.0), 1) if self.deadline else None,
+            "in_flight_at_start": self.in_flight_at_start,
+            "active": len(self._active),
+            "completed": self.completed,
+            "interrupted": self.interrupted,
+            "rejected": self.rejected,
+            "requests": [handle.to_dict() for handle in self._active],
+        }
+
+
+drain_controller = DrainController()
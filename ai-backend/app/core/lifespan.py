@@ -0,0 +1,169 @@
+"""
+应用生命周期：启动预热与退出清理
+
+启动时不阻塞端口监听，预热在后台任务中进行：
+    1. 数据库连接池：预先建立 pool_size 个连接
+    2. 智能体注册表：读取启用的智能体，导入其平台适配器
+    3. 令牌吊销列表：加载未过期的吊销记录，之后定期增量同步
+    4. 上游连接池：与各平台主机建立 keep-alive 连接
+全部完成后 app.state.ready 置为 True，/health/ready 才返回 200；
+数据库暂不可用时按间隔重试，期间实例保持未就绪。
+
+收到 SIGTERM 时先排空进行中的对话（见 app.core.drain），再交给 uvicorn 正常退出。
+"""
+
+import asyncio
+import logging
+import signal
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.drain import drain_controller
+from app.core.revocation import revocation_list
+from app.core.tracing import exporter
+
+logger = logging.getLogger(__name__)
+
+WARMUP_RETRY_INTERVAL = 5.0
+
+
+def _warm_db_pool() -> int:
+    """同时取出 pool_size 个连接再归还，使连接池中保留可用的空闲连接"""
+    from app.db.database import POOL_SIZE, get_engine
+
+    engine = get_engine()
+    connections = []
+    try:
+        for _ in range(POOL_SIZE):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def _load_agents() -> Dict[str, Any]:
+    """读取启用的智能体，返回平台类型与上游地址"""
+    from app.db.database import SessionLocal
+    from app.models.agent import AiAgentConfig
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            AiAgentConfig.platform_type, AiAgentConfig.base_url, AiAgentConfig.agent_key
+        ).filter(AiAgentConfig.is_active == True).all()
+    finally:
+        db.close()
+
+    platforms = sorted({row.platform_type for row in rows})
+    urls = [row.base_url for row in rows]
+    # n8n 的 webhook 地址保存在 agent_key 中
+    urls.extend(row.agent_key for row in rows if row.platform_type == "n8n")
+    return {"agents": len(rows), "platforms": platforms, "urls": urls}
+
+
+async def warm_up(app: FastAPI) -> None:
+    from app.adapters import AdapterFactory
+    from app.adapters import http_client
+    from app.services.job_service import job_executor
+
+    started_at = time.perf_counter()
+    while True:
+        try:
+            connections = await run_in_threadpool(_warm_db_pool)
+            agents = await run_in_threadpool(_load_agents)
+            revoked_tokens = await revocation_list.load()
+            break
+        except Exception as e:
+            logger.warning("启动预热失败，%s 秒后重试: %s", WARMUP_RETRY_INTERVAL, e)
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+
+    revocation_list.start()
+    loaded = AdapterFactory.preload(agents["platforms"])
+    reachable = await http_client.warm_up(agents["urls"])
+    # 上次退出时未完成的异步任务
+    recovered_jobs = await job_executor.recover()
+
+    app.state.warmup = {
+        "db_connections": connections,
+        "agents": agents["agents"],
+        "revoked_tokens": revoked_tokens,
+        "adapters": loaded,
+        "upstream_hosts": reachable,
+        "recovered_jobs": recovered_jobs,
+        "seconds": round(time.perf_counter() - started_at, 3),
+    }
+    app.state.ready = True
+    logger.info("启动预热完成: %s", app.state.warmup)
+
+
+def _install_drain_on_sigterm() -> None:
+    """
+    SIGTERM 改为先排空：uvicorn 收到 SIGTERM 会立即关闭监听端口，
+    这里替换它的处理函数，排空结束后发送 SIGINT 走 uvicorn 原有的退出流程
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    exit_requested = False
+
+    def exit_after_drain(task: asyncio.Task) -> None:
+        if not task.cancelled():
+            signal.raise_signal(signal.SIGINT)
+
+    def handle_sigterm() -> None:
+        nonlocal exit_requested
+        if exit_requested:
+            logger.info("已在排空，忽略重复的 SIGTERM")
+            return
+        exit_requested = True
+        drain_controller.start("SIGTERM").add_done_callback(exit_after_drain)
+
+    try:
+        loop.add_signal_handler(signal.SIGTERM, handle_sigterm)
+    except NotImplementedError:
+        # Windows 不支持，只能通过 /admin/drain 排空
+        pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.adapters import http_client
+    from app.services.job_service import job_executor
+    from app.services.search_service import search_indexer
+    from app.services.write_behind import message_writer
+
+    app.state.ready = False
+    app.state.warmup = None
+
+    # 启动消息异步批量落库
+    if settings.WRITE_BEHIND_ENABLED:
+        message_writer.start()
+    # 消息提交后在后台更新语义搜索索引
+    search_indexer.start()
+    warmup_task = asyncio.create_task(warm_up(app))
+    _install_drain_on_sigterm()
+
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        warmup_task.cancel()
+        try:
+            await warmup_task
+        except asyncio.CancelledError:
+            pass
+        # 未完成的异步任务改回 pending，下次启动继续执行
+        await job_executor.stop()
+        await revocation_list.stop()
+        # 退出前把未落库的消息全部写入数据库
+        await message_writer.stop()
+        await search_indexer.stop()
+        await http_client.close_clients()
+        exporter.close()
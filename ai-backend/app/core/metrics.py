@@ -0,0 +1,340 @@
+"""
+运行指标（Prometheus 文本格式）
+
+不依赖 prometheus_client，只实现本项目需要的 Counter / Gauge / Histogram：
+- 标签组合通过 labels() 预先绑定，热路径上只是对子对象做加法，不查字典、不加锁；
+- 绝大多数指标在事件循环线程中更新，线程池中的少量并发更新依赖 GIL，
+  极端情况下丢失个别增量对监控没有影响，换取零锁开销；
+- /metrics 抓取时才格式化文本。
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 秒级延迟的默认分桶
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    """with 块计时并写入直方图"""
+
+    __slots__ = ("child", "started_at")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started_at)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        """绑定标签值，返回的子对象应由调用方保存复用"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+            # setdefault 保证并发创建时只有一个子对象生效
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        # callback：抓取时计算的值（例如连接池当前占用），无需在热路径上维护
+        self.callback = callback
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._children[()].dec(amount)
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def _samples(self) -> List[str]:
+        if self.callback is not None:
+            self._children[()].set(self.callback())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), list(child.counts)):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---- 聊天流式指标 ----
+CHAT_TTFT = registry.register(Histogram(
+    "chat_time_to_first_token_seconds",
+    "从收到请求到向客户端输出第一个内容分片的耗时",
+    ("agent_id", "platform"),
+))
+CHAT_TOKENS_PER_SECOND = registry.register(Histogram(
+    "chat_tokens_per_second",
+    "流式回复的输出速率（以内容分片数近似token数，首个分片之后计时）",
+    ("agent_id", "platform"),
+    buckets=(1, 5, 10, 20, 40, 80, 160, 320, 640),
+))
+CHAT_ACTIVE_STREAMS = registry.register(Gauge(
+    "chat_active_streams",
+    "当前打开的SSE流数量",
+))
+UPSTREAM_RESPONSES = registry.register(Counter(
+    "upstream_responses",
+    "AI平台响应次数（status 为HTTP状态码，连接失败记为 error）",
+    ("platform", "status"),
+))
+
+
+class ChatStreamMetrics:
+    """一个智能体的流式指标子对象"""
+
+    __slots__ = ("ttft", "tokens_per_second")
+
+    def __init__(self, agent_id: int, platform: str):
+        self.ttft = CHAT_TTFT.labels(agent_id, platform)
+        self.tokens_per_second = CHAT_TOKENS_PER_SECOND.labels(agent_id, platform)
+
+
+class UpstreamCounters:
+    """一个平台按状态码的响应计数子对象"""
+
+    __slots__ = ("platform", "error", "_by_status")
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.error = UPSTREAM_RESPONSES.labels(platform, "error")
+        self._by_status: Dict[int, _CounterChild] = {}
+
+    def status(self, status_code: int) -> _CounterChild:
+        child = self._by_status.get(status_code)
+        if child is None:
+            child = self._by_status.setdefault(status_code, UPSTREAM_RESPONSES.labels(self.platform, status_code))
+        return child
+
+
+# 按 (智能体, 平台) / 平台缓存已绑定的子对象，请求中取一次后直接 observe / inc
+_chat_stream_metrics: Dict[Tuple[int, str], ChatStreamMetrics] = {}
+_upstream_counters: Dict[str, UpstreamCounters] = {}
+
+
+def chat_stream_metrics(agent_id: int, platform: str) -> ChatStreamMetrics:
+    metrics = _chat_stream_metrics.get((agent_id, platform))
+    if metrics is None:
+        metrics = _chat_stream_metrics.setdefault((agent_id, platform), ChatStreamMetrics(agent_id, platform))
+    return metrics
+
+
+def upstream_counters(platform: str) -> UpstreamCounters:
+    counters = _upstream_counters.get(platform)
+    if counters is None:
+        counters = _upstream_counters.setdefault(platform, UpstreamCounters(platform))
+    return counters
+
+# ---- 数据库连接池 ----
+DB_POOL_CHECKOUT_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "请求获取数据库连接的等待时间（含新建连接与 pre_ping）",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+))
+
+# ---- 认证 ----
+AUTH_REQUESTS = registry.register(Counter(
+    "auth_requests",
+    "令牌认证结果（success / invalid_token / revoked_token / unknown_user）",
+    ("result",),
+))
+AUTH_SUCCESS = AUTH_REQUESTS.labels("success")
+AUTH_INVALID_TOKEN = AUTH_REQUESTS.labels("invalid_token")
+AUTH_REVOKED_TOKEN = AUTH_REQUESTS.labels("revoked_token")
+AUTH_UNKNOWN_USER = AUTH_REQUESTS.labels("unknown_user")
+
+# ---- 限流 ----
+RATE_LIMITED = registry.register(Counter(
+    "rate_limited_requests",
+    "被限流拒绝（429）的请求数",
+    ("policy",),
+))
+
+
+def register_pool_metrics(engine) -> None:
+    """注册连接池占用指标（抓取时从连接池读取，不在热路径上维护）"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    registry.register(Gauge(
+        "db_pool_checked_out", "当前被占用的数据库连接数", callback=pool.checkedout,
+    ))
+    registry.register(Gauge(
+        "db_pool_capacity", "连接池容量（pool_size + max_overflow）", callback=lambda: capacity,
+    ))
+    registry.register(Gauge(
+        "db_pool_utilization", "连接池占用率（0~1）",
+        callback=lambda: pool.checkedout() / capacity if capacity else 0.0,
+    ))
@@ -0,0 +1,283 @@
+"""
+请求限流（令牌桶）
+
+ASGI 中间件，在路由与依赖（get_current_user 查库、上游调用）之前执行：
+- 按 (方法, 路径) 选择策略，未列出的接口使用 default 策略；健康检查、指标、运维接口与 CORS 预检不限流；
+- scope 为 user 的策略按 JWT 中的用户（sub）计数，没有有效令牌时按客户端IP；
+  scope 为 ip 的策略（登录、注册、验证码）始终按IP；
+- 每个策略是容量 capacity、period 秒补满的令牌桶：允许 capacity 次突发，长期速率 capacity/period；
+- 超限返回 429 与 Retry-After，受限接口的响应都带 RateLimit-Limit / RateLimit-Remaining /
+  RateLimit-Reset / RateLimit-Policy。
+
+后端：
+    RATE_LIMIT_BACKEND=memory  进程内字典，事件循环单线程上读改写之间没有 await，无需加锁；
+                               多 worker 时每个进程各自计数
+    RATE_LIMIT_BACKEND=redis   Lua 脚本在 Redis 中原子扣减（以 Redis 时钟为准），多 worker / 多实例共享；
+                               Redis 不可用时放行
+
+WebSocket（/chat/ws）不经过本中间件：chat_mux 每开启一个流通过 rate_limiter 扣减同一个 chat 桶
+（与 /chat/send 共享），单连接的并发流数量另由 chat_mux 限制。
+"""
+
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.metrics import RATE_LIMITED
+from app.core.security import ALGORITHM, SECRET_KEY
+
+logger = logging.getLogger(__name__)
+
+# 策略名 -> (计数维度, 容量, 补满秒数)
+DEFAULT_POLICIES = {
+    "login": ("ip", 10, 60),
+    "signup": ("ip", 5, 300),
+    "chat": ("user", 30, 60),
+    "batch": ("user", 5, 60),
+    "default": ("user", 300, 60),
+}
+
+# 同名策略共享一个桶（/chat/send 与 /chat/jobs 共用 chat）
+ROUTE_POLICIES = {
+    ("POST", "/auth/login"): "login",
+    ("POST", "/auth/register"): "signup",
+    ("POST", "/auth/email/code"): "signup",
+    ("POST", "/chat/send"): "chat",
+    ("POST", "/chat/jobs"): "chat",
+    ("POST", "/chat/batch"): "batch",
+}
+
+EXEMPT_PATHS = {"/", "/health", "/health/ready", "/metrics", "/admin/drain"}
+
+# JWT 校验结果缓存（令牌 -> (用户, 过期时间)），避免每个请求都做签名校验
+TOKEN_CACHE_SIZE = 10000
+# 内存后端每处理多少次请求清理一次已补满的桶
+SWEEP_EVERY = 10000
+REDIS_TIMEOUT = 0.2
+
+
+class RateLimitPolicy:
+    __slots__ = ("name", "scope", "capacity", "period", "rate", "header")
+
+    def __init__(self, name: str, scope: str, capacity: int, period: float):
+        if scope not in ("user", "ip") or capacity < 1 or period <= 0:
+            raise ValueError(f"无效的限流策略: {name}")
+        self.name = name
+        self.scope = scope
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.header = f"{capacity};w={int(period)}"
+
+
+def build_policies(overrides: str = "") -> Dict[str, RateLimitPolicy]:
+    """默认策略 + RATE_LIMITS 覆盖（"chat=60/60,login=20/60"：容量/补满秒数）"""
+    policies = {
+        name: RateLimitPolicy(name, scope, capacity, period)
+        for name, (scope, capacity, period) in DEFAULT_POLICIES.items()
+    }
+    for item in overrides.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if name not in policies:
+            raise ValueError(f"未知的限流策略: {name}")
+        try:
+            capacity, period = value.split("/")
+            policies[name] = RateLimitPolicy(name, policies[name].scope, int(capacity), float(period))
+        except ValueError:
+            raise ValueError(f"限流配置格式应为 名称=容量/秒数: {item}")
+    return policies
+
+
+class MemoryBucketStore:
+    """进程内令牌桶，桶状态为 (剩余令牌, 更新时间, 补满时间)"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._checks = 0
+
+    async def take(self, key: str, policy: RateLimitPolicy) -> Tuple[bool, float]:
+        """取一个令牌，返回 (是否放行, 剩余令牌)"""
+        now = time.monotonic()
+        state = self._buckets.get(key)
+        if state is None:
+            tokens = policy.capacity
+        else:
+            tokens = min(policy.capacity, state[0] + (now - state[1]) * policy.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now, now + (policy.capacity - tokens) / policy.rate)
+
+        self._checks += 1
+        if self._checks >= SWEEP_EVERY:
+            self._checks = 0
+            self._sweep(now)
+        return allowed, tokens
+
+    def _sweep(self, now: float) -> None:
+        # 已补满的桶与不存在等价，删除以免按IP计数时无限增长
+        for key in [key for key, state in self._buckets.items() if state[2] <= now]:
+            del self._buckets[key]
+
+
+# KEYS[1] 桶；ARGV 容量、每秒补充的令牌数。返回 {是否放行, 剩余令牌（字符串，保留小数）}
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = capacity
+if state[1] then
+    tokens = math.min(capacity, tonumber(state[1]) + (now - tonumber(state[2])) * rate)
+end
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """Redis 令牌桶，多个进程共享"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._errors = (redis.RedisError, OSError)
+        self._client = redis.from_url(url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
+        self._script = self._client.register_script(TOKEN_BUCKET_LUA)
+        self._last_error_log = 0.0
+
+    async def take(self, key: str, policy: RateLimitPolicy) -> Tuple[bool, float]:
+        try:
+            allowed, tokens = await self._script(keys=[f"ratelimit:{key}"], args=[policy.capacity, policy.rate])
+        except self._errors as e:
+            # 限流不可用时放行，每分钟最多记录一次
+            if time.monotonic() - self._last_error_log > 60:
+                self._last_error_log = time.monotonic()
+                logger.warning("限流后端不可用，暂时放行: %s", e)
+            return True, policy.capacity
+        return bool(allowed), float(tokens)
+
+
+def create_store():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketStore(settings.REDIS_URL)
+    return MemoryBucketStore()
+
+
+class RateLimiter:
+    """策略与桶存储，HTTP 中间件与 WebSocket 共用（同一身份的同名策略扣减同一个桶）"""
+
+    def __init__(self):
+        self.policies = build_policies(settings.RATE_LIMITS)
+        self.rejected = {name: RATE_LIMITED.labels(name) for name in self.policies}
+        self.store = None
+
+    async def take(self, policy: RateLimitPolicy, identity: str) -> Tuple[bool, float]:
+        """按策略扣减 identity 的桶，返回 (是否放行, 剩余令牌)；拒绝时计入指标"""
+        if self.store is None:
+            self.store = create_store()
+        allowed, tokens = await self.store.take(f"{policy.name}:{identity}", policy)
+        if not allowed:
+            self.rejected[policy.name].inc()
+        return allowed, tokens
+
+
+rate_limiter = RateLimiter()
+
+
+class RateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.limiter = rate_limiter
+        self.routes = {route: rate_limiter.policies[name] for route, name in ROUTE_POLICIES.items()}
+        self.default = rate_limiter.policies["default"]
+        self._tokens: Dict[str, Tuple[Optional[str], float]] = {}
+
+    def _token_subject(self, token: str) -> Optional[str]:
+        """校验令牌签名并返回用户名；无效令牌返回 None（随后由 get_current_user 拒绝）"""
+        now = time.time()
+        cached = self._tokens.get(token)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        subject = payload.get("sub")
+        if len(self._tokens) >= TOKEN_CACHE_SIZE:
+            self._tokens.clear()
+        self._tokens[token] = (subject, float(payload.get("exp") or now + 60))
+        return subject
+
+    def _identity(self, scope, policy: RateLimitPolicy) -> str:
+        authorization = forwarded = None
+        for key, value in scope.get("headers", ()):
+            if key == b"authorization":
+                authorization = value
+            elif key == b"x-forwarded-for":
+                forwarded = value
+        if policy.scope == "user" and authorization and authorization[:7].lower() == b"bearer ":
+            subject = self._token_subject(authorization[7:].decode("latin-1").strip())
+            if subject:
+                return f"u:{subject}"
+        # 只有部署在可信反向代理之后才使用 X-Forwarded-For（否则客户端可以伪造）
+        if forwarded and settings.RATE_LIMIT_TRUST_FORWARDED:
+            return "ip:" + forwarded.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    @staticmethod
+    def _headers(policy: RateLimitPolicy, tokens: float) -> List[Tuple[bytes, bytes]]:
+        reset = math.ceil((policy.capacity - tokens) / policy.rate)
+        return [
+            (b"ratelimit-limit", str(policy.capacity).encode()),
+            (b"ratelimit-remaining", str(int(tokens)).encode()),
+            (b"ratelimit-reset", str(reset).encode()),
+            (b"ratelimit-policy", policy.header.encode()),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED
+            or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.routes.get((scope["method"], scope["path"]), self.default)
+        allowed, tokens = await self.limiter.take(policy, self._identity(scope, policy))
+        headers = self._headers(policy, tokens)
+
+        if not allowed:
+            retry_after = math.ceil((1 - tokens) / policy.rate)
+            response = JSONResponse(
+                {"code": 429, "msg": "请求过于频繁，请稍后再试", "data": None},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+            response.raw_headers.extend(headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", ())) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,209 @@
+"""
+访问令牌吊销
+
+令牌签发时带 jti，登出时把 jti 与过期时间写入 sys_token_revocation，
+每个进程在内存中维护吊销列表，认证时不查库：
+- 布隆过滤器：绝大多数令牌未被吊销，计算一次哈希、探测几个位即可判定“不在列表中”；
+- 精确集合（jti -> 过期时间）：布隆过滤器命中时再确认，排除误判；
+- 令牌过期后 jwt.decode 本身就会拒绝，过期条目定期从内存移除并重建过滤器，
+  数据库中的过期行也定期删除。
+
+进程间同步：启动预热时加载所有未过期的吊销记录，之后每 REVOCATION_SYNC_INTERVAL 秒
+按 revoked_at 增量拉取其他进程（其他 worker、其他实例）写入的记录；本进程内的登出立即生效。
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.user import SysTokenRevocation
+
+logger = logging.getLogger(__name__)
+
+# 过滤器初始容量与误判率；吊销数超过容量时按两倍容量重建
+BLOOM_CAPACITY = 100000
+BLOOM_ERROR_RATE = 0.001
+# 增量拉取的回看窗口（秒）：吊销时间早于游标、但稍后才提交的记录也能被拉到
+SYNC_LOOKBACK = 30
+# 清理内存中已过期条目的间隔（秒）
+PURGE_INTERVAL = 60
+# 删除数据库中已过期记录的间隔（秒），各进程都会执行，删除本身是幂等的
+DB_CLEANUP_INTERVAL = 3600
+
+
+class BloomFilter:
+    """定长布隆过滤器（双重哈希，k 个位置由一次 blake2b 摘要导出）"""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _hashes(self, key: str) -> Tuple[int, int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def add(self, key: str) -> None:
+        h1, h2 = self._hashes(key)
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = self._hashes(key)
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class TokenRevocationList:
+    """进程内吊销列表；读写都在事件循环线程上进行，重建时整体替换过滤器"""
+
+    def __init__(self):
+        self._expires: Dict[str, float] = {}
+        self._bloom = BloomFilter(BLOOM_CAPACITY)
+        self._cursor: Optional[datetime] = None
+        self._next_purge = 0.0
+        self._next_cleanup = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """令牌是否已吊销（不带 jti 的旧令牌无法吊销，只能等待过期）"""
+        if not jti or jti not in self._bloom:
+            return False
+        return jti in self._expires
+
+    def add(self, jti: str, expires: float) -> None:
+        if jti in self._expires:
+            return
+        self._expires[jti] = expires
+        if len(self._expires) > self._bloom.capacity:
+            self._rebuild()
+        else:
+            self._bloom.add(jti)
+
+    def _rebuild(self) -> None:
+        bloom = BloomFilter(max(BLOOM_CAPACITY, len(self._expires) * 2))
+        for jti in self._expires:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """移除已过期的条目，返回移除数量"""
+        now = time.time() if now is None else now
+        expired = [jti for jti, expires in self._expires.items() if expires <= now]
+        if expired:
+            for jti in expired:
+                del self._expires[jti]
+            # 布隆过滤器不能删除，只能重建
+            self._rebuild()
+        return len(expired)
+
+    def revoke(self, db: Session, jti: Optional[str], user_id: int, expires: float) -> bool:
+        """吊销令牌：写入数据库并立即在本进程生效，返回是否吊销（没有 jti 时为 False）"""
+        if not jti:
+            return False
+        db.add(SysTokenRevocation(
+            jti=jti, user_id=user_id, expires_at=datetime.fromtimestamp(expires)
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # 重复登出
+            db.rollback()
+        self.add(jti, expires)
+        return True
+
+    def _apply(self, rows: List[Tuple[str, datetime, datetime]]) -> None:
+        for jti, expires_at, revoked_at in rows:
+            self.add(jti, expires_at.timestamp())
+            if self._cursor is None or revoked_at > self._cursor:
+                self._cursor = revoked_at
+
+    def _fetch(self, cursor: Optional[datetime]) -> List[Tuple[str, datetime, datetime]]:
+        db = SessionLocal()
+        try:
+            query = db.query(
+                SysTokenRevocation.jti, SysTokenRevocation.expires_at, SysTokenRevocation.revoked_at
+            ).filter(SysTokenRevocation.expires_at > datetime.now())
+            if cursor is not None:
+                query = query.filter(SysTokenRevocation.revoked_at >= cursor - timedelta(seconds=SYNC_LOOKBACK))
+            return [tuple(row) for row in query.all()]
+        finally:
+            db.close()
+
+    def _delete_expired(self) -> int:
+        db = SessionLocal()
+        try:
+            deleted = db.query(SysTokenRevocation).filter(
+                SysTokenRevocation.expires_at <= datetime.now()
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    async def load(self) -> int:
+        """加载所有未过期的吊销记录（启动预热时调用），返回列表大小"""
+        self._apply(await run_in_threadpool(self._fetch, None))
+        return len(self._expires)
+
+    async def sync(self) -> None:
+        """拉取其他进程新写入的吊销记录，并定期清理过期条目"""
+        self._apply(await run_in_threadpool(self._fetch, self._cursor))
+
+        now = time.monotonic()
+        if now >= self._next_purge:
+            self._next_purge = now + PURGE_INTERVAL
+            self.purge()
+        if now >= self._next_cleanup:
+            self._next_cleanup = now + DB_CLEANUP_INTERVAL
+            deleted = await run_in_threadpool(self._delete_expired)
+            if deleted:
+                logger.info("已删除 %d 条过期的令牌吊销记录", deleted)
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._next_cleanup = time.monotonic() + DB_CLEANUP_INTERVAL
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.REVOCATION_SYNC_INTERVAL)
+            try:
+                await self.sync()
+            except Exception as e:
+                # 数据库暂不可用：保留现有列表，下个周期重试
+                logger.warning("同步令牌吊销列表失败: %s", e)
+
+
+revocation_list = TokenRevocationList()
@@ -2,6 +2,7 @@
 JWT认证安全模块
 """
 
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -10,6 +11,10 @@ from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from app.models.user import SysUser
 from app.core.config import settings
+from app.core import tracing
+from app.core.metrics import AUTH_INVALID_TOKEN, AUTH_REVOKED_TOKEN, AUTH_SUCCESS, AUTH_UNKNOWN_USER
+from app.core.revocation import revocation_list
+from app.db import statements
 
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -41,7 +46,8 @@ class SecurityManager:
         else:
             expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         
-        to_encode.update({"exp": expire})
+        # jti 用于登出时吊销单个令牌
+        to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     
@@ -51,7 +57,7 @@ class SecurityManager:
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             username: str = payload.get("sub")
-            if username is None:
+            if username is None or revocation_list.is_revoked(payload.get("jti")):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="无效的认证令牌",
@@ -78,13 +84,22 @@ class SecurityManager:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             username: str = payload.get("sub")
             if username is None:
+                AUTH_INVALID_TOKEN.inc()
                 raise credentials_exception
         except JWTError:
+            AUTH_INVALID_TOKEN.inc()
+            raise credentials_exception
+        # 内存中的吊销列表，不查库
+        if revocation_list.is_revoked(payload.get("jti")):
+            AUTH_REVOKED_TOKEN.inc()
             raise credentials_exception
         
-        user = db.query(SysUser).filter(SysUser.user_name == username).first()
+        with tracing.span("db.user_lookup"):
+            user = db.execute(statements.user_by_name(username)).scalars().first()
         if user is None:
+            AUTH_UNKNOWN_USER.inc()
             raise credentials_exception
+        AUTH_SUCCESS.inc()
         return user
     
     @staticmethod
@@ -0,0 +1,311 @@
+"""
+轻量请求链路追踪
+
+- 每个HTTP请求一个 trace，由 TracingMiddleware 创建根span，按 TRACE_SAMPLE_RATE 头部采样；
+  请求头带 W3C traceparent 时沿用其 trace-id；其中的采样标记可由任意客户端伪造，
+  仅在 TRACE_TRUST_INBOUND_SAMPLED 开启时采用，否则仍按本地采样率决定；
+- span() 上下文管理器通过 contextvars 维护父子关系，未采样时不创建对象；
+- 调用 TRACE_PROPAGATE_HOSTS 中的上游时 inject_traceparent() 把当前上下文写入请求头
+  （未采样也传递，标记为 00）；第三方 SaaS 默认不传递，避免泄露内部 trace-id；
+- 根span结束时把整条 trace 的span交给后台线程写入本地 JSON lines 文件，不阻塞事件循环，
+  不依赖任何采集服务；文件超过 TRACE_EXPORT_MAX_BYTES 时轮转。
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any], start: Optional[float] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self, end: Optional[float] = None) -> None:
+        self.end = time.time() if end is None else end
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(((self.end or time.time()) - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    __slots__ = ("trace_id", "sampled", "remote_parent_id", "spans")
+
+    def __init__(self, trace_id: str, sampled: bool, remote_parent_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.remote_parent_id = remote_parent_id
+        self.spans: List[Span] = []
+
+
+# 当前 trace 与当前 span（未采样时 span 为 None，只保留 trace 用于向上游传递）
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Trace]:
+    """解析 W3C traceparent：00-<trace-id>-<parent-id>-<flags>"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return Trace(parts[1], bool(flags & 1), parts[2])
+
+
+def new_trace(traceparent: Optional[str] = None) -> Trace:
+    trace = parse_traceparent(traceparent)
+    if trace is None:
+        return Trace(os.urandom(16).hex(), random.random() < settings.TRACE_SAMPLE_RATE)
+    if not settings.TRACE_TRUST_INBOUND_SAMPLED:
+        trace.sampled = random.random() < settings.TRACE_SAMPLE_RATE
+    return trace
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """记录一个子span；当前请求未采样时什么也不做"""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        yield None
+        return
+
+    parent = _current_span.get()
+    item = Span(trace, name, parent.span_id if parent else trace.remote_parent_id, attributes)
+    token = _current_span.set(item)
+    try:
+        yield item
+    except BaseException as e:
+        item.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # 异步生成器在其他上下文中被关闭（如客户端断开后回收），此时无需恢复
+            pass
+        item.finish()
+        trace.spans.append(item)
+
+
+def record_span(name: str, start: float, end: float, **attributes) -> None:
+    """补记一个已知起止时间（time.time()）的span，挂在当前span下"""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        return
+    parent = _current_span.get()
+    item = Span(trace, name, parent.span_id if parent else trace.remote_parent_id, attributes, start)
+    item.finish(end)
+    trace.spans.append(item)
+
+
+_propagate_hosts: Optional[FrozenSet[str]] = None
+
+
+def _propagates_to(url: str) -> bool:
+    global _propagate_hosts
+    if _propagate_hosts is None:
+        _propagate_hosts = frozenset(
+            host.strip().lower() for host in settings.TRACE_PROPAGATE_HOSTS.split(",") if host.strip()
+        )
+    return bool(_propagate_hosts) and (urlsplit(url).hostname or "").lower() in _propagate_hosts
+
+
+def inject_traceparent(headers: Dict[str, str], url: str) -> Dict[str, str]:
+    """请求 url 的主机在 TRACE_PROPAGATE_HOSTS 中时，向请求头写入 traceparent"""
+    trace = _current_trace.get()
+    if trace is not None and _propagates_to(url):
+        parent = _current_span.get()
+        parent_id = parent.span_id if parent else (trace.remote_parent_id or os.urandom(8).hex())
+        headers["traceparent"] = f"00-{trace.trace_id}-{parent_id}-{'01' if trace.sampled else '00'}"
+    return headers
+
+
+class HttpxPhases:
+    """
+    httpx trace 扩展回调，把连接建立与首字节等待拆成独立span：
+        client.stream(..., extensions={"trace": phases})
+    """
+
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        self.marks.setdefault(event_name.split(".", 1)[-1], time.time())
+
+    def record(self, started_at: float) -> None:
+        """在收到响应头之后调用"""
+        marks = self.marks
+        connected = marks.get("start_tls.complete") or marks.get("connect_tcp.complete")
+        if connected:
+            record_span("upstream.connect", marks.get("connect_tcp.started", started_at), connected)
+        sent = (marks.get("send_request_body.complete") or marks.get("send_request_headers.complete")
+                or connected or started_at)
+        received = marks.get("receive_response_headers.complete")
+        if received:
+            record_span("upstream.ttfb", sent, received, reused_connection=connected is None)
+
+
+class JsonLinesExporter:
+    """把span追加写入本地文件：export() 只入队，序列化与写文件在后台线程中进行"""
+
+    def __init__(self, path: str, max_bytes: int = 0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._file = None
+        self._queue: "queue.SimpleQueue[Optional[List[Span]]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        if not self.path or not spans:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(spans)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # 合并已排队的 trace，一次写入
+            while batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            self._write([item for spans in batch if spans for item in spans])
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _write(self, spans: List[Span]) -> None:
+        if not spans:
+            return
+        data = "".join(json.dumps(item.to_dict(), ensure_ascii=False, default=str) + "\n" for item in spans)
+        try:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(data)
+            self._file.flush()
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._file.close()
+                self._file = None
+                os.replace(self.path, f"{self.path}.1")
+        except OSError:
+            logger.exception("写入追踪数据失败")
+
+    def close(self) -> None:
+        """写完已入队的数据后停止后台线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5.0)
+
+
+exporter = JsonLinesExporter(settings.TRACE_EXPORT_PATH, settings.TRACE_EXPORT_MAX_BYTES)
+
+
+class TracingMiddleware:
+    """
+    ASGI 中间件：为每个请求创建 trace 与根span。
+    流式响应在最后一块 body 发出后才结束根span，因此SSE的完整耗时都计入 trace。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        trace = new_trace(traceparent)
+        trace_token = _current_trace.set(trace)
+        root = None
+        span_token = None
+        if trace.sampled:
+            root = Span(trace, f"{scope['method']} {scope['path']}", trace.remote_parent_id, {})
+            span_token = _current_span.set(root)
+
+        async def send_wrapper(message):
+            if root is not None:
+                if message["type"] == "http.response.start":
+                    root.set(status=message["status"])
+                elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                    root.finish()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            if root is not None:
+                root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if span_token is not None:
+                _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            if root is not None:
+                if root.end is None:
+                    root.finish()
+                exporter.export(trace.spans + [root])
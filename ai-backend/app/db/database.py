@@ -1,7 +1,9 @@
+import threading
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT, register_pool_metrics
 
 # 创建数据库连接字符串
 SQLALCHEMY_DATABASE_URL = (
@@ -10,21 +12,54 @@ SQLALCHEMY_DATABASE_URL = (
     f"?charset={settings.DB_CHARSET}"
 )
 
-# 创建数据库引擎
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=settings.DEBUG,
-    pool_size=10,
-    max_overflow=20
-)
+# 连接池大小（启动预热时按 pool_size 建立连接）
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    获取数据库引擎（首次使用时创建）
+
+    导入本模块不会加载数据库驱动，也不会创建连接池，
+    脚本与迁移工具导入模型时不受影响，服务冷启动更快
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(
+                    SQLALCHEMY_DATABASE_URL,
+                    pool_pre_ping=True,
+                    pool_recycle=3600,
+                    echo=settings.DEBUG,
+                    pool_size=POOL_SIZE,
+                    max_overflow=MAX_OVERFLOW
+                )
+                register_pool_metrics(engine)
+                _engine = engine
+    return _engine
+
+def __getattr__(name):
+    # 兼容 `from app.db.database import engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazySessionMaker(sessionmaker):
+    """首次创建会话时才绑定引擎的会话工厂"""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
 
 # 创建会话工厂
-SessionLocal = sessionmaker(
+SessionLocal = LazySessionMaker(
     autocommit=False,
-    autoflush=False,
-    bind=engine
+    autoflush=False
 )
 
 # 创建基类
@@ -34,6 +69,9 @@ Base = declarative_base()
 def get_db():
     db = SessionLocal()
     try:
+        # 提前取出连接，记录连接池等待时间
+        with DB_POOL_CHECKOUT_WAIT.time():
+            db.connection()
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
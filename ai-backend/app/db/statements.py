@@ -0,0 +1,42 @@
+"""
+热点语句
+
+每个请求都会执行的查询用 lambda_stmt 构造：首次执行时分析 lambda 并缓存语句结构与编译结果，
+之后只从闭包中取出参数值，省去 ORM Query 的构造与缓存键计算；
+写入使用预先构造的 Core INSERT（多行 executemany / 取 lastrowid），不经过工作单元 flush。
+
+MySQL 不支持 INSERT ... RETURNING，新建行的自增ID从 inserted_primary_key（游标的 lastrowid）读取，
+不需要额外查询。check_query_plans.py 对这里的查询执行 EXPLAIN。
+"""
+
+from sqlalchemy import insert, lambda_stmt, select
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+
+from app.models.agent import AiAgentConfig
+from app.models.chat import ChatMessage, ChatSession
+from app.models.user import SysUser
+
+
+def active_agent(agent_id: int) -> StatementLambdaElement:
+    """按ID查询可用的智能体"""
+    return lambda_stmt(lambda: select(AiAgentConfig).where(
+        AiAgentConfig.agent_id == agent_id, AiAgentConfig.is_active == True
+    ).limit(1))
+
+
+def user_by_name(user_name: str) -> StatementLambdaElement:
+    """按用户名查询用户（令牌认证）"""
+    return lambda_stmt(lambda: select(SysUser).where(SysUser.user_name == user_name).limit(1))
+
+
+def session_conversation(session_id: int, user_id: int) -> StatementLambdaElement:
+    """校验会话归属并取出智能体与平台会话ID"""
+    return lambda_stmt(lambda: select(
+        ChatSession.agent_id, ChatSession.platform_conversation_id
+    ).where(ChatSession.id == session_id, ChatSession.user_id == user_id).limit(1))
+
+
+# 批量写入消息（参数为行字典列表）
+INSERT_MESSAGES = insert(ChatMessage)
+# 新建会话（参数为单个字典），ID 取 inserted_primary_key[0]
+INSERT_SESSION = insert(ChatSession)
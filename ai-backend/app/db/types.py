@@ -0,0 +1,138 @@
+"""
+自定义列类型
+"""
+
+import threading
+import zlib
+from typing import Optional
+
+from sqlalchemy import LargeBinary, String, Text, cast, func, literal
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import TypeDecorator
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 压缩内容以格式标记字节开头；未压缩的内容按原始 UTF-8 存储（与历史数据一致，
+# 可直接参与 LIKE 搜索），仅当文本本身以标记字节开头时才加 FORMAT_RAW 前缀转义
+FORMAT_RAW = 0x00
+FORMAT_ZLIB = 0x01
+FORMAT_ZSTD = 0x02
+FORMAT_TAGS = (FORMAT_RAW, FORMAT_ZLIB, FORMAT_ZSTD)
+
+# zstd 压缩/解压上下文不能跨线程并发使用（请求在线程池中执行），按线程各建一份
+_zstd_local = threading.local()
+
+
+def _zstd_compressor():
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=3)
+    return compressor
+
+
+def _zstd_decompressor():
+    if zstandard is None:
+        raise RuntimeError("内容为 zstd 压缩格式，需要安装 zstandard 才能读取")
+    decompressor = getattr(_zstd_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _zstd_local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def _resolve_codec(codec: str) -> int:
+    if codec == "auto":
+        return FORMAT_ZSTD if zstandard is not None else FORMAT_ZLIB
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("未安装 zstandard，无法使用 zstd 压缩")
+        return FORMAT_ZSTD
+    if codec == "zlib":
+        return FORMAT_ZLIB
+    raise ValueError(f"不支持的消息压缩算法: {codec}")
+
+
+def encode_content(text: str, threshold: int, codec: int) -> bytes:
+    """文本编码为字节串，超过阈值且压缩有收益时压缩并加格式标记"""
+    raw = text.encode("utf-8")
+    if len(raw) > threshold:
+        if codec == FORMAT_ZSTD:
+            compressed = _zstd_compressor().compress(raw)
+        else:
+            compressed = zlib.compress(raw, 1)
+        if len(compressed) + 1 < len(raw):
+            return bytes((codec,)) + compressed
+    if raw and raw[0] in FORMAT_TAGS:
+        return bytes((FORMAT_RAW,)) + raw
+    return raw
+
+
+def decode_content(data) -> Optional[str]:
+    """按格式标记解码"""
+    if data is None or isinstance(data, str):
+        return data
+
+    data = bytes(data)
+    if not data:
+        return ""
+    tag = data[0]
+    if tag == FORMAT_RAW:
+        return data[1:].decode("utf-8")
+    if tag == FORMAT_ZLIB:
+        return zlib.decompress(data[1:]).decode("utf-8")
+    if tag == FORMAT_ZSTD:
+        return _zstd_decompressor().decompress(data[1:]).decode("utf-8")
+    return data.decode("utf-8")
+
+
+def is_compressed(data: bytes) -> bool:
+    """是否为压缩格式"""
+    return bool(data) and data[0] in (FORMAT_ZLIB, FORMAT_ZSTD)
+
+
+def compressed_clause(column):
+    """SQL 条件：列值为压缩格式（首字节为压缩格式标记）"""
+    return func.substr(column, 1, 1).in_(
+        [literal(bytes((tag,)), LargeBinary) for tag in (FORMAT_ZLIB, FORMAT_ZSTD)]
+    )
+
+
+class CompressedText(TypeDecorator):
+    """大文本透明压缩列：写入时按阈值压缩并加格式标记，读取结果时解压"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    class Comparator(TypeDecorator.Comparator):
+        def contains(self, other, **kwargs):
+            # 按文本比较，保持与原 TEXT 列一致的 LIKE 语义；压缩内容在 SQL 中无法匹配，
+            # 需要时由调用方解压后在 Python 中匹配（见 ChatService.chat_list_query）
+            return cast(self.expr, Text).contains(other, **kwargs)
+
+    comparator_factory = Comparator
+
+    def __init__(self, threshold: Optional[int] = None, codec: Optional[str] = None):
+        super().__init__()
+        self.threshold = settings.MESSAGE_COMPRESS_THRESHOLD if threshold is None else threshold
+        self.codec = _resolve_codec(codec or settings.MESSAGE_COMPRESS_CODEC)
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "mysql":
+            return dialect.type_descriptor(mysql.LONGBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def coerce_compared_value(self, op, value):
+        # LIKE 等比较的右值按普通字符串绑定，不做压缩编码
+        return String()
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_content(value, self.threshold, self.codec)
+
+    def process_result_value(self, value, dialect):
+        return decode_content(value)
@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from app.api import agents, sessions, chat
-from app.db.database import engine
-from app.models import agent, message, session
+from app.api import auth, chat, system, stats, metrics, health, admin
+from app.core.lifespan import lifespan
+from app.core.tracing import TracingMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.ratelimit import RateLimitMiddleware
 
 # 配置日志
 logging.basicConfig(
@@ -11,12 +13,13 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
-# 创建数据库表
-agent.Base.metadata.create_all(bind=engine)
-message.Base.metadata.create_all(bind=engine)
-session.Base.metadata.create_all(bind=engine)
+# 表结构由 Alembic 迁移管理：alembic upgrade head
+# 导入本模块没有副作用：数据库引擎、连接池与上游客户端都在首次使用或启动预热时创建
 
-app = FastAPI(title="WenKe AI Backend", version="1.0.0")
+app = FastAPI(title="WenKe AI Backend", version="1.0.0", lifespan=lifespan)
+
+# 请求限流（最内层：在 CORS 之内，429 响应也带跨域头；在路由依赖之前，被拒绝的请求不查库）
+app.add_middleware(RateLimitMiddleware)
 
 # 配置CORS
 app.add_middleware(
@@ -27,10 +30,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（gzip/brotli），SSE 与 NDJSON 等流式响应不压缩
+app.add_middleware(CompressionMiddleware)
+
+# 请求链路追踪（最外层，覆盖完整请求与流式响应）
+app.add_middleware(TracingMiddleware)
+
 # 注册路由
-app.include_router(agents.router, prefix="/api/agents", tags=["agents"])
-app.include_router(sessions.router, prefix="/api/sessions", tags=["sessions"])
-app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
+# 各路由自带前缀（/auth、/chat、/system ...），与前端请求路径一致
+app.include_router(auth.router)
+app.include_router(chat.router)
+app.include_router(system.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def root():
@@ -38,4 +52,4 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,5 +1,6 @@
-from .user import SysUser
+from .user import SysUser, SysTokenRevocation
 from .agent import AiAgentConfig, AiPlatformType
-from .chat import ChatSession, ChatMessage
+from .chat import ChatSession, ChatMessage, ChatMessageArchive, ChatSyncSeq, ChatSessionTombstone, ChatJob
+from .statistics import ChatStatistics
 
-__all__ = ["SysUser", "AiAgentConfig", "AiPlatformType", "ChatSession", "ChatMessage"]
\ No newline at end of file
+__all__ = ["SysUser", "SysTokenRevocation", "AiAgentConfig", "AiPlatformType", "ChatSession", "ChatMessage", "ChatMessageArchive", "ChatSyncSeq", "ChatSessionTombstone", "ChatJob", "ChatStatistics"]
\ No newline at end of file
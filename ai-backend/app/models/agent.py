@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, BigInteger
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, BigInteger, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -12,6 +12,10 @@ class AiPlatformType(Base):
 
 class AiAgentConfig(Base):
     __tablename__ = "ai_agent_config"
+    __table_args__ = (
+        # 智能体列表：WHERE is_active = 1
+        Index("idx_ai_agent_config_active", "is_active"),
+    )
     
     agent_id = Column(BigInteger, primary_key=True, autoincrement=True)
     agent_name = Column(String(100), nullable=False)
@@ -26,6 +30,8 @@ class AiAgentConfig(Base):
     is_active = Column(Boolean, default=True)
     is_default = Column(Boolean, default=False)
     is_stream = Column(Boolean, default=True)
+    # 流式对话时原样转发上游SSE（前端直接消费平台事件格式），目前仅 Dify 支持
+    stream_passthrough = Column(Boolean, default=False, server_default="0")
     user_id = Column(BigInteger)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
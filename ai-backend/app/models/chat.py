@@ -1,11 +1,18 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, BigInteger, CHAR, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, BigInteger, CHAR, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
+from app.db.types import CompressedText
 import uuid
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # 会话列表：WHERE user_id = ? ORDER BY updated_at DESC
+        Index("idx_chat_sessions_user_updated", "user_id", "updated_at"),
+        # 增量同步：WHERE user_id = ? AND sync_seq > ?
+        Index("idx_chat_sessions_user_sync", "user_id", "sync_seq"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, ForeignKey("sys_user.user_id"), nullable=False)
@@ -19,23 +26,96 @@ class ChatSession(Base):
     updated_at = Column(DateTime)
     agent_id = Column(BigInteger, nullable=False)
     ai_platform_id = Column(Integer)
+    # 冗余计数，随消息写入在同一事务内维护，会话列表无需扫描消息表
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime)
+    last_message_preview = Column(String(255))
+    # AI平台返回的会话ID（Dify conversation_id / Coze conversation），后续轮次传回以沿用上游上下文
+    platform_conversation_id = Column(String(255))
+    # 最后一次变更时分配的用户同步序号（见 app/services/sync_service.py）
+    sync_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
     
     # 关联
     user = relationship("SysUser", back_populates="sessions")
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
+    archive = relationship("ChatMessageArchive", uselist=False, cascade="all, delete-orphan")
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # 聊天记录：WHERE session_id = ? ORDER BY created_at DESC
+        Index("idx_chat_messages_session_created", "session_id", "created_at"),
+        Index("idx_chat_messages_session_sync", "session_id", "sync_seq"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
     message_type = Column(String(20), nullable=False)
-    content = Column(Text, nullable=False)
+    # 超过阈值的长回复压缩存储，读取时透明解压
+    content = Column(CompressedText(), nullable=False)
     message_metadata = Column(JSON)
     platform_response_id = Column(String(255))
     tokens_used = Column(Integer)
     processing_time = Column(Integer)
     created_at = Column(DateTime)
+    sync_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
     
     # 关联
-    session = relationship("ChatSession", back_populates="messages")
\ No newline at end of file
+    session = relationship("ChatSession", back_populates="messages")
+
+class ChatMessageArchive(Base):
+    """已归档会话的消息位置索引：消息以压缩帧形式存放在归档段文件中"""
+    __tablename__ = "chat_message_archive"
+
+    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), primary_key=True)
+    segment = Column(String(64), nullable=False)
+    offset = Column(BigInteger, nullable=False)
+    length = Column(Integer, nullable=False)
+    codec = Column(String(10), nullable=False)
+    message_count = Column(Integer, nullable=False)
+    last_message_at = Column(DateTime)
+    last_message_preview = Column(String(255))
+    archived_at = Column(DateTime, nullable=False)
+
+class ChatSyncSeq(Base):
+    """每个用户的变更序号计数器：同一用户的序号分配在行锁下进行，按提交顺序单调递增"""
+    __tablename__ = "chat_sync_seq"
+
+    user_id = Column(BigInteger, ForeignKey("sys_user.user_id"), primary_key=True)
+    seq = Column(BigInteger, nullable=False, default=0)
+
+class ChatSessionTombstone(Base):
+    """已删除会话的墓碑记录，供增量同步通知客户端删除本地缓存"""
+    __tablename__ = "chat_session_tombstones"
+    __table_args__ = (
+        Index("idx_chat_session_tombstones_user_seq", "user_id", "seq"),
+    )
+
+    session_id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, nullable=False)
+
+class ChatJob(Base):
+    """异步对话任务：提交后立即返回任务ID，由后台执行上游调用并保存结果"""
+    __tablename__ = "chat_jobs"
+    __table_args__ = (
+        Index("idx_chat_jobs_user_created", "user_id", "created_at"),
+        # 启动时恢复未完成的任务：WHERE status = ?
+        Index("idx_chat_jobs_status", "status"),
+    )
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(BigInteger, ForeignKey("sys_user.user_id"), nullable=False)
+    agent_id = Column(BigInteger, nullable=False)
+    # pending -> running -> succeeded / failed
+    status = Column(String(20), nullable=False, default="pending")
+    request = Column(JSON, nullable=False)
+    result = Column(CompressedText())
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    callback_url = Column(String(1024))
+    callback_status = Column(Integer)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
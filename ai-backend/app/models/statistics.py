@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+# 处理耗时直方图的桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS = (500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+class ChatStatistics(Base):
+    """聊天统计汇总表，按 scope（user/agent/day）+ scope_key 增量维护"""
+    __tablename__ = "chat_statistics"
+    __table_args__ = (
+        UniqueConstraint("scope", "scope_key", name="uk_chat_statistics_scope"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    scope = Column(String(10), nullable=False)
+    scope_key = Column(String(32), nullable=False)
+    message_count = Column(BigInteger, nullable=False, default=0)
+    user_message_count = Column(BigInteger, nullable=False, default=0)
+    assistant_message_count = Column(BigInteger, nullable=False, default=0)
+    tokens_used = Column(BigInteger, nullable=False, default=0)
+    processing_time_sum = Column(BigInteger, nullable=False, default=0)
+    processing_time_count = Column(BigInteger, nullable=False, default=0)
+    latency_bucket_0 = Column(BigInteger, nullable=False, default=0)
+    latency_bucket_1 = Column(BigInteger, nullable=False, default=0)
+    latency_bucket_2 = Column(BigInteger, nullable=False, default=0)
+    latency_bucket_3 = Column(BigInteger, nullable=False, default=0)
+    latency_bucket_4 = Column(BigInteger, nullable=False, default=0)
+    latency_bucket_5 = Column(BigInteger, nullable=False, default=0)
+    latency_bucket_6 = Column(BigInteger, nullable=False, default=0)
+    latency_bucket_7 = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, BigInteger, CHAR
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, BigInteger, CHAR, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -25,4 +25,18 @@ class SysUser(Base):
     remark = Column(String(500))
     
     # 关联
-    sessions = relationship("ChatSession", back_populates="user")
\ No newline at end of file
+    sessions = relationship("ChatSession", back_populates="user")
+
+class SysTokenRevocation(Base):
+    """已吊销的访问令牌（按 jti），令牌过期后可删除"""
+    __tablename__ = "sys_token_revocation"
+    __table_args__ = (
+        Index("idx_sys_token_revocation_expires", "expires_at"),
+        # 各进程按吊销时间增量同步
+        Index("idx_sys_token_revocation_revoked", "revoked_at"),
+    )
+
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from typing import Optional, List, Dict, Any
+from typing_extensions import TypedDict
 from datetime import datetime
 
 class ToolCallFunction(BaseModel):
@@ -33,6 +34,19 @@ class SendDTO(BaseModel):
     userId: Optional[int] = None
     usingContext: Optional[bool] = None
 
+class JobSubmitDTO(SendDTO):
+    callback_url: Optional[str] = None  # 任务结束后回调（POST JSON）
+
+class BatchPrompt(BaseModel):
+    id: Optional[str] = None  # 调用方自定义标识，原样返回
+    content: str
+
+class BatchSendDTO(BaseModel):
+    agent_id: str
+    prompts: List[BatchPrompt]
+    concurrency: Optional[int] = None  # 并发数，默认 BATCH_DEFAULT_CONCURRENCY
+    persist: Optional[bool] = False  # 是否把问答保存到一个新会话
+
 class GetChatListParams(BaseModel):
     content: Optional[str] = None
     createBy: Optional[int] = None
@@ -65,6 +79,9 @@ class ChatSessionResponse(BaseModel):
     agent_id: int
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_message_preview: Optional[str] = None
 
 class ChatMessageResponse(BaseModel):
     message_id: int
@@ -75,4 +92,43 @@ class ChatMessageResponse(BaseModel):
     content: Optional[str] = None
     content_type: str = "text"
     tokens: int = 0
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+# 列表接口的快速序列化：与上面的响应模型字段、顺序一致的 TypedDict，
+# 由预编译的 TypeAdapter 直接编码为 JSON 字节（不经过逐行模型校验与 jsonable_encoder）。
+# 字段按字典的插入顺序输出，构造字典时需与响应模型的字段顺序一致。
+class ChatMessageItem(TypedDict):
+    message_id: int
+    session_id: int
+    user_id: int
+    agent_id: int
+    role: str
+    content: Optional[str]
+    content_type: str
+    tokens: int
+    created_at: Optional[datetime]
+
+class ChatSessionItem(TypedDict):
+    session_id: int
+    session_name: Optional[str]
+    user_id: int
+    agent_id: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    message_count: int
+    last_message_at: Optional[datetime]
+    last_message_preview: Optional[str]
+
+ChatMessagePage = TypedDict("ChatMessagePage", {"list": List[ChatMessageItem], "total": int})
+ChatSessionPage = TypedDict("ChatSessionPage", {"list": List[ChatSessionItem], "total": int})
+
+# 与 BaseResponse 的字段顺序一致：code, data, msg, rows
+ChatMessageListBody = TypedDict(
+    "ChatMessageListBody", {"code": int, "data": ChatMessagePage, "msg": str, "rows": None}
+)
+ChatSessionListBody = TypedDict(
+    "ChatSessionListBody", {"code": int, "data": ChatSessionPage, "msg": str, "rows": None}
+)
+
+CHAT_MESSAGE_LIST_JSON = TypeAdapter(ChatMessageListBody)
+CHAT_SESSION_LIST_JSON = TypeAdapter(ChatSessionListBody)
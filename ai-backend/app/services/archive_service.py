@@ -0,0 +1,240 @@
+"""
+聊天消息冷数据归档
+
+长期不活跃会话的消息从 chat_messages 迁出，写入压缩的只追加归档段文件，
+chat_message_archive 记录每个会话所在的帧。读取聊天记录时若会话已归档，
+会把归档帧与仍在热表中的消息合并返回。
+
+重新归档或删除会话会在旧段中留下无人引用的帧，compact_segments() 定期把
+垃圾占比超过 ARCHIVE_COMPACT_MIN_GARBAGE 的段中仍被引用的帧复制到最新段并删除旧段。
+"""
+
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.models.chat import ChatMessage, ChatMessageArchive, ChatSession
+from app.services.session_counters import make_preview
+from app.utils.archive_segment import (
+    SEGMENT_SUFFIX, SegmentReader, SegmentWriter, segment_codec, segment_number
+)
+
+logger = logging.getLogger(__name__)
+
+segment_reader = SegmentReader(settings.ARCHIVE_DIR)
+
+ARCHIVE_FIELDS = (
+    "id",
+    "session_id",
+    "message_type",
+    "content",
+    "message_metadata",
+    "platform_response_id",
+    "tokens_used",
+    "processing_time",
+    "created_at",
+)
+
+# 合并段时每次读入内存再写出的字节数
+COMPACT_BATCH_BYTES = 16 * 1024 * 1024
+
+
+def message_to_dict(message: ChatMessage) -> Dict[str, Any]:
+    return {field: getattr(message, field) for field in ARCHIVE_FIELDS}
+
+
+def read_archived_messages(archive: ChatMessageArchive) -> List[Dict[str, Any]]:
+    """读取会话的归档消息（按时间正序）"""
+    try:
+        return segment_reader.read(archive.segment, archive.offset, archive.length, archive.codec)
+    except FileNotFoundError:
+        # 读取索引之后段文件被合并删除：重新读取索引中的新位置
+        db = object_session(archive)
+        if db is None:
+            raise
+        db.refresh(archive)
+        return segment_reader.read(archive.segment, archive.offset, archive.length, archive.codec)
+
+
+def _sort_key(message: Dict[str, Any]) -> Tuple[datetime, int]:
+    return message["created_at"] or datetime.min, message["id"] or 0
+
+
+class ArchiveService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_archive(self, session_id: int, user_id: int) -> Optional[ChatMessageArchive]:
+        """获取用户会话的归档索引，未归档返回 None"""
+        return self.db.query(ChatMessageArchive).join(
+            ChatSession, ChatMessageArchive.session_id == ChatSession.id
+        ).filter(
+            ChatMessageArchive.session_id == session_id,
+            ChatSession.user_id == user_id
+        ).first()
+
+    def find_inactive_sessions(self, older_than_days: int, limit: int) -> List[ChatSession]:
+        """最后一条消息早于阈值、且热表中仍有消息的会话"""
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        has_hot_messages = exists().where(ChatMessage.session_id == ChatSession.id)
+        return self.db.query(ChatSession).filter(
+            ChatSession.last_message_at < cutoff,
+            has_hot_messages
+        ).order_by(ChatSession.last_message_at).limit(limit).all()
+
+    def archive_session(self, session: ChatSession, writer: SegmentWriter) -> int:
+        """把会话的热消息（连同已有归档）写成一个新帧，返回迁出的消息数"""
+        hot_messages = self.db.query(ChatMessage).filter(
+            ChatMessage.session_id == session.id
+        ).all()
+        if not hot_messages:
+            return 0
+
+        archive = session.archive
+        messages = read_archived_messages(archive) if archive else []
+        messages.extend(message_to_dict(message) for message in hot_messages)
+        messages.sort(key=_sort_key)
+
+        # 先写段文件并刷盘，再提交索引与删除；中途失败只会留下无人引用的帧
+        segment, offset, length = writer.append(messages)
+
+        if archive is None:
+            archive = ChatMessageArchive(session_id=session.id)
+            self.db.add(archive)
+        archive.segment = segment
+        archive.offset = offset
+        archive.length = length
+        archive.codec = writer.codec
+        archive.message_count = len(messages)
+        archive.last_message_at = messages[-1]["created_at"]
+        archive.last_message_preview = make_preview(messages[-1]["content"])
+        archive.archived_at = datetime.now()
+
+        hot_ids = [message.id for message in hot_messages]
+        self.db.query(ChatMessage).filter(
+            ChatMessage.id.in_(hot_ids)
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return len(hot_ids)
+
+    def archive_inactive(self, older_than_days: Optional[int] = None,
+                         limit: int = 1000) -> Tuple[int, int]:
+        """归档不活跃会话，返回 (会话数, 消息数)"""
+        if older_than_days is None:
+            older_than_days = settings.ARCHIVE_AFTER_DAYS
+
+        writer = SegmentWriter(
+            settings.ARCHIVE_DIR, settings.ARCHIVE_CODEC, settings.ARCHIVE_SEGMENT_MAX_BYTES
+        )
+        archived_sessions = 0
+        archived_messages = 0
+        for session in self.find_inactive_sessions(older_than_days, limit):
+            try:
+                count = self.archive_session(session, writer)
+            except Exception:
+                self.db.rollback()
+                logger.exception("归档会话 %s 失败", session.id)
+                continue
+            if count:
+                archived_sessions += 1
+                archived_messages += count
+        return archived_sessions, archived_messages
+
+    def compactable_segments(self, min_garbage: float) -> List[Tuple[str, int, int]]:
+        """垃圾占比达到阈值的段，返回 [(段名, 文件字节数, 被引用字节数)]；每种算法的最新段除外"""
+        if not os.path.isdir(settings.ARCHIVE_DIR):
+            return []
+        live = dict(self.db.query(
+            ChatMessageArchive.segment, func.sum(ChatMessageArchive.length)
+        ).group_by(ChatMessageArchive.segment).all())
+
+        by_codec = defaultdict(list)
+        for name in os.listdir(settings.ARCHIVE_DIR):
+            if name.startswith("segment-") and name.endswith(tuple(SEGMENT_SUFFIX.values())):
+                by_codec[segment_codec(name)].append(name)
+
+        segments = []
+        for names in by_codec.values():
+            # 最新段仍在追加，且保留它可保证新段编号不会与已删除的段重名
+            for name in sorted(names, key=segment_number)[:-1]:
+                size = os.path.getsize(os.path.join(settings.ARCHIVE_DIR, name))
+                used = int(live.get(name) or 0)
+                if size and (size - used) / size >= min_garbage:
+                    segments.append((name, size, used))
+        return segments
+
+    def compact_segment(self, segment: str, writer: SegmentWriter) -> Optional[int]:
+        """把段中仍被引用的帧复制到最新段、更新索引后删除旧段，返回回收的字节数；未删除返回 None"""
+        path = os.path.join(settings.ARCHIVE_DIR, segment)
+        size = os.path.getsize(path)
+        archives = self.db.query(
+            ChatMessageArchive.session_id, ChatMessageArchive.offset, ChatMessageArchive.length
+        ).filter(
+            ChatMessageArchive.segment == segment
+        ).order_by(ChatMessageArchive.offset).all()
+
+        moved = []
+        with open(path, "rb") as f:
+            start = 0
+            while start < len(archives):
+                batch, frames, batch_bytes = [], [], 0
+                while start < len(archives) and (not frames or batch_bytes < COMPACT_BATCH_BYTES):
+                    archive = archives[start]
+                    f.seek(archive.offset)
+                    frames.append(f.read(archive.length))
+                    batch.append(archive)
+                    batch_bytes += archive.length
+                    start += 1
+                # 先写新帧并刷盘，再提交索引；中途失败只会在新段留下无人引用的帧
+                for archive, location in zip(batch, writer.append_frames(frames)):
+                    moved.append((archive, location))
+
+        for archive, (new_segment, new_offset, _) in moved:
+            # 带上旧位置作为条件：期间被重新归档的会话已指向别处，不覆盖
+            self.db.query(ChatMessageArchive).filter(
+                ChatMessageArchive.session_id == archive.session_id,
+                ChatMessageArchive.segment == segment,
+                ChatMessageArchive.offset == archive.offset
+            ).update({
+                ChatMessageArchive.segment: new_segment,
+                ChatMessageArchive.offset: new_offset,
+            }, synchronize_session=False)
+        self.db.commit()
+
+        if self.db.query(exists().where(ChatMessageArchive.segment == segment)).scalar():
+            logger.warning("归档段 %s 仍被引用，暂不删除", segment)
+            return None
+        os.remove(path)
+        return size - sum(archive.length for archive, _ in moved)
+
+    def compact_segments(self, min_garbage: Optional[float] = None) -> Tuple[int, int]:
+        """合并垃圾占比达到阈值的段，返回 (合并的段数, 回收的字节数)"""
+        if min_garbage is None:
+            min_garbage = settings.ARCHIVE_COMPACT_MIN_GARBAGE
+
+        writers: Dict[str, SegmentWriter] = {}
+        compacted = 0
+        reclaimed = 0
+        for segment, size, used in self.compactable_segments(min_garbage):
+            codec = segment_codec(segment)
+            try:
+                if codec not in writers:
+                    # 帧原样复制，写入同一压缩算法的最新段
+                    writers[codec] = SegmentWriter(
+                        settings.ARCHIVE_DIR, codec, settings.ARCHIVE_SEGMENT_MAX_BYTES
+                    )
+                freed = self.compact_segment(segment, writers[codec])
+            except Exception:
+                self.db.rollback()
+                logger.exception("合并归档段 %s 失败", segment)
+                continue
+            if freed is not None:
+                compacted += 1
+                reclaimed += freed
+        return compacted, reclaimed
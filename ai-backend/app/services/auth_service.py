@@ -3,6 +3,7 @@ from sqlalchemy import or_
 from app.models.user import SysUser
 from app.schemas.auth import LoginDTO, RegisterDTO, LoginVO, BaseResponse
 from app.core.security import SecurityManager
+from app.core.revocation import revocation_list
 from datetime import datetime
 
 class AuthService:
@@ -84,6 +85,12 @@ class AuthService:
         
         return BaseResponse(code=200, msg="注册成功", data=None)
 
+    def logout(self, token: str, user: SysUser) -> BaseResponse:
+        """吊销当前令牌，所有进程在 REVOCATION_SYNC_INTERVAL 秒内生效"""
+        payload = SecurityManager.verify_token(token)
+        revocation_list.revoke(self.db, payload.get("jti"), user.user_id, payload["exp"])
+        return BaseResponse(code=200, msg="登出成功", data=None)
+
     def send_email_code(self, email: str) -> BaseResponse:
         """发送邮箱验证码（模拟）"""
         return BaseResponse(code=200, msg="验证码发送成功", data=None)
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+批量对话：同一智能体的多条提示并发执行，结果按完成顺序以 NDJSON 返回
+
+认证、智能体查询与请求头/URL 构建只做一次，上游请求复用共享连接池，
+并发由固定数量的工作协程控制。适配器在解析响应时保存状态（解析缓冲、会话ID），
+每条提示各自创建。每条提示与 /chat/send 一样扣减该用户的 chat 限流桶，
+超限的条目直接返回失败。单条失败只影响该条结果：
+    {"index": 0, "id": "t-1", "ok": true, "content": "...", "elapsed_ms": 812}
+    {"index": 1, "id": "t-2", "ok": false, "error": "AI平台调用失败: 500", "elapsed_ms": 33}
+最后一行为汇总：
+    {"done": true, "total": 2, "succeeded": 1, "failed": 1, "skipped": 0, "elapsed_ms": 845}
+服务排空截止时未完成的条目计入 skipped，汇总中 interrupted 为 true。
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.adapters import AdapterFactory
+from app.adapters.http_client import get_client
+from app.core.drain import StreamHandle
+from app.core.config import settings
+from app.core.metrics import upstream_counters
+from app.core.ratelimit import rate_limiter
+from app.models.agent import AiAgentConfig
+from app.schemas.chat import BatchPrompt
+from app.services.chat_service import build_adapter_config
+from app.services.write_behind import submit_messages
+
+# 单条请求超时，与非流式对话一致
+ITEM_TIMEOUT = 120.0
+# 开启保存时每累积多少条结果提交一次
+PERSIST_BATCH = 100
+
+
+class BatchItemError(Exception):
+    pass
+
+
+def _line(data: Dict[str, Any]) -> bytes:
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class BatchRunner:
+    def __init__(self, agent_config: AiAgentConfig, user_id: int, rate_identity: Optional[str] = None):
+        # 只保留需要的字段，提交会话后 ORM 对象会过期
+        self.agent_id = agent_config.agent_id
+        self.user_id = user_id
+        # 与 RateLimitMiddleware 的身份一致（u:<用户名>），为空时不按条目限流
+        self.rate_identity = rate_identity
+        self.platform = agent_config.platform_type
+        self.upstream = upstream_counters(self.platform)
+        self.is_stream = bool(agent_config.is_stream)
+
+        self.adapter_config = build_adapter_config(agent_config)
+        # 批量结果只需要回复文本，不透传工作流事件
+        self.adapter_config["enable_workflow_events"] = False
+        adapter = AdapterFactory.create_adapter(self.platform, self.adapter_config)
+        self.headers = adapter.build_request_headers()
+        self.url = adapter.get_request_url()
+        self.client = get_client(self.platform)
+
+    async def admit(self) -> bool:
+        """为一条提示扣减 chat 限流桶"""
+        if self.rate_identity is None or not settings.RATE_LIMIT_ENABLED:
+            return True
+        allowed, _ = await rate_limiter.take(rate_limiter.policies["chat"], self.rate_identity)
+        return allowed
+
+    async def call(self, content: str) -> str:
+        """执行一条提示，返回完整回复"""
+        # 并发的条目不能共用适配器：流式解析的缓冲与会话ID保存在实例上
+        adapter = AdapterFactory.create_adapter(self.platform, self.adapter_config)
+        payload = adapter.build_request_payload(content, str(self.user_id), self.is_stream)
+        if self.is_stream:
+            async with self.client.stream(
+                "POST", self.url, headers=self.headers, json=payload, timeout=ITEM_TIMEOUT
+            ) as response:
+                self.upstream.status(response.status_code).inc()
+                if response.status_code != 200:
+                    raise BatchItemError(f"AI平台调用失败: {response.status_code}")
+                parts = []
+                async for chunk in adapter.parse_stream_response(response):
+                    if chunk:
+                        parts.append(chunk)
+                return "".join(parts)
+
+        response = await self.client.post(
+            self.url, headers=self.headers, json=payload, timeout=ITEM_TIMEOUT
+        )
+        self.upstream.status(response.status_code).inc()
+        if response.status_code != 200:
+            raise BatchItemError(f"AI平台调用失败: {response.status_code}")
+        return await adapter.parse_blocking_response(response)
+
+    async def run(self, prompts: List[BatchPrompt], concurrency: int, handle: StreamHandle,
+                  db: Session, session_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """并发执行全部提示，按完成顺序输出 NDJSON 行；session_id 不为空时保存问答"""
+        started_at = time.perf_counter()
+        results: asyncio.Queue = asyncio.Queue()
+        indexes = iter(range(len(prompts)))
+
+        async def worker():
+            # 各工作协程共享同一个下标迭代器，取下一条不会跨越 await
+            for index in indexes:
+                if handle.interrupted:
+                    return
+                prompt = prompts[index]
+                item_started = time.perf_counter()
+                result = {"index": index, "id": prompt.id}
+                if not await self.admit():
+                    result.update(ok=False, error="请求过于频繁，请稍后再试", elapsed_ms=0)
+                    await results.put(result)
+                    continue
+                try:
+                    content = await handle.until_interrupted(self.call(prompt.content))
+                    if content is None:
+                        return
+                    result.update(ok=True, content=content)
+                except Exception as e:
+                    if isinstance(e, BatchItemError):
+                        error = str(e)
+                    else:
+                        self.upstream.error.inc()
+                        error = f"网络请求错误: {str(e)}"
+                    result.update(ok=False, error=error)
+                result["elapsed_ms"] = int((time.perf_counter() - item_started) * 1000)
+                await results.put(result)
+
+        async def supervise(workers):
+            await asyncio.wait(workers)
+            await results.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(prompts)))]
+        supervisor = asyncio.create_task(supervise(workers))
+
+        succeeded = failed = 0
+        rows: List[Dict[str, Any]] = []
+        try:
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+                if result["ok"]:
+                    succeeded += 1
+                else:
+                    failed += 1
+                if session_id is not None and result["ok"]:
+                    rows.extend(self._message_rows(
+                        session_id, prompts[result["index"]].content, result["content"],
+                        result["elapsed_ms"]
+                    ))
+                    if len(rows) >= PERSIST_BATCH * 2:
+                        submit_messages(db, rows)
+                        rows = []
+                yield _line(result)
+
+            if rows:
+                submit_messages(db, rows)
+            summary = {
+                "done": True,
+                "total": len(prompts),
+                "succeeded": succeeded,
+                "failed": failed,
+                "skipped": len(prompts) - succeeded - failed,
+                "elapsed_ms": int((time.perf_counter() - started_at) * 1000),
+            }
+            if handle.interrupted:
+                summary["interrupted"] = True
+            if session_id is not None:
+                summary["session_id"] = session_id
+            yield _line(summary)
+        finally:
+            # 客户端断开时停止剩余条目
+            for task in workers:
+                task.cancel()
+            supervisor.cancel()
+
+    def _message_rows(self, session_id: int, prompt: str, content: str,
+                      elapsed_ms: int) -> List[Dict[str, Any]]:
+        now = datetime.now()
+        common = {
+            "session_id": session_id,
+            "user_id": self.user_id,
+            "agent_id": self.agent_id,
+            "created_at": now,
+        }
+        return [
+            dict(common, message_type="user", content=prompt),
+            dict(common, message_type="assistant", content=content, processing_time=elapsed_ms),
+        ]
@@ -0,0 +1,203 @@
+"""
+WebSocket 多路复用聊天
+
+一个连接同时承载多个对话流（浏览器对同一域名的并发连接数有限，
+同时使用多个智能体时 SSE 会占满连接）。帧为紧凑的 JSON 数组，第一个元素是操作：
+
+客户端 -> 服务端
+    ["auth", token]                    连接后的第一个帧，携带 JWT（不放在 URL 中，避免进入访问日志）；
+                                       AUTH_TIMEOUT 秒内未收到或令牌无效时以 1008 关闭连接
+    ["send", id, {SendDTO}, window?]   开始一个流，id 由客户端指定，window 为初始额度
+    ["cancel", id]                     取消流（已生成的内容照常保存）
+    ["credit", id, n]                  追加 n 个分片的额度
+
+服务端 -> 客户端
+    ["d", id, text]                    数据分片（与 SSE 的 data 内容相同）
+    ["end", id, reason]                流结束：done、cancelled、interrupted（服务排空）
+    ["err", id, msg, code]             出错；id 为 null 表示连接级错误
+
+每个 send 与 POST /chat/send 一样扣减该用户的 chat 限流桶，超限时返回 ["err", id, msg, 429]。
+
+流量控制按分片计数：每个流发送一个数据分片消耗一个额度，额度用完后暂停读取上游，
+直到客户端发送 credit，慢的流不会拖住同一连接上的其他流。
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.drain import StreamHandle, drain_controller
+from app.core.metrics import CHAT_ACTIVE_STREAMS
+from app.core.ratelimit import rate_limiter
+from app.db.database import SessionLocal
+from app.schemas.chat import SendDTO
+from app.services.chat_service import ChatService
+
+logger = logging.getLogger(__name__)
+
+AUTH_TIMEOUT = 10.0
+DEFAULT_WINDOW = 64
+MAX_WINDOW = 1024
+MAX_STREAMS_PER_CONNECTION = 16
+
+
+async def receive_auth_token(websocket: WebSocket) -> Optional[str]:
+    """读取第一个帧 ["auth", token]，超时、断开或格式不对时返回 None"""
+    try:
+        message = await asyncio.wait_for(websocket.receive_text(), AUTH_TIMEOUT)
+        op, token = json.loads(message)
+    except (asyncio.TimeoutError, WebSocketDisconnect, ValueError, TypeError, KeyError):
+        return None
+    if op != "auth" or not isinstance(token, str):
+        return None
+    return token
+
+
+class _Stream:
+    def __init__(self, window: int):
+        self.credit = window
+        self.cancelled = False
+        self.handle: Optional[StreamHandle] = None
+        self.task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        if window > 0:
+            self._ready.set()
+
+    def grant(self, n: int) -> None:
+        self.credit = min(self.credit + n, MAX_WINDOW)
+        if self.credit > 0:
+            self._ready.set()
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self.handle is not None:
+            self.handle.interrupt()
+        self._ready.set()
+
+    async def acquire(self) -> bool:
+        """消耗一个额度，额度为0时等待；流被取消或中断时返回 False"""
+        while self.credit <= 0 and not self.cancelled:
+            self._ready.clear()
+            if await self.handle.until_interrupted(self._ready.wait()) is None:
+                return False
+        if self.cancelled:
+            return False
+        self.credit -= 1
+        return True
+
+
+class ChatStreamMux:
+    def __init__(self, websocket: WebSocket, user_id: int, user_name: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        # 与 RateLimitMiddleware 按 JWT sub 计数的身份一致，共享同一个桶
+        self.rate_identity = f"u:{user_name}"
+        self._streams: Dict[Any, _Stream] = {}
+        self._send_lock = asyncio.Lock()
+        self._closed = False
+
+    async def _send(self, frame: list) -> None:
+        if self._closed:
+            return
+        text = json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+        async with self._send_lock:
+            try:
+                await self.websocket.send_text(text)
+            except (WebSocketDisconnect, RuntimeError):
+                self._closed = True
+
+    async def serve(self) -> None:
+        try:
+            while True:
+                message = await self.websocket.receive_text()
+                try:
+                    frame = json.loads(message)
+                    op, stream_id = frame[0], frame[1]
+                    if not isinstance(stream_id, (int, str)):
+                        raise TypeError(stream_id)
+                except (ValueError, TypeError, IndexError, KeyError):
+                    await self._send(["err", None, "帧格式错误", 400])
+                    continue
+                if op == "send":
+                    await self._open(stream_id, frame)
+                elif op == "cancel":
+                    stream = self._streams.get(stream_id)
+                    if stream is not None:
+                        stream.cancel()
+                elif op == "credit":
+                    stream = self._streams.get(stream_id)
+                    if stream is not None and len(frame) > 2 and isinstance(frame[2], int):
+                        stream.grant(frame[2])
+                else:
+                    await self._send(["err", stream_id, f"未知操作: {op}", 400])
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._closed = True
+            # 连接断开：中断所有流（各自保存已生成内容）并等待结束
+            streams = list(self._streams.values())
+            for stream in streams:
+                stream.cancel()
+            tasks = [stream.task for stream in streams if stream.task is not None]
+            if tasks:
+                await asyncio.wait(tasks)
+
+    async def _open(self, stream_id, frame: list) -> None:
+        if stream_id in self._streams:
+            await self._send(["err", stream_id, "流ID已在使用", 409])
+            return
+        if len(self._streams) >= MAX_STREAMS_PER_CONNECTION:
+            await self._send(["err", stream_id, "并发流数量超过上限", 429])
+            return
+        if not drain_controller.admit():
+            await self._send(["err", stream_id, "服务正在重启，请稍后重试", 503])
+            return
+        try:
+            send_dto = SendDTO(**frame[2])
+            window = int(frame[3]) if len(frame) > 3 else DEFAULT_WINDOW
+        except (ValidationError, TypeError, ValueError, IndexError) as e:
+            await self._send(["err", stream_id, f"参数错误: {e}", 400])
+            return
+        if settings.RATE_LIMIT_ENABLED:
+            allowed, _ = await rate_limiter.take(rate_limiter.policies["chat"], self.rate_identity)
+            if not allowed:
+                await self._send(["err", stream_id, "请求过于频繁，请稍后再试", 429])
+                return
+
+        stream = _Stream(min(max(window, 0), MAX_WINDOW))
+        self._streams[stream_id] = stream
+        stream.task = asyncio.create_task(self._run(stream_id, stream, send_dto))
+
+    async def _run(self, stream_id, stream: _Stream, send_dto: SendDTO) -> None:
+        # 每个流独立的数据库会话，并发的流之间不共享事务
+        db = SessionLocal()
+        CHAT_ACTIVE_STREAMS.inc()
+        try:
+            with drain_controller.track(self.user_id) as handle:
+                stream.handle = handle
+                if stream.cancelled:
+                    handle.interrupt()
+                async for chunk in ChatService(db).send_message(send_dto, self.user_id, handle):
+                    # 取消后继续消费，让 send_message 保存已生成的内容
+                    if stream.cancelled or not await stream.acquire():
+                        continue
+                    await self._send(["d", stream_id, chunk])
+            if stream.cancelled:
+                reason = "cancelled"
+            elif handle.interrupted:
+                reason = "interrupted"
+            else:
+                reason = "done"
+            await self._send(["end", stream_id, reason])
+        except Exception as e:
+            logger.exception("WebSocket 流 %s 出错", stream_id)
+            await self._send(["err", stream_id, str(e), 500])
+        finally:
+            CHAT_ACTIVE_STREAMS.dec()
+            db.close()
+            self._streams.pop(stream_id, None)
@@ -1,23 +1,248 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
-from typing import List, Optional, Dict, Any, AsyncGenerator
+from sqlalchemy import and_, desc, or_
+from typing import List, Optional, Dict, Any, AsyncGenerator, Union
 import httpx
 import json
 import uuid
+import time
 from datetime import datetime
 from app.models.chat import ChatSession, ChatMessage
 from app.models.user import SysUser
 from app.models.agent import AiAgentConfig
-from app.schemas.chat import SendDTO, GetChatListParams, ChatMessageResponse, ChatSessionResponse
+from app.schemas.chat import SendDTO, GetChatListParams, ChatMessageResponse
 from app.schemas.auth import BaseResponse
 from app.adapters import AdapterFactory
+from app.adapters.http_client import get_client
+from app.core.config import settings
+from app.core.metrics import chat_stream_metrics, upstream_counters
+from app.core import tracing
+from app.core.drain import StreamHandle
+from app.db import statements
+from app.db.types import compressed_clause
+from app.services.search_service import (
+    SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, search_available, search_indexer
+)
+from app.services.sync_service import allocate_seqs
+from app.services.write_behind import message_writer, submit_messages
+from app.services.archive_service import ArchiveService, message_to_dict, read_archived_messages
+
+def build_adapter_config(agent_config: AiAgentConfig) -> Dict[str, Any]:
+    """智能体配置 -> 适配器配置"""
+    return {
+        'base_url': agent_config.base_url,
+        'api_key': agent_config.api_key,
+        'agent_key': agent_config.agent_key,
+        'bot_id': agent_config.bot_id,
+        'access_token': agent_config.access_token,
+        'enable_workflow_events': True,  # 启用Dify工作流事件透传，包括workflow_started事件
+        'agent_id': agent_config.agent_id  # 添加agent_id参数，用于chat-messages格式
+    }
+
+# 聊天记录可选返回字段 -> 所需的列与取值方式（与 ChatMessageResponse 一致）
+MESSAGE_FIELD_COLUMNS = {
+    "message_id": (ChatMessage.id,),
+    "session_id": (ChatMessage.session_id,),
+    "user_id": (ChatSession.user_id,),
+    "agent_id": (ChatSession.agent_id,),
+    "role": (ChatMessage.message_type,),
+    "content": (ChatMessage.content,),
+    "content_type": (),
+    "tokens": (ChatMessage.message_type, ChatMessage.tokens_used),
+    "created_at": (ChatMessage.created_at,),
+}
+MESSAGE_FIELD_VALUES = {
+    "message_id": lambda value: value,
+    "session_id": lambda value: value,
+    "user_id": lambda value: value,
+    "agent_id": lambda value: value,
+    "role": lambda value: value,
+    "content": lambda value: value,
+    "content_type": lambda: "text",
+    # 用户消息不包含token统计
+    "tokens": lambda message_type, tokens_used: 0 if message_type == "user" else (tokens_used or 0),
+    "created_at": lambda value: value,
+}
+
+# 列表接口查询的列（按 ChatMessageResponse / ChatSessionResponse 的字段顺序），只取元组不加载 ORM 对象
+MESSAGE_LIST_COLUMNS = (
+    ChatMessage.id, ChatMessage.session_id, ChatSession.user_id, ChatSession.agent_id,
+    ChatMessage.message_type, ChatMessage.content, ChatMessage.tokens_used, ChatMessage.created_at,
+)
+SESSION_LIST_COLUMNS = (
+    ChatSession.id, ChatSession.title, ChatSession.user_id, ChatSession.agent_id,
+    ChatSession.created_at, ChatSession.updated_at, ChatSession.message_count,
+    ChatSession.last_message_at, ChatSession.last_message_preview,
+)
+
+# 内容搜索时每批解压匹配的压缩消息数
+COMPRESSED_SEARCH_BATCH = 500
+
+def new_session_title() -> str:
+    return f"新会话 {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+
+def parse_message_fields(fields: Optional[str]) -> List[str]:
+    """解析 fields 参数，为空时返回全部字段"""
+    if not fields:
+        return list(MESSAGE_FIELD_COLUMNS)
+    names = []
+    for name in fields.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in MESSAGE_FIELD_COLUMNS:
+            raise ValueError(f"不支持的字段: {name}")
+        if name not in names:
+            names.append(name)
+    return names
+
+def truncate_content(item: Dict[str, Any], preview_length: Optional[int]) -> Dict[str, Any]:
+    """按 preview_length 截断 content，被截断时附加 truncated 标记"""
+    content = item.get("content")
+    if preview_length and content and len(content) > preview_length:
+        item["content"] = content[:preview_length]
+        item["truncated"] = True
+    return item
+
+def project_message(item: Dict[str, Any], projection: List[str],
+                    preview_length: Optional[int]) -> Dict[str, Any]:
+    return truncate_content({name: item[name] for name in projection}, preview_length)
 
 class ChatService:
     def __init__(self, db: Session):
         self.db = db
 
-    async def send_message(self, send_dto: SendDTO, user_id: int) -> AsyncGenerator[str, None]:
-        """发送消息到AI平台并返回流式响应"""
+    def _save_message(self, session_id: int, user_id: int, agent_id: int,
+                      message_type: str, content: str, **fields) -> None:
+        """保存消息（启用write-behind时异步批量落库）"""
+        row = {
+            "session_id": session_id,
+            "user_id": user_id,
+            "agent_id": agent_id,
+            "message_type": message_type,
+            "content": content,
+            "created_at": datetime.now(),
+        }
+        row.update(fields)
+        with tracing.span("db.save_message", message_type=message_type):
+            submit_messages(self.db, [row])
+
+    def save_user_message(self, session_id: int, user_id: int, agent_id: int, send_dto: SendDTO) -> None:
+        self._save_message(
+            session_id, user_id, agent_id, "user",
+            send_dto.messages[-1].content if send_dto.messages else ""
+        )
+
+    def _remember_conversation(self, session_id: int, user_id: int, stored: Optional[str],
+                               conversation_id: Optional[str]) -> None:
+        """保存上游返回的平台会话ID（通常只在会话的第一轮写入）"""
+        if not conversation_id or conversation_id == stored:
+            return
+        with tracing.span("db.save_conversation_id"):
+            self.db.query(ChatSession).filter(
+                ChatSession.id == session_id, ChatSession.user_id == user_id
+            ).update(
+                {"platform_conversation_id": conversation_id}, synchronize_session=False
+            )
+            self.db.commit()
+
+    def _check_stale_conversation(self, session_id: int, user_id: int, stored: Optional[str],
+                                  status_code: int) -> None:
+        """平台会话已失效（Dify 对不存在的会话返回 404）时清除，下一轮开启新对话"""
+        if stored and status_code == 404:
+            self.db.query(ChatSession).filter(
+                ChatSession.id == session_id, ChatSession.user_id == user_id
+            ).update(
+                {"platform_conversation_id": None}, synchronize_session=False
+            )
+            self.db.commit()
+
+    def get_active_agent(self, agent_id: int) -> Optional[AiAgentConfig]:
+        """按ID查询可用的智能体"""
+        return self.db.execute(statements.active_agent(agent_id)).scalars().first()
+
+    def create_session(self, user_id: int, agent_id: int, title: str) -> int:
+        """新建会话并返回ID（Core INSERT，不提交；同步序号在此分配，ORM 的 before_flush 不会经过）"""
+        seq = allocate_seqs(self.db, [user_id])[user_id]
+        # 经 Connection 执行（Session.execute 会走 ORM 批量插入，拿不到 inserted_primary_key）
+        result = self.db.connection().execute(statements.INSERT_SESSION, {
+            "title": title, "user_id": user_id, "agent_id": agent_id, "sync_seq": seq
+        })
+        return result.inserted_primary_key[0]
+
+    # 热点查询单独构建，check_query_plans.py 会对它们执行 EXPLAIN
+
+    def _message_scope(self, params: GetChatListParams, user_id: int, entities):
+        """按用户、会话与角色筛选的消息查询"""
+        query = self.db.query(*entities).select_from(ChatMessage).join(
+            ChatSession, ChatMessage.session_id == ChatSession.id
+        ).filter(ChatSession.user_id == user_id)
+        
+        if params.sessionId:
+            query = query.filter(ChatMessage.session_id == params.sessionId)
+        
+        if params.role:
+            query = query.filter(ChatMessage.message_type == params.role)
+        
+        return query
+
+    def _compressed_matches(self, params: GetChatListParams, user_id: int) -> List[int]:
+        """
+        压缩存储的消息无法用 LIKE 匹配：按批读取范围内的压缩消息，解压后匹配，返回命中的消息ID
+
+        从最新的消息往前按ID分批扫描，最多解压 MESSAGE_COMPRESSED_SEARCH_MAX_SCAN 条，
+        更早的压缩消息不参与匹配（搜索范围可通过 sessionId、时间条件缩小）
+        """
+        query = self._message_scope(params, user_id, (ChatMessage.id, ChatMessage.content)).filter(
+            compressed_clause(ChatMessage.content)
+        )
+        remaining = settings.MESSAGE_COMPRESSED_SEARCH_MAX_SCAN
+        matched = []
+        last_id = None
+        while remaining > 0:
+            batch = query
+            if last_id is not None:
+                batch = batch.filter(ChatMessage.id < last_id)
+            rows = batch.order_by(desc(ChatMessage.id)).limit(min(COMPRESSED_SEARCH_BATCH, remaining)).all()
+            if not rows:
+                break
+            remaining -= len(rows)
+            last_id = rows[-1].id
+            matched.extend(row.id for row in rows if params.content in row.content)
+        return matched
+
+    def chat_list_query(self, params: GetChatListParams, user_id: int, columns=None):
+        """聊天记录查询（未分页、未排序）；columns 为空时查询完整的消息与会话"""
+        query = self._message_scope(params, user_id, columns or (ChatMessage, ChatSession))
+        
+        if params.content:
+            condition = ChatMessage.content.contains(params.content)
+            with tracing.span("db.compressed_search"):
+                matched = self._compressed_matches(params, user_id)
+            if matched:
+                condition = or_(condition, ChatMessage.id.in_(matched))
+            query = query.filter(condition)
+        
+        return query
+
+    def sessions_query(self, user_id: int):
+        """用户会话列表查询（列元组）"""
+        return self.db.query(*SESSION_LIST_COLUMNS).filter(
+            ChatSession.user_id == user_id
+        ).order_by(desc(ChatSession.updated_at))
+
+    async def send_message(self, send_dto: SendDTO, user_id: int,
+                           stream_handle: Optional[StreamHandle] = None,
+                           allow_passthrough: bool = False,
+                           save_user_message: bool = True) -> AsyncGenerator[Union[str, bytes], None]:
+        """
+        发送消息到AI平台并返回流式响应
+
+        stream_handle 由排空模式登记，截止时中断流式读取，已生成的部分内容照常保存；
+        allow_passthrough 为 True 且智能体开启 stream_passthrough 时，
+        输出上游原始SSE字节（bytes，调用方原样发送），否则输出回答文本片段；
+        save_user_message 为 False 时不再保存用户消息（调用方已保存）
+        """
+        started_at = time.perf_counter()
         
         # 获取用户选择的智能体配置
         try:
@@ -26,196 +251,363 @@ class ChatService:
             yield json.dumps({"error": "智能体ID格式无效"})
             return
             
-        agent_config = self.db.query(AiAgentConfig).filter(
-            and_(AiAgentConfig.agent_id == agent_id, AiAgentConfig.is_active == True)
-        ).first()
+        with tracing.span("db.agent_query", agent_id=agent_id):
+            agent_config = self.get_active_agent(agent_id)
         
         if not agent_config:
             yield json.dumps({"error": "智能体配置不存在"})
             return
+        platform = agent_config.platform_type
+        upstream = upstream_counters(platform)
 
         # 创建或获取会话
+        conversation_id = None
+        same_agent = True
         if not send_dto.sessionId:
-            session = ChatSession(
-                title=f"新会话 {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                user_id=user_id,
-                agent_id=agent_config.agent_id
-            )
-            self.db.add(session)
-            self.db.commit()
-            self.db.refresh(session)
-            session_id = session.id
+            with tracing.span("db.create_session"):
+                session_id = self.create_session(user_id, agent_config.agent_id, new_session_title())
+                self.db.commit()
         else:
             session_id = send_dto.sessionId
+            with tracing.span("db.conversation_lookup"):
+                row = self.db.execute(statements.session_conversation(session_id, user_id)).first()
+            if row is None:
+                yield json.dumps({"error": "会话不存在"})
+                return
+            # 平台会话ID只在同一智能体下有效，切换智能体时开启新的上游对话
+            same_agent = row.agent_id == agent_config.agent_id
+            if same_agent:
+                conversation_id = row.platform_conversation_id
 
-        # 保存用户消息
-        user_message = ChatMessage(
-            session_id=session_id,
-            message_type="user",
-            content=send_dto.messages[-1].content if send_dto.messages else "",
-            created_at=datetime.now()
-        )
-        self.db.add(user_message)
-        self.db.commit()
+        # 保存用户消息（异步任务在调用前已保存）
+        if save_user_message:
+            self.save_user_message(session_id, user_id, agent_config.agent_id, send_dto)
 
         try:
             # 使用适配器工厂创建适配器
-            adapter_config = {
-                'base_url': agent_config.base_url,
-                'api_key': agent_config.api_key,
-                'agent_key': agent_config.agent_key,
-                'bot_id': agent_config.bot_id,
-                'access_token': agent_config.access_token,
-                'enable_workflow_events': True,  # 启用Dify工作流事件透传，包括workflow_started事件
-                'agent_id': agent_config.agent_id  # 添加agent_id参数，用于chat-messages格式
-            }
-            
-            adapter = AdapterFactory.create_adapter(
-                agent_config.platform_type, 
-                adapter_config
-            )
-            
-            
+            adapter_config = build_adapter_config(agent_config)
             
             # 获取用户消息
             user_message_content = send_dto.messages[-1].content if send_dto.messages else ""
             
-            # 构建请求
-            headers = adapter.build_request_headers()
+            with tracing.span("adapter.build", platform=platform):
+                adapter = AdapterFactory.create_adapter(
+                    agent_config.platform_type, 
+                    adapter_config
+                )
+                
+                # 构建请求（上游在 TRACE_PROPAGATE_HOSTS 中时附带 traceparent）
+                url = adapter.get_request_url()
+                headers = tracing.inject_traceparent(adapter.build_request_headers(), url)
+                payload = adapter.build_request_payload(
+                    user_message_content, 
+                    str(user_id), 
+                    send_dto.stream and agent_config.is_stream,  # 根据is_stream配置决定是否流式
+                    conversation_id=conversation_id or ""
+                )
             
-            # 准备额外参数以支持chat-messages格式
-            conversation_id = str(session_id) if session_id else ""
+            # 等待上游期间不占用数据库连接（已加载的对象仍可读取，之后保存消息时重新获取连接）
+            self.db.close()
             
-            payload = adapter.build_request_payload(
-                user_message_content, 
-                str(user_id), 
-                send_dto.stream and agent_config.is_stream,  # 根据is_stream配置决定是否流式
-                conversation_id=conversation_id
-            )
-            url = adapter.get_request_url()
-            
-            async with httpx.AsyncClient() as client:
-                if send_dto.stream and agent_config.is_stream:
-                    # 流式响应
-                    async with client.stream(
-                        "POST",
-                        url,
-                        headers=headers,
-                        json=payload,
-                        timeout=30.0
-                    ) as response:
-                        if response.status_code == 200:
-                            # 收集完整内容并透传
-                            full_content = ""
-                            async for content_chunk in adapter.parse_stream_response(response):
+            # 共享客户端复用到平台的连接（启用录制时为录制客户端）
+            client = get_client(platform)
+            if send_dto.stream and agent_config.is_stream:
+                # 流式响应
+                phases = tracing.HttpxPhases()
+                request_started_at = time.time()
+                request = client.build_request(
+                    "POST",
+                    url,
+                    headers=headers,
+                    json=payload,
+                    timeout=30.0,
+                    extensions={"trace": phases}
+                )
+                if stream_handle is None:
+                    response = await client.send(request, stream=True)
+                else:
+                    # 等待响应头期间同样可被排空截止中断
+                    response = await stream_handle.until_interrupted(client.send(request, stream=True))
+                    if response is None:
+                        yield json.dumps({"error": "服务正在重启，请重新发送"})
+                        return
+                try:
+                    phases.record(request_started_at)
+                    upstream.status(response.status_code).inc()
+                    if response.status_code == 200:
+                        # 收集完整内容并透传
+                        full_content = ""
+                        chunk_count = 0
+                        first_chunk_at = None
+                        passthrough = (
+                            allow_passthrough and agent_config.stream_passthrough
+                            and adapter.supports_passthrough
+                        )
+                        stream_metrics = chat_stream_metrics(agent_config.agent_id, platform)
+                        if passthrough:
+                            chunks = adapter.stream_passthrough(response)
+                        else:
+                            chunks = adapter.parse_stream_response(response)
+                        if stream_handle is not None:
+                            chunks = stream_handle.interruptible(chunks)
+                        with tracing.span("upstream.stream") as stream_span:
+                            async for content_chunk in chunks:
                                 if content_chunk:
-                                    full_content += content_chunk
+                                    if first_chunk_at is None:
+                                        first_chunk_at = time.perf_counter()
+                                        stream_metrics.ttft.observe(
+                                            first_chunk_at - started_at
+                                        )
+                                    chunk_count += 1
+                                    if not passthrough:
+                                        full_content += content_chunk
                                     yield content_chunk
-                           
-                            # 保存助手回复的完整内容
-                            assistant_message = ChatMessage(
-                                session_id=session_id,
-                                message_type="assistant",
-                                content=full_content,
-                                created_at=datetime.now()
+                            if passthrough:
+                                full_content = adapter.scanner.answer
+                            if stream_span is not None:
+                                stream_span.set(chunks=chunk_count, chars=len(full_content))
+                            
+                        if chunk_count > 1:
+                            stream_metrics.tokens_per_second.observe(
+                                (chunk_count - 1) / max(time.perf_counter() - first_chunk_at, 1e-6)
                             )
-                            self.db.add(assistant_message)
-                            self.db.commit()
-                        else:
-                            yield json.dumps({"error": f"AI平台调用失败: {response.status_code}"})
-                else:
-                    # 非流式响应
-                    response = await client.post(
-                        url,
-                        headers=headers,
-                        json=payload,
-                        timeout=120.0
-                    )
+                           
+                        # 保存助手回复的完整内容（排空截止时为已生成的部分）
+                        self._save_message(
+                            session_id, user_id, agent_config.agent_id, "assistant",
+                            full_content,
+                            processing_time=int((time.perf_counter() - started_at) * 1000),
+                            tokens_used=adapter.scanner.total_tokens if passthrough else None
+                        )
+                        if same_agent:
+                            self._remember_conversation(session_id, user_id, conversation_id, adapter.conversation_id)
+                        if stream_handle is not None and stream_handle.interrupted:
+                            if passthrough and adapter.scanner.partial:
+                                # 先结束已转发了一半的事件
+                                yield b"\n\n"
+                            yield json.dumps({"error": "服务正在重启，回复已中断（已生成的内容已保存）"})
+                    else:
+                        self._check_stale_conversation(session_id, user_id, conversation_id, response.status_code)
+                        yield json.dumps({"error": f"AI平台调用失败: {response.status_code}"})
+                finally:
+                    await response.aclose()
+            else:
+                # 非流式响应
+                phases = tracing.HttpxPhases()
+                request_started_at = time.time()
+                response = await client.post(
+                    url,
+                    headers=headers,
+                    json=payload,
+                    timeout=120.0,
+                    extensions={"trace": phases}
+                )
+                phases.record(request_started_at)
+                upstream.status(response.status_code).inc()
                     
-                    try:
-                        content = await adapter.parse_blocking_response(response)
+                try:
+                    self._check_stale_conversation(session_id, user_id, conversation_id, response.status_code)
+                    content = await adapter.parse_blocking_response(response)
                         
-                        # 保存助手回复
-                        assistant_message = ChatMessage(
-                            session_id=session_id,
-                            message_type="assistant",
-                            content=content,
-                            created_at=datetime.now()
-                        )
-                        self.db.add(assistant_message)
-                        self.db.commit()
+                    # 保存助手回复
+                    self._save_message(
+                        session_id, user_id, agent_config.agent_id, "assistant",
+                        content,
+                        processing_time=int((time.perf_counter() - started_at) * 1000)
+                    )
+                    if same_agent:
+                        self._remember_conversation(session_id, user_id, conversation_id, adapter.conversation_id)
                         
-                        yield json.dumps({"content": content})
-                    except Exception as e:
-                        yield json.dumps({"error": str(e)})
+                    yield json.dumps({"content": content})
+                except Exception as e:
+                    yield json.dumps({"error": str(e)})
                         
         except Exception as e:
+            if isinstance(e, httpx.HTTPError):
+                upstream.error.inc()
             yield json.dumps({"error": f"网络请求错误: {str(e)}"})
 
-    def get_chat_list(self, params: GetChatListParams, user_id: int) -> BaseResponse:
-        """获取聊天记录列表"""
+    def get_chat_list(self, params: GetChatListParams, user_id: int,
+                      fields: Optional[str] = None, preview_length: Optional[int] = None) -> BaseResponse:
+        """
+        获取聊天记录列表
+
+        fields 为逗号分隔的返回字段（只查询所需的列），preview_length 截断 content；
+        调用方先 await flush_pending(user_id)，读到本进程尚未落库的消息
+        """
+        if preview_length is not None and preview_length < 1:
+            return BaseResponse(code=400, msg="previewLength 应为正整数", data=None)
         
-        query = self.db.query(ChatMessage, ChatSession).join(
-            ChatSession, ChatMessage.session_id == ChatSession.id
-        ).filter(ChatSession.user_id == user_id)
+        projection = None
+        if fields or preview_length:
+            try:
+                projection = parse_message_fields(fields)
+            except ValueError as e:
+                return BaseResponse(code=400, msg=str(e), data=None)
         
+        # 会话已归档时合并归档段与热表中的消息
         if params.sessionId:
-            query = query.filter(ChatMessage.session_id == params.sessionId)
+            with tracing.span("db.archive_lookup"):
+                archive = ArchiveService(self.db).get_archive(params.sessionId, user_id)
+            if archive is not None:
+                result = self._get_archived_chat_list(params, user_id, archive)
+                if projection is not None:
+                    result.data["list"] = [
+                        project_message(item, projection, preview_length) for item in result.data["list"]
+                    ]
+                return result
         
-        if params.content:
-            query = query.filter(ChatMessage.content.contains(params.content))
+        if projection is not None:
+            return self._get_projected_chat_list(params, user_id, projection, preview_length)
         
-        if params.role:
-            query = query.filter(ChatMessage.message_type == params.role)
+        query = self.chat_list_query(params, user_id, MESSAGE_LIST_COLUMNS)
         
         # 分页
-        total = query.count()
-        results = query.order_by(desc(ChatMessage.created_at)).offset(
-            (params.pageNum - 1) * params.pageSize
-        ).limit(params.pageSize).all()
+        with tracing.span("db.chat_list_count"):
+            total = query.count()
+        with tracing.span("db.chat_list_page", page=params.pageNum, size=params.pageSize):
+            rows = query.order_by(desc(ChatMessage.created_at)).offset(
+                (params.pageNum - 1) * params.pageSize
+            ).limit(params.pageSize).all()
+        
+        # 转换为响应格式（与 ChatMessageResponse.dict() 相同的键与顺序）
+        message_list = [
+            {
+                "message_id": message_id,
+                "session_id": session_id,
+                "user_id": owner_id,
+                "agent_id": agent_id,
+                "role": message_type,
+                "content": content,
+                "content_type": "text",
+                "tokens": 0 if message_type == "user" else (tokens_used or 0),  # 用户消息不包含token统计
+                "created_at": created_at,
+            }
+            for message_id, session_id, owner_id, agent_id, message_type, content, tokens_used, created_at in rows
+        ]
+        
+        return BaseResponse(
+            code=200,
+            msg="获取成功",
+            data={"list": message_list, "total": total}
+        )
+
+    def _get_projected_chat_list(self, params: GetChatListParams, user_id: int,
+                                 projection: List[str], preview_length: Optional[int]) -> BaseResponse:
+        """只查询所需列的聊天记录列表"""
+        columns = []
+        for name in projection:
+            for column in MESSAGE_FIELD_COLUMNS[name]:
+                if column not in columns:
+                    columns.append(column)
+        # 只请求 content_type 时也至少查询一列
+        if not columns:
+            columns.append(ChatMessage.id)
+        query = self.chat_list_query(params, user_id, columns)
+        
+        with tracing.span("db.chat_list_count"):
+            total = query.count()
+        with tracing.span("db.chat_list_page", page=params.pageNum, size=params.pageSize):
+            rows = query.order_by(desc(ChatMessage.created_at)).offset(
+                (params.pageNum - 1) * params.pageSize
+            ).limit(params.pageSize).all()
         
-        # 转换为响应格式
         message_list = []
-        for msg, session in results:
+        for row in rows:
+            values = row._mapping
+            item = {}
+            for name in projection:
+                item[name] = MESSAGE_FIELD_VALUES[name](*(values[c] for c in MESSAGE_FIELD_COLUMNS[name]))
+            message_list.append(truncate_content(item, preview_length))
+        
+        return BaseResponse(
+            code=200,
+            msg="获取成功",
+            data={"list": message_list, "total": total}
+        )
+
+    def _get_archived_chat_list(self, params: GetChatListParams, user_id: int, archive) -> BaseResponse:
+        """已归档会话的聊天记录：归档消息 + 热表消息，在内存中过滤分页"""
+        session = self.db.get(ChatSession, archive.session_id)
+        messages = read_archived_messages(archive)
+        messages.extend(
+            message_to_dict(msg) for msg, _ in self.chat_list_query(params, user_id).all()
+        )
+        
+        if params.content:
+            messages = [m for m in messages if params.content in (m["content"] or "")]
+        if params.role:
+            messages = [m for m in messages if m["message_type"] == params.role]
+        
+        messages.sort(key=lambda m: (m["created_at"] or datetime.min, m["id"] or 0), reverse=True)
+        start = (params.pageNum - 1) * params.pageSize
+        
+        message_list = []
+        for msg in messages[start:start + params.pageSize]:
             message_list.append(ChatMessageResponse(
-                message_id=msg.id,
-                session_id=msg.session_id,
+                message_id=msg["id"],
+                session_id=msg["session_id"],
                 user_id=session.user_id,
                 agent_id=session.agent_id,
-                role=msg.message_type,
-                content=msg.content,
-                tokens=0 if msg.message_type == "user" else (msg.tokens_used or 0),  # 用户消息不包含token统计
-                created_at=msg.created_at
+                role=msg["message_type"],
+                content=msg["content"],
+                tokens=0 if msg["message_type"] == "user" else (msg["tokens_used"] or 0),
+                created_at=msg["created_at"]
             ).dict())
         
         return BaseResponse(
             code=200,
             msg="获取成功",
-            data={"list": message_list, "total": total}
+            data={"list": message_list, "total": len(messages)}
         )
 
     def get_sessions(self, user_id: int) -> BaseResponse:
-        """获取用户会话列表"""
+        """获取用户会话列表（计数与最后一条消息来自会话表的冗余字段；调用方先 await flush_pending）"""
         
-        sessions = self.db.query(ChatSession).filter(
-            ChatSession.user_id == user_id
-        ).order_by(desc(ChatSession.updated_at)).all()
+        with tracing.span("db.sessions_query"):
+            rows = self.sessions_query(user_id).all()
         
-        session_list = []
-        for session in sessions:
-            session_list.append(ChatSessionResponse(
-                session_id=session.id,
-                session_name=session.title,
-                user_id=session.user_id,
-                agent_id=session.agent_id,
-                created_at=session.created_at,
-                updated_at=session.updated_at
-            ).dict())
+        # 与 ChatSessionResponse.dict() 相同的键与顺序
+        session_list = [
+            {
+                "session_id": session_id,
+                "session_name": title,
+                "user_id": owner_id,
+                "agent_id": agent_id,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "message_count": message_count or 0,
+                "last_message_at": last_message_at,
+                "last_message_preview": last_message_preview,
+            }
+            for (session_id, title, owner_id, agent_id, created_at, updated_at,
+                 message_count, last_message_at, last_message_preview) in rows
+        ]
         
         return BaseResponse(code=200, msg="获取成功", data={"list": session_list, "total": len(session_list)})
 
+    def search_messages(self, user_id: int, query: str, limit: int = SEARCH_DEFAULT_LIMIT) -> BaseResponse:
+        """按语义相似度搜索用户的聊天记录（索引见 search_service）"""
+        
+        if not search_available():
+            return BaseResponse(code=500, msg="语义搜索未启用或未安装 numpy", data=None)
+        query = (query or "").strip()
+        if not query:
+            return BaseResponse(code=400, msg="搜索内容不能为空", data=None)
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            return BaseResponse(code=400, msg=f"limit 应在 1 到 {SEARCH_MAX_LIMIT} 之间", data=None)
+        
+        if message_writer.has_pending(user_id):
+            with tracing.span("db.write_behind_flush"):
+                message_writer.flush()
+        
+        with tracing.span("search.query"):
+            results = search_indexer.search(self.db, user_id, query, limit)
+        
+        return BaseResponse(code=200, msg="获取成功", data={"list": results, "total": len(results)})
+
     def delete_session(self, session_id: int, user_id: int) -> BaseResponse:
-        """删除会话"""
+        """删除会话（调用方先 await flush_pending，否则未落库的消息会因外键约束进入死信文件）"""
         
         session = self.db.query(ChatSession).filter(
             and_(ChatSession.id == session_id, ChatSession.user_id == user_id)
@@ -224,7 +616,8 @@ class ChatService:
         if not session:
             return BaseResponse(code=500, msg="会话不存在", data=None)
         
-        self.db.delete(session)
-        self.db.commit()
+        with tracing.span("db.delete_session"):
+            self.db.delete(session)
+            self.db.commit()
         
         return BaseResponse(code=200, msg="删除成功", data=None)
@@ -0,0 +1,250 @@
+"""
+聊天记录批量导出 / 导入
+
+导出为 NDJSON（可选 gzip），每行一条记录：
+    {"type": "header", "version": 1, ...}
+    {"type": "session", "id": ..., ...}      # 会话，其后紧跟该会话的消息
+    {"type": "message", "session_id": ..., ...}
+查询按主键分批（keyset 分页）读取，内存占用与用户数据量无关；
+mysqlconnector 不支持服务端游标，因此不依赖 yield_per 流式读取。
+
+导入先完整读取一遍校验格式（JSON、必填字段、时间、gzip 是否完整），格式有误时不写入任何数据；
+校验通过后再逐行写入，会话重新分配ID，消息按批多行插入并提交（不长时间持有用户序号计数器的行锁）。
+写入中途数据库出错时抛出 ImportInterrupted，带有已提交部分的统计。
+"""
+
+import gzip
+import json
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.models.chat import ChatMessage, ChatMessageArchive, ChatSession
+from app.services.archive_service import ARCHIVE_FIELDS, read_archived_messages
+from app.services.write_behind import persist_messages
+
+EXPORT_VERSION = 1
+
+SESSION_FIELDS = (
+    "id",
+    "title",
+    "session_type",
+    "ai_platform",
+    "ai_platform_app_id",
+    "config",
+    "is_active",
+    "agent_id",
+    "ai_platform_id",
+    "created_at",
+    "updated_at",
+)
+
+# 导出时累积到该大小再输出一块，减少小包
+CHUNK_SIZE = 64 * 1024
+
+# 读取导入文件时的格式错误（含 gzip 损坏或截断）
+IMPORT_FORMAT_ERRORS = (ValueError, KeyError, TypeError, OSError, EOFError, zlib.error)
+
+
+class ImportInterrupted(Exception):
+    """导入写入中途失败，result 为已提交部分的统计"""
+
+    def __init__(self, result: Dict[str, int], error: Exception):
+        super().__init__(str(error))
+        self.result = result
+        self.error = error
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value)}")
+
+
+def _record(record_type: str, data: Dict[str, Any]) -> bytes:
+    data = {"type": record_type, **data}
+    return (json.dumps(data, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _iter_records(db: Session, user_id: int, batch_size: int) -> Iterator[bytes]:
+    yield _record("header", {
+        "version": EXPORT_VERSION,
+        "user_id": user_id,
+        "exported_at": datetime.now(),
+    })
+
+    last_session_id = 0
+    while True:
+        sessions = db.query(ChatSession).filter(
+            ChatSession.user_id == user_id,
+            ChatSession.id > last_session_id
+        ).order_by(ChatSession.id).limit(batch_size).all()
+        if not sessions:
+            break
+        last_session_id = sessions[-1].id
+
+        for session in sessions:
+            yield _record("session", {field: getattr(session, field) for field in SESSION_FIELDS})
+
+            archive = db.get(ChatMessageArchive, session.id)
+            if archive is not None:
+                for message in read_archived_messages(archive):
+                    yield _record("message", message)
+
+            last_message_id = 0
+            while True:
+                messages = db.query(ChatMessage).filter(
+                    ChatMessage.session_id == session.id,
+                    ChatMessage.id > last_message_id
+                ).order_by(ChatMessage.id).limit(batch_size).all()
+                if not messages:
+                    break
+                last_message_id = messages[-1].id
+                for message in messages:
+                    yield _record("message", {field: getattr(message, field) for field in ARCHIVE_FIELDS})
+
+        # 释放已输出对象，保持内存占用稳定
+        db.expunge_all()
+
+
+def export_user_history(user_id: int, compress: bool = False, batch_size: int = 500) -> Iterator[bytes]:
+    """流式导出用户的全部会话和消息（在 StreamingResponse 的线程池中迭代）"""
+    db = SessionLocal()
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buffer: List[bytes] = []
+    buffered = 0
+    try:
+        for line in _iter_records(db, user_id, batch_size):
+            buffer.append(line)
+            buffered += len(line)
+            if buffered >= CHUNK_SIZE:
+                chunk = b"".join(buffer)
+                buffer, buffered = [], 0
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk:
+                    yield chunk
+
+        chunk = b"".join(buffer)
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
+    finally:
+        db.close()
+
+
+def _open_lines(fileobj: BinaryIO) -> Iterator[bytes]:
+    """按行读取导入文件，自动识别 gzip"""
+    head = fileobj.read(2)
+    fileobj.seek(0)
+    if head == b"\x1f\x8b":
+        fileobj = gzip.GzipFile(fileobj=fileobj)
+    for line in fileobj:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _read_records(fileobj: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """逐行解析并校验导入记录，格式错误时抛出 ValueError（注明行号）"""
+    for line_no, line in enumerate(_open_lines(fileobj), 1):
+        try:
+            record = json.loads(line)
+            record_type = record.get("type")
+            if record_type == "session":
+                int(record["id"])
+                int(record["agent_id"])
+                _parse_datetime(record.get("created_at"))
+                _parse_datetime(record.get("updated_at"))
+            elif record_type == "message":
+                if not isinstance(record["message_type"], str):
+                    raise ValueError("message_type 应为字符串")
+                _parse_datetime(record.get("created_at"))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"第 {line_no} 行: {e!r}")
+        yield record
+
+
+def import_user_history(db: Session, user_id: int, fileobj: BinaryIO, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    导入导出文件到指定用户，会话重新分配ID，返回导入统计
+
+    文件格式错误时抛出 IMPORT_FORMAT_ERRORS 中的异常（未写入任何数据），
+    写入中途失败时抛出 ImportInterrupted
+    """
+    for _ in _read_records(fileobj):
+        pass
+    fileobj.seek(0)
+
+    session_ids: Dict[int, Tuple[int, int]] = {}
+    pending_rows: List[Dict[str, Any]] = []
+    result = {"sessions": 0, "messages": 0, "skipped": 0}
+    committed = dict(result)
+
+    def flush_messages():
+        nonlocal committed
+        if pending_rows:
+            persist_messages(db, pending_rows)
+            result["messages"] += len(pending_rows)
+            pending_rows.clear()
+        db.commit()
+        committed = dict(result)
+
+    try:
+        for record in _read_records(fileobj):
+            record_type = record.get("type")
+
+            if record_type == "session":
+                session = ChatSession(
+                    user_id=user_id,
+                    title=record.get("title") or "导入会话",
+                    session_type=record.get("session_type"),
+                    ai_platform=record.get("ai_platform"),
+                    ai_platform_app_id=record.get("ai_platform_app_id"),
+                    config=record.get("config"),
+                    is_active=record.get("is_active", True),
+                    agent_id=record["agent_id"],
+                    ai_platform_id=record.get("ai_platform_id"),
+                    created_at=_parse_datetime(record.get("created_at")),
+                    updated_at=_parse_datetime(record.get("updated_at")),
+                )
+                db.add(session)
+                db.flush()
+                # 只保留新ID与智能体，避免映射表持有ORM对象
+                session_ids[record["id"]] = (session.id, session.agent_id)
+                db.expunge(session)
+                result["sessions"] += 1
+
+            elif record_type == "message":
+                mapped = session_ids.get(record.get("session_id"))
+                if mapped is None:
+                    result["skipped"] += 1
+                    continue
+                new_session_id, agent_id = mapped
+                pending_rows.append({
+                    "session_id": new_session_id,
+                    "user_id": user_id,
+                    "agent_id": agent_id,
+                    "message_type": record["message_type"],
+                    "content": record.get("content") or "",
+                    "message_metadata": record.get("message_metadata"),
+                    "platform_response_id": record.get("platform_response_id"),
+                    "tokens_used": record.get("tokens_used"),
+                    "processing_time": record.get("processing_time"),
+                    "created_at": _parse_datetime(record.get("created_at")) or datetime.now(),
+                })
+                if len(pending_rows) >= batch_size:
+                    flush_messages()
+
+        flush_messages()
+    except Exception as e:
+        db.rollback()
+        raise ImportInterrupted(committed, e)
+    return result
@@ -0,0 +1,277 @@
+"""
+异步对话任务
+
+非流式调用可能等待上游 2 分钟，期间占用请求与连接，代理也常先超时。
+任务模式下 POST /chat/jobs 立即返回任务ID，上游调用在后台执行：
+    JOB_BACKEND=inprocess  应用进程内执行，最多 JOB_CONCURRENCY 个并发
+    JOB_BACKEND=celery     投递到 celery（celery -A app.services.job_tasks worker）
+结果保存在 chat_jobs 表，通过 GET /chat/jobs/{job_id} 查询；
+提交时带 callback_url 的任务结束后会收到一次 POST 回调。
+
+任务执行前先把状态从 pending 原子地改为 running，多个进程恢复同一任务时只有一个会执行；
+进程退出时未完成的任务改回 pending，下次启动重新执行。running 超过 STALE_RUNNING_AFTER 的任务
+视为执行进程已崩溃：启动预热时改回 pending 并重新提交（celery 模式下 beat 定期执行同样的检查，
+见 job_tasks），超时的任务也可以被重新投递的消息直接取得执行权。
+调用上游前先建会话（未指定 sessionId 时）并保存用户消息，会话ID记入任务请求；
+重新执行时沿用该会话，不会重复建会话或重复保存用户消息。
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.adapters.http_client import get_client
+from app.core.config import settings
+from app.core.drain import drain_controller
+from app.db import statements
+from app.db.database import SessionLocal
+from app.models.chat import ChatJob
+from app.schemas.chat import JobSubmitDTO, SendDTO
+from app.services.chat_service import ChatService, new_session_title
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_TIMEOUT = 10.0
+CALLBACK_ATTEMPTS = 3
+# 超过该时间仍为 running 的任务视为执行进程已退出
+STALE_RUNNING_AFTER = timedelta(minutes=10)
+
+
+def callback_allowed(url: str) -> bool:
+    parts = urlsplit(url)
+    allowed = {host.strip().lower() for host in settings.JOB_CALLBACK_ALLOWED_HOSTS.split(",") if host.strip()}
+    return parts.scheme in ("http", "https") and (parts.hostname or "").lower() in allowed
+
+
+def create_job(db: Session, job_dto: JobSubmitDTO, user_id: int, agent_id: int) -> ChatJob:
+    request = job_dto.dict(exclude={"callback_url"})
+    job = ChatJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        agent_id=agent_id,
+        status="pending",
+        request=request,
+        callback_url=job_dto.callback_url,
+        created_at=datetime.now()
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def job_to_dict(job: ChatJob) -> Dict[str, Any]:
+    return {
+        "jobId": job.id,
+        "status": job.status,
+        "agentId": job.agent_id,
+        "sessionId": (job.request or {}).get("sessionId"),
+        "result": job.result,
+        "error": job.error,
+        "attempts": job.attempts,
+        "callbackStatus": job.callback_status,
+        "createdAt": job.created_at,
+        "startedAt": job.started_at,
+        "finishedAt": job.finished_at,
+    }
+
+
+def _claim(db: Session, job_id: str) -> bool:
+    """pending（或 running 已超时）-> running，返回是否由当前进程取得执行权"""
+    claimed = db.query(ChatJob).filter(
+        ChatJob.id == job_id,
+        or_(
+            ChatJob.status == "pending",
+            and_(ChatJob.status == "running", ChatJob.started_at < datetime.now() - STALE_RUNNING_AFTER),
+        )
+    ).update({
+        "status": "running",
+        "started_at": datetime.now(),
+        "attempts": ChatJob.attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+
+def reset_stale_jobs(db: Session) -> List[str]:
+    """把超时仍为 running 的任务改回 pending，返回这些任务的ID"""
+    stale_ids = [row.id for row in db.query(ChatJob.id).filter(
+        ChatJob.status == "running",
+        ChatJob.started_at < datetime.now() - STALE_RUNNING_AFTER
+    ).all()]
+    if stale_ids:
+        db.query(ChatJob).filter(
+            ChatJob.id.in_(stale_ids), ChatJob.status == "running"
+        ).update({"status": "pending"}, synchronize_session=False)
+        logger.warning("%d 个异步任务执行超时，已改回 pending: %s", len(stale_ids), stale_ids)
+    db.commit()
+    return stale_ids
+
+
+def _release(job_id: str) -> None:
+    """执行被中断：改回 pending 等待重新执行"""
+    db = SessionLocal()
+    try:
+        db.query(ChatJob).filter(
+            ChatJob.id == job_id, ChatJob.status == "running"
+        ).update({"status": "pending"}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _send_callback(url: str, body: Dict[str, Any]) -> Optional[int]:
+    data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if settings.JOB_CALLBACK_SECRET:
+        signature = hmac.new(settings.JOB_CALLBACK_SECRET.encode(), data, hashlib.sha256).hexdigest()
+        headers["X-Job-Signature"] = f"sha256={signature}"
+
+    status = None
+    for attempt in range(CALLBACK_ATTEMPTS):
+        try:
+            response = await get_client().post(url, content=data, headers=headers, timeout=CALLBACK_TIMEOUT)
+            status = response.status_code
+            if status < 500:
+                break
+        except httpx.HTTPError as e:
+            logger.info("任务回调 %s 失败: %s", url, e)
+        await asyncio.sleep(2 ** attempt)
+    return status
+
+
+async def execute_job(job_id: str) -> None:
+    """执行一个任务（进程内执行器与 celery 任务共用）"""
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        job = db.get(ChatJob, job_id)
+        user_id = job.user_id
+        callback_url = job.callback_url
+        send_dto = SendDTO(**job.request)
+        send_dto.stream = False
+
+        if not job.request.get("userMessageSaved"):
+            # 先建会话并保存用户消息，记入任务请求；中断后重新执行时沿用
+            service = ChatService(db)
+            if not send_dto.sessionId:
+                send_dto.sessionId = service.create_session(user_id, job.agent_id, new_session_title())
+                owned = True
+            else:
+                owned = db.execute(statements.session_conversation(send_dto.sessionId, user_id)).first() is not None
+            # 会话不属于该用户时不保存，由 send_message 返回错误并按失败回调
+            if owned:
+                service.save_user_message(send_dto.sessionId, user_id, job.agent_id, send_dto)
+            job.request = dict(job.request, sessionId=send_dto.sessionId, userMessageSaved=True)
+            db.commit()
+
+        last_chunk = None
+        try:
+            with drain_controller.track(user_id, stream=False):
+                async for chunk in ChatService(db).send_message(send_dto, user_id, save_user_message=False):
+                    last_chunk = chunk
+        except asyncio.CancelledError:
+            _release(job_id)
+            raise
+
+        try:
+            outcome = json.loads(last_chunk) if last_chunk else {}
+        except ValueError:
+            outcome = {"content": last_chunk}
+        if not isinstance(outcome, dict):
+            outcome = {"content": last_chunk}
+
+        job = db.get(ChatJob, job_id)
+        if "error" in outcome:
+            job.status = "failed"
+            job.error = str(outcome["error"])
+        else:
+            job.status = "succeeded"
+            job.result = outcome.get("content", "")
+        job.finished_at = datetime.now()
+        db.commit()
+        body = job_to_dict(job)
+
+        if callback_url:
+            status = await _send_callback(callback_url, body)
+            db.query(ChatJob).filter(ChatJob.id == job_id).update(
+                {"callback_status": status}, synchronize_session=False
+            )
+            db.commit()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.exception("异步任务 %s 执行失败", job_id)
+        db.rollback()
+        db.query(ChatJob).filter(ChatJob.id == job_id).update({
+            "status": "failed",
+            "error": str(e),
+            "finished_at": datetime.now(),
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobExecutor:
+    """进程内任务执行器"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(self, job_id: str) -> None:
+        if settings.JOB_BACKEND == "celery":
+            from app.services.job_tasks import run_chat_job
+            run_chat_job.delay(job_id)
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.JOB_CONCURRENCY)
+        task = asyncio.get_running_loop().create_task(self._run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job_id: str) -> None:
+        async with self._semaphore:
+            await execute_job(job_id)
+
+    @staticmethod
+    def _recoverable_job_ids():
+        db = SessionLocal()
+        try:
+            stale_ids = reset_stale_jobs(db)
+            if settings.JOB_BACKEND == "celery":
+                # pending 的任务仍在 celery 队列中，只重新投递超时的任务
+                return stale_ids
+            return [row.id for row in db.query(ChatJob.id).filter(ChatJob.status == "pending").all()]
+        finally:
+            db.close()
+
+    async def recover(self) -> int:
+        """重新提交未完成的任务（启动预热时调用），返回数量"""
+        job_ids = await run_in_threadpool(self._recoverable_job_ids)
+        for job_id in job_ids:
+            self.submit(job_id)
+        return len(job_ids)
+
+    async def stop(self) -> None:
+        """取消未完成的任务（各任务改回 pending）"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+
+job_executor = JobExecutor()
@@ -0,0 +1,47 @@
+"""
+异步对话任务的 celery 入口（JOB_BACKEND=celery 时使用）
+
+启动 worker（-B 同时运行 beat，定期恢复执行进程崩溃后超时的任务；多个 worker 时只在一个上开启）:
+    celery -A app.services.job_tasks worker -B --concurrency 4
+"""
+
+import asyncio
+
+from celery import Celery
+
+from app.adapters import http_client
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.services.job_service import STALE_RUNNING_AFTER, execute_job, reset_stale_jobs
+
+celery_app = Celery("wenke_ai", broker=settings.REDIS_URL)
+celery_app.conf.beat_schedule = {
+    "recover-stale-chat-jobs": {
+        "task": "chat_jobs.recover",
+        "schedule": STALE_RUNNING_AFTER.total_seconds() / 2,
+    },
+}
+
+
+@celery_app.task(name="chat_jobs.run", acks_late=True, ignore_result=True)
+def run_chat_job(job_id: str) -> None:
+    async def run():
+        try:
+            await execute_job(job_id)
+        finally:
+            # 共享客户端绑定在事件循环上，每次 asyncio.run 后关闭
+            await http_client.close_clients()
+
+    asyncio.run(run())
+
+
+@celery_app.task(name="chat_jobs.recover", ignore_result=True)
+def recover_stale_jobs() -> None:
+    """超时仍为 running 的任务改回 pending 并重新投递"""
+    db = SessionLocal()
+    try:
+        job_ids = reset_stale_jobs(db)
+    finally:
+        db.close()
+    for job_id in job_ids:
+        run_chat_job.delay(job_id)
@@ -0,0 +1,258 @@
+"""
+聊天记录语义搜索
+
+每个用户一个向量索引（SEARCH_INDEX_DIR/<user_id>，格式见 app.utils.vector_index），
+向量由 SEARCH_EMBEDDER 生成（默认特征哈希，见 app.utils.embedding）。
+
+增量更新以用户同步序号为水位（见 app.services.sync_service）：同一用户的消息序号按提交顺序递增，
+索引记录已收录的最大序号 seq，补齐时收录 seq 之后、当前计数器之内的消息，不会漏掉晚提交的写入。
+    - persist_messages 在事务中标记用户，提交后通知后台任务补齐该用户的索引；
+    - 搜索前先补齐（读己之写），索引不存在或嵌入器变化时全量重建；
+    - 升级前的消息序号为 0，在首次建索引时收录。
+删除会话或归档后，索引中的旧向量保留，搜索结果回表时过滤；
+python build_search_index.py 可重建索引回收空间。
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.chat import ChatMessage, ChatSession
+from app.services.sync_service import current_seq
+
+logger = logging.getLogger(__name__)
+
+# Session.info 中记录本事务写入过消息的用户，提交后补齐其索引
+SEARCH_USERS_KEY = "search_users"
+# 建索引时每批读取与向量化的消息数
+INDEX_BATCH = 1000
+# 同时打开（映射）的用户索引数
+OPEN_INDEXES = 64
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# 回表时多取的候选数（被删除、归档的消息会被过滤掉）
+CANDIDATE_FACTOR = 2
+PREVIEW_LENGTH = 200
+
+# numpy 只在首次建索引或搜索时导入，不拖慢冷启动
+NUMPY_INSTALLED = importlib.util.find_spec("numpy") is not None
+
+
+def search_available() -> bool:
+    return settings.SEARCH_ENABLED and NUMPY_INSTALLED
+
+
+def mark_for_indexing(db: Session, user_ids: Iterable[int]) -> None:
+    """在当前事务中标记用户，提交后补齐其索引"""
+    if search_available():
+        db.info.setdefault(SEARCH_USERS_KEY, set()).update(
+            user_id for user_id in user_ids if user_id is not None
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _index_committed(session: Session) -> None:
+    user_ids = session.info.pop(SEARCH_USERS_KEY, None)
+    if user_ids:
+        search_indexer.notify(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_uncommitted(session: Session) -> None:
+    session.info.pop(SEARCH_USERS_KEY, None)
+
+
+class SearchIndexer:
+    def __init__(self):
+        self._embedder = None
+        self._indexes: "OrderedDict[int, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Set[int] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from app.utils.embedding import load_embedder
+            self._embedder = load_embedder(settings.SEARCH_EMBEDDER, settings.SEARCH_DIM)
+        return self._embedder
+
+    def index_for(self, user_id: int) -> "VectorIndex":
+        from app.utils.vector_index import VectorIndex
+
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                index = VectorIndex(os.path.join(settings.SEARCH_INDEX_DIR, str(user_id)))
+                self._indexes[user_id] = index
+                if len(self._indexes) > OPEN_INDEXES:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(user_id)
+            return index
+
+    def _message_query(self, db: Session, user_id: int):
+        return db.query(ChatMessage.id, ChatMessage.content).join(
+            ChatSession, ChatMessage.session_id == ChatSession.id
+        ).filter(ChatSession.user_id == user_id)
+
+    def _append(self, index: "VectorIndex", meta: Dict[str, Any], rows, seq: Optional[int]) -> Dict[str, Any]:
+        ids = [row.id for row in rows]
+        vectors = self.embedder.embed([row.content or "" for row in rows]) if rows else None
+        return index.append(meta, ids, vectors, seq)
+
+    def _usable(self, meta: Optional[Dict[str, Any]]) -> bool:
+        """索引已建完且由当前嵌入器生成"""
+        return (
+            meta is not None and meta["seq"] is not None
+            and meta["embedder"] == self.embedder.name and meta["dim"] == self.embedder.dim
+        )
+
+    def catch_up(self, db: Session, user_id: int) -> int:
+        """把该用户已提交的新消息加入索引（必要时全量重建），返回新收录的条数"""
+        index = self.index_for(user_id)
+        meta = index.read_meta()
+        watermark = current_seq(db, user_id)
+        if self._usable(meta) and meta["seq"] >= watermark:
+            return 0
+
+        with index.lock():
+            # 加锁后重新读取，其他进程可能已经补齐
+            meta = index.read_meta()
+            if not self._usable(meta):
+                return self._rebuild(db, index, user_id, watermark)
+            if meta["seq"] >= watermark:
+                return 0
+
+            rows = self._message_query(db, user_id).filter(
+                ChatMessage.sync_seq > meta["seq"], ChatMessage.sync_seq <= watermark
+            ).order_by(ChatMessage.id).all()
+            self._append(index, meta, rows, watermark)
+            return len(rows)
+
+    def _rebuild(self, db: Session, index: "VectorIndex", user_id: int, watermark: int) -> int:
+        """全量建索引（需持有写入锁）：收录序号不大于 watermark 的全部消息，分批写入"""
+        meta = index.reset(self.embedder.name, self.embedder.dim)
+        query = self._message_query(db, user_id).filter(ChatMessage.sync_seq <= watermark)
+        last_id = 0
+        total = 0
+        while True:
+            rows = query.filter(ChatMessage.id > last_id).order_by(ChatMessage.id).limit(INDEX_BATCH).all()
+            if not rows:
+                break
+            meta = self._append(index, meta, rows, None)
+            last_id = rows[-1].id
+            total += len(rows)
+        index.append(meta, [], None, watermark)
+        logger.info("用户 %s 的搜索索引已重建，共 %d 条消息", user_id, total)
+        return total
+
+    def rebuild(self, db: Session, user_id: int) -> int:
+        """全量重建该用户的索引（回收已删除、归档消息占用的空间）"""
+        index = self.index_for(user_id)
+        with index.lock():
+            return self._rebuild(db, index, user_id, current_seq(db, user_id))
+
+    def search(self, db: Session, user_id: int, query: str, limit: int = SEARCH_DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """按语义相似度搜索该用户的消息，返回按分数降序的结果"""
+        self.catch_up(db, user_id)
+        vector = self.embedder.embed([query])
+        if not vector.any():
+            # 查询中没有可用的特征（如只有标点）
+            return []
+        hits = self.index_for(user_id).search(vector, limit * CANDIDATE_FACTOR)[0]
+
+        scores = {}
+        for message_id, score in hits:
+            if score > 0:
+                scores.setdefault(message_id, score)
+        if not scores:
+            return []
+        rows = db.query(
+            ChatMessage.id, ChatMessage.session_id, ChatMessage.message_type,
+            ChatMessage.content, ChatMessage.created_at, ChatSession.title
+        ).join(ChatSession, ChatMessage.session_id == ChatSession.id).filter(
+            ChatSession.user_id == user_id, ChatMessage.id.in_(list(scores))
+        ).all()
+
+        results = []
+        for row in rows:
+            content = row.content or ""
+            results.append({
+                "message_id": row.id,
+                "session_id": row.session_id,
+                "session_name": row.title,
+                "role": row.message_type,
+                "content": content[:PREVIEW_LENGTH],
+                "truncated": len(content) > PREVIEW_LENGTH,
+                "score": round(scores[row.id], 4),
+                "created_at": row.created_at,
+            })
+        results.sort(key=lambda item: item["score"], reverse=True)
+        return results[:limit]
+
+    def notify(self, user_ids: Iterable[int]) -> None:
+        # 可从任意线程调用（write-behind 在线程中提交）；未启动后台任务时由搜索请求补齐
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._enqueue, tuple(user_ids))
+
+    def _enqueue(self, user_ids) -> None:
+        self._pending.update(user_ids)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _catch_up_users(self, user_ids: List[int]) -> None:
+        db = SessionLocal()
+        try:
+            for user_id in user_ids:
+                self.catch_up(db, user_id)
+                # 每个用户单独读取水位，不沿用上一次查询的事务快照
+                db.rollback()
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        if self._task is not None or not search_available():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        self._loop = None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            user_ids, self._pending = sorted(self._pending), set()
+            try:
+                await run_in_threadpool(self._catch_up_users, user_ids)
+            except Exception:
+                # 下次写入或搜索时再补齐
+                logger.exception("更新搜索索引失败")
+
+
+search_indexer = SearchIndexer()
@@ -0,0 +1,125 @@
+"""
+会话冗余计数
+
+chat_sessions 上的 message_count / last_message_at / last_message_preview
+随消息写入在同一事务内更新；reconcile_session_counters 用于按消息表修复偏差。
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.chat import ChatMessage, ChatMessageArchive, ChatSession
+
+# 会话列表中最后一条消息的预览长度
+PREVIEW_LENGTH = 100
+
+
+def make_preview(content: str) -> str:
+    """截取消息预览"""
+    return (content or "")[:PREVIEW_LENGTH]
+
+
+def apply_session_counters(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """在当前事务内累加会话计数并刷新最后一条消息（不提交）"""
+    latest: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+    seqs: Dict[int, int] = {}
+    for row in rows:
+        session_id = row["session_id"]
+        count, last = latest.get(session_id, (0, None))
+        if last is None or row["created_at"] >= last["created_at"]:
+            last = row
+        latest[session_id] = (count + 1, last)
+        seqs[session_id] = max(seqs.get(session_id, 0), row.get("sync_seq") or 0)
+
+    for session_id in sorted(latest):
+        count, last = latest[session_id]
+        # 并发批次可能乱序提交，只在时间不早于当前值时覆盖最后一条消息
+        is_newer = or_(
+            ChatSession.last_message_at.is_(None),
+            ChatSession.last_message_at <= last["created_at"]
+        )
+        values = dict(
+            message_count=func.coalesce(ChatSession.message_count, 0) + count,
+            last_message_at=case((is_newer, last["created_at"]), else_=ChatSession.last_message_at),
+            last_message_preview=case(
+                (is_newer, make_preview(last["content"])),
+                else_=ChatSession.last_message_preview
+            ),
+            updated_at=case((is_newer, last["created_at"]), else_=ChatSession.updated_at),
+        )
+        # 同步序号在计数器行锁下分配，总是不小于会话上的旧值
+        if seqs[session_id]:
+            values["sync_seq"] = seqs[session_id]
+        db.execute(update(ChatSession).where(ChatSession.id == session_id).values(**values))
+
+
+def reconcile_session_counters(db: Session, batch_size: int = 500) -> int:
+    """按消息表重新计算会话计数，返回被修正的会话数"""
+    fixed = 0
+    last_id = 0
+    while True:
+        sessions = db.query(ChatSession).filter(
+            ChatSession.id > last_id
+        ).order_by(ChatSession.id).limit(batch_size).all()
+        if not sessions:
+            break
+        last_id = sessions[-1].id
+        session_ids = [session.id for session in sessions]
+
+        aggregates = {
+            session_id: (count, last_at)
+            for session_id, count, last_at in db.execute(
+                select(
+                    ChatMessage.session_id,
+                    func.count(ChatMessage.id),
+                    func.max(ChatMessage.created_at),
+                ).where(ChatMessage.session_id.in_(session_ids))
+                .group_by(ChatMessage.session_id)
+            ).all()
+        }
+
+        # 与写入路径一致：取 created_at 最大的消息，同一时间取ID最大者
+        latest = select(
+            ChatMessage.session_id,
+            func.max(ChatMessage.created_at).label("last_at")
+        ).where(ChatMessage.session_id.in_(session_ids)).group_by(ChatMessage.session_id).subquery()
+        last_ids = select(func.max(ChatMessage.id)).join(
+            latest,
+            (ChatMessage.session_id == latest.c.session_id)
+            & (ChatMessage.created_at == latest.c.last_at)
+        ).group_by(ChatMessage.session_id)
+        previews = dict(db.execute(
+            select(ChatMessage.session_id, ChatMessage.content).where(ChatMessage.id.in_(last_ids))
+        ).all())
+
+        # 已归档的消息不在热表中，计数需要加上归档索引中记录的数量
+        archives = {
+            archive.session_id: archive
+            for archive in db.query(ChatMessageArchive).filter(
+                ChatMessageArchive.session_id.in_(session_ids)
+            )
+        }
+
+        for session in sessions:
+            count, last_at = aggregates.get(session.id, (0, None))
+            preview = make_preview(previews[session.id]) if session.id in previews else None
+            archive = archives.get(session.id)
+            if archive is not None:
+                count += archive.message_count
+                if last_at is None or (archive.last_message_at and archive.last_message_at > last_at):
+                    last_at = archive.last_message_at
+                    preview = archive.last_message_preview
+            if (
+                session.message_count != count
+                or session.last_message_at != last_at
+                or session.last_message_preview != preview
+            ):
+                session.message_count = count
+                session.last_message_at = last_at
+                session.last_message_preview = preview
+                fixed += 1
+
+        db.commit()
+    return fixed
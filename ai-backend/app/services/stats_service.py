@@ -0,0 +1,224 @@
+"""
+聊天统计汇总
+
+消息落库时在同一事务内累加 chat_statistics 中 user/agent/day 三个维度的计数，
+查询时按唯一键读取一行，不再实时聚合 chat_messages。
+"""
+
+from bisect import bisect_left
+from datetime import date
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import and_, case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.chat import ChatMessage, ChatSession
+from app.models.statistics import ChatStatistics, LATENCY_BUCKETS
+from app.schemas.auth import BaseResponse
+
+SCOPES = ("user", "agent", "day")
+
+BUCKET_COLUMNS = tuple(f"latency_bucket_{i}" for i in range(len(LATENCY_BUCKETS) + 1))
+
+COUNTER_COLUMNS = (
+    "message_count",
+    "user_message_count",
+    "assistant_message_count",
+    "tokens_used",
+    "processing_time_sum",
+    "processing_time_count",
+) + BUCKET_COLUMNS
+
+RollupKey = Tuple[str, str]
+
+
+def latency_bucket(processing_time: int) -> int:
+    """返回处理耗时所在直方图桶的下标"""
+    return bisect_left(LATENCY_BUCKETS, processing_time)
+
+
+def _row_delta(row: Dict[str, Any]) -> Dict[str, int]:
+    delta = dict.fromkeys(COUNTER_COLUMNS, 0)
+    delta["message_count"] = 1
+    if row.get("message_type") == "user":
+        delta["user_message_count"] = 1
+    elif row.get("message_type") == "assistant":
+        delta["assistant_message_count"] = 1
+    delta["tokens_used"] = row.get("tokens_used") or 0
+
+    processing_time = row.get("processing_time")
+    if processing_time is not None:
+        delta["processing_time_sum"] = processing_time
+        delta["processing_time_count"] = 1
+        delta[BUCKET_COLUMNS[latency_bucket(processing_time)]] = 1
+    return delta
+
+
+def collect_rollups(rows: List[Dict[str, Any]]) -> Dict[RollupKey, Dict[str, int]]:
+    """把一批消息合并为各维度的增量"""
+    rollups: Dict[RollupKey, Dict[str, int]] = {}
+    for row in rows:
+        delta = _row_delta(row)
+        keys = (
+            ("user", str(row.get("user_id"))),
+            ("agent", str(row.get("agent_id"))),
+            ("day", row["created_at"].date().isoformat()),
+        )
+        for key in keys:
+            current = rollups.get(key)
+            if current is None:
+                rollups[key] = dict(delta)
+            else:
+                for column, value in delta.items():
+                    current[column] += value
+    return rollups
+
+
+def _upsert_statement(dialect_name: str, values: List[Dict[str, Any]]):
+    """构造“存在则累加”的多行 INSERT"""
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(ChatStatistics).values(values)
+        updates = {c: getattr(ChatStatistics, c) + stmt.inserted[c] for c in COUNTER_COLUMNS}
+        updates["updated_at"] = func.now()
+        return stmt.on_duplicate_key_update(updates)
+
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert_insert
+    stmt = upsert_insert(ChatStatistics).values(values)
+    updates = {c: getattr(ChatStatistics, c) + stmt.excluded[c] for c in COUNTER_COLUMNS}
+    updates["updated_at"] = func.now()
+    return stmt.on_conflict_do_update(index_elements=["scope", "scope_key"], set_=updates)
+
+
+def apply_message_rollups(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """在当前事务内累加统计（不提交）"""
+    rollups = collect_rollups(rows)
+    if not rollups:
+        return
+
+    # 固定加锁顺序，避免并发批次之间死锁
+    values = [
+        {"scope": scope, "scope_key": scope_key, **rollups[(scope, scope_key)]}
+        for scope, scope_key in sorted(rollups)
+    ]
+    db.execute(_upsert_statement(db.get_bind().dialect.name, values))
+
+
+def _to_dict(stats: ChatStatistics) -> Dict[str, Any]:
+    histogram = {}
+    for bound, column in zip(LATENCY_BUCKETS + ("inf",), BUCKET_COLUMNS):
+        histogram[f"le_{bound}"] = getattr(stats, column)
+
+    return {
+        "scope": stats.scope,
+        "key": stats.scope_key,
+        "messageCount": stats.message_count,
+        "userMessageCount": stats.user_message_count,
+        "assistantMessageCount": stats.assistant_message_count,
+        "tokensUsed": stats.tokens_used,
+        "processingTimeSum": stats.processing_time_sum,
+        "avgProcessingTime": (
+            stats.processing_time_sum / stats.processing_time_count
+            if stats.processing_time_count else 0
+        ),
+        "latencyHistogram": histogram,
+        "updatedAt": stats.updated_at,
+    }
+
+
+def _empty(scope: str, scope_key: str) -> Dict[str, Any]:
+    return _to_dict(ChatStatistics(
+        scope=scope, scope_key=scope_key, updated_at=None,
+        **dict.fromkeys(COUNTER_COLUMNS, 0)
+    ))
+
+
+class StatsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_stats(self, scope: str, scope_key: str) -> Dict[str, Any]:
+        """按唯一键读取一条汇总"""
+        stats = self.db.query(ChatStatistics).filter(
+            ChatStatistics.scope == scope,
+            ChatStatistics.scope_key == scope_key
+        ).first()
+        return _to_dict(stats) if stats else _empty(scope, scope_key)
+
+    def get_user_stats(self, user_id: int) -> BaseResponse:
+        """获取用户统计"""
+        return BaseResponse(code=200, msg="获取成功", data=self.get_stats("user", str(user_id)))
+
+    def get_agent_stats(self, agent_id: int) -> BaseResponse:
+        """获取智能体统计"""
+        return BaseResponse(code=200, msg="获取成功", data=self.get_stats("agent", str(agent_id)))
+
+    def get_daily_stats(self, day: date) -> BaseResponse:
+        """获取某天的统计"""
+        return BaseResponse(code=200, msg="获取成功", data=self.get_stats("day", day.isoformat()))
+
+    def backfill(self, batch_size: int = 1000) -> int:
+        """根据 chat_messages 全量重建统计，返回写入的汇总行数
+
+        只统计热表中的消息，已归档到段文件的消息不会计入，应在首次归档前执行。
+        """
+        is_user = case((ChatMessage.message_type == "user", 1), else_=0)
+        is_assistant = case((ChatMessage.message_type == "assistant", 1), else_=0)
+
+        bucket_exprs = []
+        lower = None
+        for bound in LATENCY_BUCKETS + (None,):
+            conditions = []
+            if lower is not None:
+                conditions.append(ChatMessage.processing_time > lower)
+            if bound is not None:
+                conditions.append(ChatMessage.processing_time <= bound)
+            else:
+                conditions.append(ChatMessage.processing_time.isnot(None))
+            bucket_exprs.append(func.sum(case((and_(*conditions), 1), else_=0)))
+            lower = bound
+
+        scope_keys = {
+            "user": ChatSession.user_id,
+            "agent": ChatSession.agent_id,
+            "day": func.date(ChatMessage.created_at),
+        }
+
+        # 在一个事务内删除旧汇总并写入新汇总，读者不会看到中间状态
+        self.db.execute(delete(ChatStatistics))
+        written = 0
+        for scope in SCOPES:
+            key_expr = scope_keys[scope]
+            stmt = select(
+                key_expr,
+                func.count(ChatMessage.id),
+                func.sum(is_user),
+                func.sum(is_assistant),
+                func.coalesce(func.sum(ChatMessage.tokens_used), 0),
+                func.coalesce(func.sum(ChatMessage.processing_time), 0),
+                func.count(ChatMessage.processing_time),
+                *bucket_exprs
+            ).select_from(ChatMessage).join(
+                ChatSession, ChatMessage.session_id == ChatSession.id
+            ).group_by(key_expr)
+
+            batch = []
+            for result in self.db.execute(stmt).all():
+                if result[0] is None:
+                    continue
+                values = {"scope": scope, "scope_key": str(result[0])}
+                values.update(zip(COUNTER_COLUMNS, (int(v or 0) for v in result[1:])))
+                batch.append(values)
+                if len(batch) >= batch_size:
+                    self.db.execute(insert(ChatStatistics), batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                self.db.execute(insert(ChatStatistics), batch)
+                written += len(batch)
+
+        self.db.commit()
+        return written
@@ -0,0 +1,260 @@
+"""
+增量同步
+
+每个用户有一个变更序号计数器（chat_sync_seq）。写入会话或消息的事务先把计数器加一，
+并把新序号写到本次变更的行上（chat_sessions.sync_seq / chat_messages.sync_seq），
+删除会话时写入墓碑（chat_session_tombstones）。计数器行锁一直持有到提交，
+同一用户的序号因此按提交顺序递增：客户端看到序号 N 时，所有不大于 N 的变更都已可见。
+
+GET /system/sync?since=N 返回序号大于 N 的会话、消息与已删除会话，以及新的水位 next；
+wait>0 且没有变更时挂起等待：本进程内的提交立即唤醒，其他进程（多 worker、celery）的写入
+每 SYNC_POLL_INTERVAL 秒检查一次计数器。
+
+计数器在所有会话行之前加锁（消息批量写入按用户ID排序，ORM 在 before_flush 中分配序号），
+避免与会话计数更新互相等待。
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.drain import drain_controller
+from app.db.database import SessionLocal
+from app.models.chat import ChatMessage, ChatSession, ChatSessionTombstone, ChatSyncSeq
+from app.schemas.chat import ChatMessageResponse, ChatSessionResponse
+
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 2000
+# Session.info 中记录本事务变更过的用户，提交后通知长轮询
+SYNC_USERS_KEY = "sync_users"
+
+
+def _increment_statement(dialect_name: str, user_ids: List[int]):
+    """构造“不存在则插入 1，存在则加一”的多行 INSERT"""
+    values = [{"user_id": user_id, "seq": 1} for user_id in user_ids]
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(ChatSyncSeq).values(values)
+        return stmt.on_duplicate_key_update(seq=ChatSyncSeq.seq + 1)
+
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert_insert
+    stmt = upsert_insert(ChatSyncSeq).values(values)
+    return stmt.on_conflict_do_update(index_elements=["user_id"], set_={"seq": ChatSyncSeq.seq + 1})
+
+
+def allocate_seqs(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+    """在当前事务内为每个用户分配一个新序号（不提交），返回 {user_id: seq}"""
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not user_ids:
+        return {}
+
+    # 固定加锁顺序；Session.connection() 不触发自动 flush，可在 before_flush 中调用
+    connection = db.connection()
+    connection.execute(_increment_statement(connection.dialect.name, user_ids))
+    rows = connection.execute(
+        select(ChatSyncSeq.user_id, ChatSyncSeq.seq).where(ChatSyncSeq.user_id.in_(user_ids))
+    )
+    db.info.setdefault(SYNC_USERS_KEY, set()).update(user_ids)
+    return {user_id: seq for user_id, seq in rows}
+
+
+def current_seq(db: Session, user_id: int) -> int:
+    """用户当前的水位（已提交的最大序号）"""
+    return db.query(ChatSyncSeq.seq).filter(ChatSyncSeq.user_id == user_id).scalar() or 0
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_session_changes(session: Session, flush_context, instances) -> None:
+    """ORM 方式新建、修改、删除会话时分配序号并写入墓碑"""
+    changed = [obj for obj in session.new if isinstance(obj, ChatSession)]
+    changed.extend(
+        obj for obj in session.dirty
+        if isinstance(obj, ChatSession) and session.is_modified(obj, include_collections=False)
+    )
+    deleted = [obj for obj in session.deleted if isinstance(obj, ChatSession)]
+    if not changed and not deleted:
+        return
+
+    seqs = allocate_seqs(session, [obj.user_id for obj in changed + deleted])
+    for obj in changed:
+        obj.sync_seq = seqs[obj.user_id]
+    now = datetime.now()
+    for obj in deleted:
+        session.add(ChatSessionTombstone(
+            session_id=obj.id, user_id=obj.user_id, seq=seqs[obj.user_id], deleted_at=now
+        ))
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed(session: Session) -> None:
+    user_ids = session.info.pop(SYNC_USERS_KEY, None)
+    if user_ids:
+        sync_notifier.notify(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_uncommitted(session: Session) -> None:
+    session.info.pop(SYNC_USERS_KEY, None)
+
+
+class SyncNotifier:
+    """进程内变更通知：提交后唤醒同一用户的长轮询请求（可从任意线程调用 notify）"""
+
+    def __init__(self):
+        self._waiters: Dict[int, Set[asyncio.Future]] = {}
+        self._loop = None
+
+    def subscribe(self, user_id: int) -> asyncio.Future:
+        self._loop = asyncio.get_running_loop()
+        future = self._loop.create_future()
+        self._waiters.setdefault(user_id, set()).add(future)
+        return future
+
+    def unsubscribe(self, user_id: int, future: asyncio.Future) -> None:
+        waiters = self._waiters.get(user_id)
+        if waiters is not None:
+            waiters.discard(future)
+            if not waiters:
+                del self._waiters[user_id]
+
+    def notify(self, user_ids: Iterable[int]) -> None:
+        # 没有等待者时不必切换线程；之后才订阅的请求会在订阅后重新检查计数器
+        loop = self._loop
+        if not self._waiters or loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._wake, tuple(user_ids))
+
+    def _wake(self, user_ids) -> None:
+        for user_id in user_ids:
+            for future in self._waiters.get(user_id, ()):
+                if not future.done():
+                    future.set_result(None)
+
+
+sync_notifier = SyncNotifier()
+
+
+def _read_seq(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return current_seq(db, user_id)
+    finally:
+        db.close()
+
+
+async def wait_for_changes(user_id: int, since: int, timeout: float) -> bool:
+    """等待用户水位离开 since，返回是否有变更；服务排空时立即返回"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not drain_controller.draining:
+        waiter = sync_notifier.subscribe(user_id)
+        try:
+            # 先订阅再检查，检查之后的提交一定会唤醒
+            if await run_in_threadpool(_read_seq, user_id) != since:
+                return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            await asyncio.wait({waiter}, timeout=min(remaining, settings.SYNC_POLL_INTERVAL))
+        finally:
+            sync_notifier.unsubscribe(user_id, waiter)
+    return False
+
+
+def get_changes(db: Session, user_id: int, since: int, limit: int = SYNC_DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    返回序号大于 since 的变更
+
+    sessions 为变更会话的当前状态，deletedSessionIds 为墓碑；messages 按序号排序，
+    超过 limit 时在序号边界截断（同一序号的消息总是一起返回），hasMore 为 true 时以 next 继续。
+    since 大于服务端水位（数据库恢复等）时 reset 为 true，客户端应重新全量加载。
+    """
+    watermark = current_seq(db, user_id)
+    data = {
+        "since": since,
+        "next": since,
+        "hasMore": False,
+        "reset": False,
+        "sessions": [],
+        "deletedSessionIds": [],
+        "messages": [],
+    }
+    if since > watermark:
+        data.update(next=watermark, reset=True)
+        return data
+    if since == watermark:
+        return data
+
+    sessions = db.query(ChatSession).filter(
+        ChatSession.user_id == user_id,
+        ChatSession.sync_seq > since,
+        ChatSession.sync_seq <= watermark
+    ).order_by(ChatSession.sync_seq).all()
+    tombstones = db.query(ChatSessionTombstone.session_id).filter(
+        ChatSessionTombstone.user_id == user_id,
+        ChatSessionTombstone.seq > since,
+        ChatSessionTombstone.seq <= watermark
+    ).order_by(ChatSessionTombstone.seq).all()
+
+    # 写入消息的事务同时更新会话序号，新消息只可能出现在变更过的会话中
+    sessions_by_id = {session.id: session for session in sessions}
+    next_seq = watermark
+    messages: List[ChatMessage] = []
+    if sessions_by_id:
+        query = db.query(ChatMessage).filter(
+            ChatMessage.session_id.in_(list(sessions_by_id)),
+            ChatMessage.sync_seq > since,
+            ChatMessage.sync_seq <= watermark
+        )
+        messages = query.order_by(ChatMessage.sync_seq, ChatMessage.id).limit(limit + 1).all()
+        if len(messages) > limit:
+            cut = messages[limit].sync_seq
+            messages = [message for message in messages if message.sync_seq < cut]
+            if messages:
+                next_seq = cut - 1
+            else:
+                # 单次写入就超过 limit 条：整组返回
+                messages = query.filter(ChatMessage.sync_seq == cut).order_by(ChatMessage.id).all()
+                next_seq = cut
+
+    data.update(
+        next=next_seq,
+        hasMore=next_seq < watermark,
+        sessions=[
+            ChatSessionResponse(
+                session_id=session.id,
+                session_name=session.title,
+                user_id=session.user_id,
+                agent_id=session.agent_id,
+                created_at=session.created_at,
+                updated_at=session.updated_at,
+                message_count=session.message_count or 0,
+                last_message_at=session.last_message_at,
+                last_message_preview=session.last_message_preview
+            ).dict()
+            for session in sessions
+        ],
+        deletedSessionIds=[row.session_id for row in tombstones],
+        messages=[
+            ChatMessageResponse(
+                message_id=message.id,
+                session_id=message.session_id,
+                user_id=user_id,
+                agent_id=sessions_by_id[message.session_id].agent_id,
+                role=message.message_type,
+                content=message.content,
+                tokens=0 if message.message_type == "user" else (message.tokens_used or 0),
+                created_at=message.created_at
+            ).dict()
+            for message in messages
+        ],
+    )
+    return data
@@ -0,0 +1,372 @@
+"""
+消息异步批量落库（write-behind）
+
+send_message 产生的消息先进入内存队列并追加写入本地日志（journal），
+由后台任务按固定间隔合并为多行 INSERT 在一个事务内提交，进程退出前会把队列刷空。
+每次启动使用独立的日志文件（进程号 + 随机后缀）并持有文件锁；启动时把已退出进程遗留的日志并入本进程的
+日志与缓冲区，由后台任务随其他消息一起落库（至少一次语义），启动本身不访问数据库。
+批量写入违反约束（如会话已被删除）时按会话逐个写入，仍失败的会话的消息写入死信文件
+（<日志路径>.deadletter），不再重试，避免一条坏数据阻塞所有消息。
+
+读己之写：读取接口先 await flush_pending(user_id)，在线程池中把该用户未落库的消息写入。
+缓冲区按进程维护，只覆盖处理本次请求的 worker；多 worker 部署时其他进程缓冲中的消息
+要等该进程的下一次刷新（WRITE_BEHIND_FLUSH_INTERVAL）才可见。
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import tracing
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.statements import INSERT_MESSAGES
+from app.services.search_service import mark_for_indexing
+from app.services.session_counters import apply_session_counters
+from app.services.stats_service import apply_message_rollups
+from app.services.sync_service import allocate_seqs
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：单进程运行，不做跨进程加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 写入 chat_messages 的列；其余键（user_id、agent_id）只用于路由和统计
+MESSAGE_COLUMNS = (
+    "session_id",
+    "message_type",
+    "content",
+    "message_metadata",
+    "platform_response_id",
+    "tokens_used",
+    "processing_time",
+    "created_at",
+    "sync_seq",
+)
+
+
+def persist_messages(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """在当前事务内批量写入消息、更新会话计数与同步序号并累加统计（不提交）"""
+    if not rows:
+        return
+
+    # 先锁用户序号计数器，再更新会话行
+    seqs = allocate_seqs(db, (row.get("user_id") for row in rows))
+    rows = [dict(row, sync_seq=seqs.get(row.get("user_id"), 0)) for row in rows]
+
+    # 经 Connection 执行 Core executemany，不走 Session.execute 的 ORM 批量插入
+    db.connection().execute(
+        INSERT_MESSAGES,
+        [{column: row.get(column) for column in MESSAGE_COLUMNS} for row in rows]
+    )
+
+    apply_session_counters(db, rows)
+    apply_message_rollups(db, rows)
+    mark_for_indexing(db, seqs)
+
+
+def save_messages(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """同步写入消息并提交（write-behind 未启用时使用）"""
+    persist_messages(db, rows)
+    db.commit()
+
+
+def _encode_row(row: Dict[str, Any]) -> str:
+    data = dict(row)
+    data["created_at"] = row["created_at"].isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _decode_row(line: str) -> Dict[str, Any]:
+    data = json.loads(line)
+    data["created_at"] = datetime.fromisoformat(data["created_at"])
+    return data
+
+
+class MessageWriteBehind:
+    """消息写缓冲队列"""
+
+    def __init__(self, journal_path: str, flush_interval: float, max_batch: int):
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._pending_users: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._lock_file = None
+        self._prefix = ""
+        self._segment = 0
+        self._segments: List[Optional[str]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        """接管遗留日志并启动后台刷新任务"""
+        if self._task is not None:
+            return
+
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        # 每次启动使用新前缀：容器内进程号总是相同（PID 1），崩溃前的日志不能与本次的混在一起
+        self._prefix = f"{self.journal_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._segment = 0
+        self._lock_file = open(f"{self._prefix}.lock", "w")
+        if fcntl is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self._journal = open(f"{self._prefix}.log", "a", encoding="utf-8")
+        self._wakeup = asyncio.Event()
+        self._adopt_orphans()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("消息异步落库已启动，刷新间隔 %.3fs", self.flush_interval)
+
+    async def stop(self) -> None:
+        """停止后台任务并把缓冲区全部落库"""
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception:
+            # 保留日志和锁文件，由下一个启动的进程重放
+            self._journal.close()
+            self._lock_file.close()
+            self._journal = None
+            return
+
+        self._journal.close()
+        self._journal = None
+        os.remove(f"{self._prefix}.log")
+        self._lock_file.close()
+        os.remove(f"{self._prefix}.lock")
+        logger.info("消息异步落库已停止")
+
+    def submit(self, rows: Iterable[Dict[str, Any]], sync: bool = False) -> None:
+        """提交待写入的消息；先写日志再进入内存缓冲（sync 为 True 时日志先落盘）"""
+        rows = list(rows)
+        if not rows:
+            return
+
+        with self._lock:
+            for row in rows:
+                self._journal.write(_encode_row(row) + "\n")
+                self._buffer.append(row)
+                user_id = row.get("user_id")
+                self._pending_users[user_id] = self._pending_users.get(user_id, 0) + 1
+            self._journal.flush()
+            if sync:
+                os.fsync(self._journal.fileno())
+            full = len(self._buffer) >= self.max_batch
+
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+
+    def has_pending(self, user_id: int) -> bool:
+        """该用户在本进程是否有尚未落库的消息（其他 worker 的缓冲不在此列）"""
+        return self._pending_users.get(user_id, 0) > 0
+
+    def flush(self) -> int:
+        """把当前缓冲区写入数据库，返回写入行数"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                rows, self._buffer = self._buffer, []
+                self._segments.append(self._rotate_journal())
+
+            retry: List[Dict[str, Any]] = []
+            error: Optional[Exception] = None
+            try:
+                self._write_rows(rows)
+            except IntegrityError:
+                logger.warning("批量写入消息违反约束，按会话逐个写入")
+                retry, error = self._write_by_session(rows)
+            except Exception as e:
+                retry, error = rows, e
+
+            if retry:
+                # 写库失败：放回缓冲区，日志段保留以便下次刷新或重启后重放
+                logger.error("批量写入消息失败，%d 条消息将重试: %s", len(retry), error)
+                retained = {id(row) for row in retry}
+                self._release_users([row for row in rows if id(row) not in retained])
+                with self._lock:
+                    self._buffer[:0] = retry
+                raise error
+
+            self._release_users(rows)
+            segments, self._segments = self._segments, []
+            for path in segments:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            return len(rows)
+
+    def _write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """按 max_batch 拆分为多行 INSERT，整体在一个事务内提交"""
+        # 按用户排序（稳定排序保留同一用户的消息顺序），各批次按相同顺序锁定序号计数器
+        rows = sorted(rows, key=lambda row: row.get("user_id") or 0)
+        db = SessionLocal()
+        try:
+            for start in range(0, len(rows), self.max_batch):
+                persist_messages(db, rows[start:start + self.max_batch])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_by_session(self, rows: List[Dict[str, Any]]):
+        """
+        逐会话写入：违反约束的会话写入死信文件，
+        返回 (因其他原因失败、需要重试的行, 最后一个异常)
+        """
+        groups: "OrderedDict[Any, List[Dict[str, Any]]]" = OrderedDict()
+        for row in rows:
+            groups.setdefault(row.get("session_id"), []).append(row)
+
+        retry: List[Dict[str, Any]] = []
+        error: Optional[Exception] = None
+        for session_id, group in groups.items():
+            try:
+                self._write_rows(group)
+            except IntegrityError as e:
+                logger.error("会话 %s 的 %d 条消息无法写入，已转入死信文件: %s", session_id, len(group), e.orig)
+                self._dead_letter(group)
+            except Exception as e:
+                retry.extend(group)
+                error = e
+        return retry, error
+
+    def _dead_letter(self, rows: List[Dict[str, Any]]) -> None:
+        with open(f"{self.journal_path}.deadletter", "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(_encode_row(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _release_users(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for row in rows:
+                user_id = row.get("user_id")
+                remaining = self._pending_users.get(user_id, 0) - 1
+                if remaining > 0:
+                    self._pending_users[user_id] = remaining
+                else:
+                    self._pending_users.pop(user_id, None)
+
+    def _rotate_journal(self) -> Optional[str]:
+        """把当前日志切为待确认段，新消息写入新的日志文件（需持有 _lock）"""
+        if self._journal is None:
+            return None
+
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal.close()
+
+        self._segment += 1
+        segment_path = f"{self._prefix}.{self._segment}.flushing"
+        os.replace(f"{self._prefix}.log", segment_path)
+        self._journal = open(f"{self._prefix}.log", "a", encoding="utf-8")
+        return segment_path
+
+    def _adopt_orphans(self) -> None:
+        """把已退出进程（其锁文件可以被获取）遗留的日志并入本进程，由后台任务落库"""
+        for lock_path in glob.glob(f"{self.journal_path}.*.lock"):
+            prefix = lock_path[:-len(".lock")]
+            if prefix == self._prefix:
+                continue
+
+            with open(lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # 进程仍在运行
+
+                paths = sorted(glob.glob(f"{prefix}.*.flushing"))
+                if os.path.exists(f"{prefix}.log"):
+                    paths.append(f"{prefix}.log")
+                rows = self._read_journals(paths)
+                # 先写入本进程的日志并落盘，再删除原文件
+                self.submit(rows, sync=True)
+                for path in paths:
+                    os.remove(path)
+                os.remove(lock_path)
+                if rows:
+                    logger.info("已接管遗留日志中的 %d 条消息", len(rows))
+
+    def _read_journals(self, paths: List[str]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        for path in paths:
+            with open(path, encoding="utf-8") as journal:
+                for line in journal:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rows.append(_decode_row(line))
+                    except (ValueError, KeyError):
+                        # 崩溃时可能留下半行，直接跳过
+                        logger.warning("跳过损坏的日志行: %s", path)
+        return rows
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                # 已在 flush 中记录日志，等待下一个周期重试
+                await asyncio.sleep(self.flush_interval)
+
+
+message_writer = MessageWriteBehind(
+    journal_path=settings.WRITE_BEHIND_JOURNAL_PATH,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+    max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+)
+
+
+def submit_messages(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """写入消息：后台任务运行时走异步批量落库，否则同步提交"""
+    if settings.WRITE_BEHIND_ENABLED and message_writer.running:
+        message_writer.submit(rows)
+    else:
+        save_messages(db, rows)
+
+
+async def flush_pending(user_id: int) -> None:
+    """读己之写：该用户在本进程有未落库的消息时刷入数据库（在线程池中等待，不阻塞事件循环）"""
+    if message_writer.has_pending(user_id):
+        with tracing.span("db.write_behind_flush"):
+            await run_in_threadpool(message_writer.flush)
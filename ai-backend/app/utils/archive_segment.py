@@ -0,0 +1,174 @@
+"""
+归档段文件
+
+一个段文件由若干独立压缩的帧首尾相接组成，每帧是一个会话全部消息的 NDJSON。
+帧的位置（段名、偏移、长度、压缩算法）记录在 chat_message_archive 表中，
+读取时通过 mmap 直接切出对应字节再解压，不需要顺序扫描段文件。
+会话重新归档或被删除后旧帧不再被引用，由 ArchiveService.compact_segments 把仍被引用的帧
+复制到最新段后删除旧段；每种压缩算法的最新段不参与合并，段名因此不会被重复使用。
+"""
+
+import gzip
+import json
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = {"zstd": ".ndjson.zst", "gzip": ".ndjson.gz"}
+
+
+def resolve_codec(codec: str) -> str:
+    """auto 时优先使用 zstd，未安装 zstandard 则退回 gzip"""
+    if codec == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if codec == "zstd" and zstandard is None:
+        raise ValueError("未安装 zstandard，无法使用 zstd 归档")
+    if codec not in SEGMENT_SUFFIX:
+        raise ValueError(f"不支持的归档压缩算法: {codec}")
+    return codec
+
+
+def segment_codec(segment: str) -> str:
+    """根据段文件名后缀判断压缩算法"""
+    for codec, suffix in SEGMENT_SUFFIX.items():
+        if segment.endswith(suffix):
+            return codec
+    raise ValueError(f"不是归档段文件: {segment}")
+
+
+def segment_number(segment: str) -> int:
+    return int(segment.split("-")[1].split(".")[0])
+
+
+def compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def encode_messages(messages: List[Dict[str, Any]]) -> bytes:
+    """消息列表编码为 NDJSON"""
+    lines = []
+    for message in messages:
+        data = dict(message)
+        if isinstance(data.get("created_at"), datetime):
+            data["created_at"] = data["created_at"].isoformat()
+        lines.append(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def decode_messages(data: bytes) -> List[Dict[str, Any]]:
+    messages = []
+    for line in data.splitlines():
+        if not line:
+            continue
+        message = json.loads(line)
+        if message.get("created_at"):
+            message["created_at"] = datetime.fromisoformat(message["created_at"])
+        messages.append(message)
+    return messages
+
+
+class SegmentWriter:
+    """追加写入归档帧（单进程使用，由归档任务持有）"""
+
+    def __init__(self, directory: str, codec: str, max_bytes: int):
+        self.directory = directory
+        self.codec = resolve_codec(codec)
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _current_segment(self) -> str:
+        suffix = SEGMENT_SUFFIX[self.codec]
+        segments = sorted(name for name in os.listdir(self.directory) if name.endswith(suffix))
+        if segments:
+            latest = segments[-1]
+            if os.path.getsize(os.path.join(self.directory, latest)) < self.max_bytes:
+                return latest
+            number = segment_number(latest) + 1
+        else:
+            number = 1
+        return f"segment-{number:06d}{suffix}"
+
+    def append(self, messages: List[Dict[str, Any]]) -> Tuple[str, int, int]:
+        """写入一帧并刷盘，返回 (段名, 偏移, 长度)"""
+        return self.append_frames([compress(self.codec, encode_messages(messages))])[0]
+
+    def append_frames(self, frames: List[bytes]) -> List[Tuple[str, int, int]]:
+        """写入已压缩的多帧（每个段文件刷盘一次），返回每帧的 (段名, 偏移, 长度)"""
+        locations = []
+        index = 0
+        while index < len(frames):
+            segment = self._current_segment()
+            with open(os.path.join(self.directory, segment), "ab") as f:
+                offset = f.tell()
+                # 每个段至少写入一帧，超过上限后切换新段
+                while True:
+                    frame = frames[index]
+                    f.write(frame)
+                    locations.append((segment, offset, len(frame)))
+                    offset += len(frame)
+                    index += 1
+                    if index >= len(frames) or offset >= self.max_bytes:
+                        break
+                f.flush()
+                os.fsync(f.fileno())
+        return locations
+
+
+class SegmentReader:
+    """通过 mmap 读取归档帧，缓存最近打开的段文件"""
+
+    def __init__(self, directory: str, max_open: int = 16):
+        self.directory = directory
+        self.max_open = max_open
+        self._maps: "OrderedDict[str, Tuple[Any, mmap.mmap]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _map(self, segment: str, end: int) -> mmap.mmap:
+        entry = self._maps.get(segment)
+        if entry is not None and len(entry[1]) >= end:
+            self._maps.move_to_end(segment)
+            return entry[1]
+
+        # 段文件在打开后又被追加，需要重新映射
+        if entry is not None:
+            self._close(segment)
+        f = open(os.path.join(self.directory, segment), "rb")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[segment] = (f, mapped)
+        while len(self._maps) > self.max_open:
+            self._close(next(iter(self._maps)))
+        return mapped
+
+    def _close(self, segment: str) -> None:
+        f, mapped = self._maps.pop(segment)
+        mapped.close()
+        f.close()
+
+    def read(self, segment: str, offset: int, length: int, codec: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            frame = self._map(segment, offset + length)[offset:offset + length]
+        return decode_messages(decompress(codec, frame))
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in list(self._maps):
+                self._close(segment)
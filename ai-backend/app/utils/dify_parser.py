@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -73,4 +73,90 @@ class DifyParser:
         try:
             return json.loads(content)
         except json.JSONDecodeError:
-            return {"text": content}
\ No newline at end of file
+            return {"text": content}
+
+class DifySSEScanner:
+    """
+    透传模式的旁路扫描器
+
+    上游SSE字节原样转发给客户端，这里只在原缓冲区上按行查找，取出落库需要的字段：
+    message / agent_message 事件只解码 answer 字符串，message_end 事件（每次回复一条）
+    完整解析以取得用量与会话ID，其余事件（工作流节点等）不解析。
+    """
+
+    MESSAGE_MARKERS = (
+        b'"event": "message"', b'"event":"message"',
+        b'"event": "agent_message"', b'"event":"agent_message"',
+    )
+    END_MARKERS = (b'"event": "message_end"', b'"event":"message_end"')
+    ANSWER_KEYS = (b'"answer": "', b'"answer":"')
+    CONVERSATION_KEYS = (b'"conversation_id": "', b'"conversation_id":"')
+
+    def __init__(self, max_line_size: int = 1024 * 1024):
+        self.max_line_size = max_line_size
+        self.parts: List[str] = []
+        self.conversation_id: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self._tail = b""
+
+    @property
+    def answer(self) -> str:
+        return "".join(self.parts)
+
+    @property
+    def total_tokens(self) -> Optional[int]:
+        return (self.usage or {}).get("total_tokens")
+
+    @property
+    def partial(self) -> bool:
+        """已转发的字节是否停在一行中间"""
+        return bool(self._tail)
+
+    def feed(self, chunk: bytes) -> None:
+        data = self._tail + chunk if self._tail else chunk
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            if data.startswith(b"data:", start):
+                self._scan_line(data, start, end)
+            start = end + 1
+        self._tail = data[start:]
+        # 与 DifyParser 一致：异常的超长行直接丢弃
+        if len(self._tail) > self.max_line_size:
+            self._tail = b""
+
+    @staticmethod
+    def _find(data: bytes, keys, start: int, end: int) -> int:
+        for key in keys:
+            index = data.find(key, start, end)
+            if index >= 0:
+                return index + len(key)
+        return -1
+
+    def _scan_line(self, data: bytes, start: int, end: int) -> None:
+        if self._find(data, self.MESSAGE_MARKERS, start, end) >= 0:
+            index = self._find(data, self.ANSWER_KEYS, start, end)
+            if index >= 0:
+                quote = data.find(b'"', index, end)
+                try:
+                    if quote >= 0 and data.find(b"\\", index, quote) < 0:
+                        # 不含转义字符（绝大多数片段）：直接解码，无需 JSON 字符串解析
+                        text = data[index:quote].decode("utf-8")
+                    else:
+                        text, _ = json.decoder.scanstring(data[index:end].decode("utf-8"), 0)
+                except (ValueError, UnicodeDecodeError):
+                    return
+                self.parts.append(text)
+            if self.conversation_id is None:
+                index = self._find(data, self.CONVERSATION_KEYS, start, end)
+                if index >= 0:
+                    self.conversation_id = data[index:data.find(b'"', index, end)].decode("ascii", "ignore") or None
+        elif self._find(data, self.END_MARKERS, start, end) >= 0:
+            try:
+                event = json.loads(data[start + 5:end])
+            except (ValueError, UnicodeDecodeError):
+                return
+            self.usage = (event.get("metadata") or {}).get("usage")
+            self.conversation_id = self.conversation_id or event.get("conversation_id")
@@ -0,0 +1,84 @@
+"""
+文本向量化（语义搜索使用）
+
+嵌入器需提供 name、dim 与 embed(texts) -> float32 数组（n × dim，每行 L2 归一化，空文本为零向量）。
+默认的 HashingEmbedder 不依赖模型文件：
+    - 中文按连续汉字切出单字与相邻两字；
+    - 英文与数字按词切分，另加首尾补 # 的字符三元组（invoice / invoices 共享大部分特征）；
+    - 每个特征经 crc32 映射到一个维度与正负号（特征哈希），按词频的平方根加权。
+它捕捉的是字面与近似字面的相似，不理解同义词；需要更好的效果时通过 SEARCH_EMBEDDER 指定
+"模块:工厂函数"（如本地句向量模型），工厂返回满足上述接口的对象。
+"""
+
+import importlib
+import re
+import zlib
+from typing import List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 单条文本参与向量化的最大字符数
+MAX_CHARS = 2000
+
+_TOKEN_RE = re.compile(r"[\u4e00-\u9fff]+|[a-z0-9]+")
+
+
+def text_features(text: str) -> List[str]:
+    features = []
+    for token in _TOKEN_RE.findall(text[:MAX_CHARS].lower()):
+        if token[0] >= "\u4e00":
+            features.extend(token)
+            features.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            features.append(token)
+            padded = f"#{token}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+class HashingEmbedder:
+    """特征哈希嵌入器（无模型、无额外依赖）"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        cells = []
+        signs = []
+        for row, text in enumerate(texts):
+            base = row * self.dim
+            for feature in text_features(text or ""):
+                h = zlib.crc32(feature.encode("utf-8"))
+                cells.append(base + h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+        counts = np.bincount(
+            np.asarray(cells, dtype=np.int64), weights=np.asarray(signs, dtype=np.float64),
+            minlength=len(texts) * self.dim
+        ).reshape(len(texts), self.dim)
+        # 词频取平方根，避免长文本中的高频词主导方向
+        vectors = (np.sign(counts) * np.sqrt(np.abs(counts))).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+def load_embedder(spec: str, dim: int):
+    """按配置创建嵌入器：hashing 或 "模块:工厂函数" """
+    if np is None:
+        raise RuntimeError("语义搜索需要安装 numpy")
+    if spec == "hashing":
+        return HashingEmbedder(dim)
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"SEARCH_EMBEDDER 格式应为 hashing 或 模块:工厂函数: {spec}")
+    factory = getattr(importlib.import_module(module_name), attr)
+    embedder = factory()
+    for name in ("name", "dim", "embed"):
+        if not hasattr(embedder, name):
+            raise ValueError(f"嵌入器缺少 {name}: {spec}")
+    return embedder
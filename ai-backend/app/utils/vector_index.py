@@ -0,0 +1,152 @@
+"""
+向量索引文件
+
+一个索引是一个目录：
+    vectors.<代>.f32   n × dim 的 float32 行向量（L2 归一化），追加写入
+    ids.<代>.i64       与之对应的消息ID（int64）
+    meta.json          嵌入器名称、维度、文件代数 generation、已提交的行数 count 与同步水位 seq
+追加时先写向量与ID，再原子替换 meta.json；读取时只看 count 之内的行，
+写入中途崩溃留下的尾部在下次加锁写入前截断。查询时通过 np.memmap 映射，不把整个文件读入内存。
+重建时换用新一代文件并删除旧文件，而不是截断：其他进程仍映射着的旧文件不受影响（截断会使其访问越界）。
+多个进程写同一个索引时通过 lock 文件加锁（Windows 开发环境不加锁）。
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 每次参与矩阵乘法的行数（float32 × 256 维约 64MB）
+SEARCH_CHUNK_ROWS = 65536
+
+
+class VectorIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._vectors = None
+        self._ids = None
+        self._mapped = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _data_files(self, meta: Dict[str, Any]) -> Tuple[str, str]:
+        generation = meta["generation"]
+        return self._file(f"vectors.{generation}.f32"), self._file(f"ids.{generation}.i64")
+
+    def read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    @contextmanager
+    def lock(self):
+        """写入锁（跨进程）"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file("lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def reset(self, embedder: str, dim: int) -> Dict[str, Any]:
+        """清空索引（需持有写入锁），seq 为 None 表示尚未建完"""
+        old = self.read_meta()
+        meta = {
+            "embedder": embedder, "dim": dim,
+            "generation": (old or {}).get("generation", 0) + 1, "count": 0, "seq": None,
+        }
+        for path in self._data_files(meta):
+            open(path, "wb").close()
+        self._write_meta(meta)
+        if old is not None:
+            for path in self._data_files(old):
+                if os.path.exists(path):
+                    os.remove(path)
+        return meta
+
+    def append(self, meta: Dict[str, Any], ids: List[int], vectors: "np.ndarray",
+               seq: Optional[int]) -> Dict[str, Any]:
+        """追加行并提交新的 count 与 seq（需持有写入锁），返回新的 meta"""
+        count = meta["count"]
+        dim = meta["dim"]
+        if len(ids):
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            if vectors.shape != (len(ids), dim):
+                raise ValueError(f"向量形状 {vectors.shape} 与索引维度 {dim} 不一致")
+            vectors_path, ids_path = self._data_files(meta)
+            for path, data, itemsize in (
+                (vectors_path, vectors.tobytes(), 4 * dim),
+                (ids_path, np.asarray(ids, dtype=np.int64).tobytes(), 8),
+            ):
+                with open(path, "r+b") as f:
+                    # 丢弃上次未提交的尾部
+                    f.truncate(count * itemsize)
+                    f.seek(0, os.SEEK_END)
+                    f.write(data)
+        meta = dict(meta, count=count + len(ids), seq=seq)
+        self._write_meta(meta)
+        return meta
+
+    def _map(self, meta: Dict[str, Any]) -> Tuple["np.ndarray", "np.ndarray"]:
+        count, dim = meta["count"], meta["dim"]
+        key = (meta["generation"], count)
+        if key != self._mapped:
+            vectors_path, ids_path = self._data_files(meta)
+            self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+            self._ids = np.memmap(ids_path, dtype=np.int64, mode="r", shape=(count,))
+            self._mapped = key
+        return self._vectors, self._ids
+
+    def search(self, queries: "np.ndarray", k: int,
+               meta: Optional[Dict[str, Any]] = None) -> List[List[Tuple[int, float]]]:
+        """
+        批量 top-k 余弦相似度（向量均已归一化，即内积）
+
+        queries 为 q × dim，返回每个查询按分数降序的 [(消息ID, 分数)]
+        """
+        meta = meta or self.read_meta()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if meta is None or meta["count"] == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+        vectors, ids = self._map(meta)
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(vectors), SEARCH_CHUNK_ROWS):
+            scores = queries @ vectors[start:start + SEARCH_CHUNK_ROWS].T
+            if scores.shape[1] > k:
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            # 与之前各块的候选合并，只保留 k 个
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(best_scores, -k, axis=1)[:, -k:]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([(int(ids[rows[i]]), float(scores[i])) for i in order])
+        return results
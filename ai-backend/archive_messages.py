@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+把不活跃会话的消息归档到压缩段文件（ARCHIVE_DIR）
+
+用法: python archive_messages.py [--days 90] [--limit 1000] [--compact-only] [--min-garbage 0.5]
+可由 cron 定期执行；归档后的会话仍可通过聊天记录接口正常读取。
+每次归档之后合并无人引用字节占比达到 --min-garbage 的段文件（重新归档、删除会话留下的旧帧）。
+同一时间只应运行一个实例。
+"""
+
+import argparse
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.services.archive_service import ArchiveService
+
+def main():
+    parser = argparse.ArgumentParser(description="归档不活跃会话的消息")
+    parser.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                        help="最后一条消息超过多少天的会话会被归档")
+    parser.add_argument("--limit", type=int, default=1000, help="本次最多归档的会话数")
+    parser.add_argument("--compact-only", action="store_true", help="只合并段文件，不归档")
+    parser.add_argument("--min-garbage", type=float, default=settings.ARCHIVE_COMPACT_MIN_GARBAGE,
+                        help="无人引用字节占比达到多少的段文件会被合并")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = ArchiveService(db)
+        if not args.compact_only:
+            sessions, messages = service.archive_inactive(args.days, args.limit)
+            print(f"归档完成：{sessions} 个会话，{messages} 条消息")
+        segments, reclaimed = service.compact_segments(args.min_garbage)
+        print(f"合并完成：{segments} 个段文件，回收 {reclaimed / 2 ** 20:.1f} MiB")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
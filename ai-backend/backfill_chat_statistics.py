@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+根据 chat_messages 全量重建 chat_statistics 汇总表
+
+用法: python backfill_chat_statistics.py [--batch-size 1000]
+建议在低峰期执行：重建期间提交的少量消息可能不会计入汇总。
+"""
+
+import argparse
+from app.db.database import SessionLocal
+from app.services.stats_service import StatsService
+
+def main():
+    parser = argparse.ArgumentParser(description="重建聊天统计汇总")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批写入的汇总行数")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        written = StatsService(db).backfill(batch_size=args.batch_size)
+        print(f"统计汇总重建完成，共写入 {written} 行")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+cassette 回放基准：适配器流式解析的吞吐与回归
+
+把录制的上游响应（CASSETTE_RECORD_DIR 下的 *.cassette.gz）通过 ReplayTransport
+送入对应平台适配器的 parse_stream_response：
+    --speed 0   不等待，测解析吞吐（MB/s、每个流的解析耗时）
+    --speed 1   按录制节奏回放，测首个输出片段延迟与片段间隔是否被解析环节放大
+输出文本的摘要写入结果，可用于确认解析行为没有变化（同一 cassette 摘要应一致）。
+
+用法（在 ai-backend 目录下）:
+    # 先录制：设置 CASSETTE_RECORD_DIR=./data/cassettes 后正常对话
+    python benchmarks/bench_cassette_replay.py data/cassettes --speed 0 --repeat 50 --json replay.json
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app.adapters import AdapterFactory
+from app.adapters.cassette import CASSETTE_SUFFIX, Cassette, ReplayTransport
+
+# 回放时只需通过配置校验，不会真正发出请求
+REPLAY_CONFIG = {
+    "base_url": "http://replay.invalid",
+    "api_key": "replay",
+    "agent_key": "http://replay.invalid/webhook",
+    "access_token": "replay",
+    "bot_id": "replay",
+}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def replay_once(cassette: Cassette, speed: float):
+    """回放一次，返回 (解析耗时秒, 输出片段到达时间列表, 输出文本)"""
+    adapter = AdapterFactory.create_adapter(cassette.platform, REPLAY_CONFIG)
+    arrivals = []
+    parts = []
+    async with httpx.AsyncClient(transport=ReplayTransport(cassette, speed)) as client:
+        started = time.perf_counter()
+        async with client.stream(cassette.meta.get("method", "POST"), cassette.meta["url"]) as response:
+            async for text in adapter.parse_stream_response(response):
+                arrivals.append(time.perf_counter() - started)
+                parts.append(text)
+        elapsed = time.perf_counter() - started
+    return elapsed, arrivals, "".join(parts)
+
+
+async def bench_cassette(path: str, speed: float, repeat: int):
+    cassette = Cassette.load(path)
+    timings = []
+    digest = None
+    first_output = []
+    gaps = []
+    for _ in range(repeat):
+        elapsed, arrivals, text = await replay_once(cassette, speed)
+        timings.append(elapsed)
+        current = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        if digest is not None and current != digest:
+            raise RuntimeError(f"{path}: 多次回放输出不一致")
+        digest = current
+        if arrivals:
+            first_output.append(arrivals[0] * 1000)
+            gaps.extend((b - a) * 1000 for a, b in zip(arrivals, arrivals[1:]))
+
+    mean = statistics.mean(timings)
+    result = {
+        "cassette": os.path.basename(path),
+        "platform": cassette.platform,
+        "frames": len(cassette.frames),
+        "bytes": cassette.total_bytes,
+        "recorded_ms": round(cassette.meta.get("headers_ms", 0) + cassette.duration_ms, 1),
+        "output_sha256": digest,
+        "parse_ms_mean": round(mean * 1000, 3),
+        "parse_ms_p99": round(percentile(timings, 0.99) * 1000, 3),
+        # 按节奏回放时耗时由录制间隔决定，吞吐没有意义
+        "mb_per_second": round(cassette.total_bytes / mean / 1e6, 2) if speed == 0 and mean else None,
+    }
+    if speed > 0 and first_output:
+        result["first_output_ms_p50"] = round(percentile(first_output, 0.5), 2)
+        result["output_gap_ms_p99"] = round(percentile(gaps, 0.99), 2) if gaps else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cassette 回放基准")
+    parser.add_argument("paths", nargs="+", help="cassette 文件或目录")
+    parser.add_argument("--speed", type=float, default=0.0, help="0 不等待；1 按录制节奏；其他为倍速")
+    parser.add_argument("--repeat", type=int, default=20, help="每个 cassette 回放次数")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*" + CASSETTE_SUFFIX))))
+        else:
+            files.append(path)
+    if not files:
+        print("未找到 cassette 文件")
+        return 1
+
+    results = []
+    print(f"{'cassette':<48} {'frames':>7} {'bytes':>9} {'parse ms':>9} {'MB/s':>8}")
+    for path in files:
+        result = asyncio.run(bench_cassette(path, args.speed, args.repeat))
+        results.append(result)
+        print(f"{result['cassette']:<48} {result['frames']:>7} {result['bytes']:>9} "
+              f"{result['parse_ms_mean']:>9.3f} {result['mb_per_second'] or 0:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"speed": args.speed, "repeat": args.repeat, "results": results},
+                      f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
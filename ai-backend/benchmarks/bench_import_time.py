@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+冷启动导入耗时基准
+
+在全新的子进程中重复执行 `import app.main`，报告导入耗时的中位数与最大值，
+并用 -X importtime 列出自身耗时最高的模块，便于定位拖慢冷启动的导入。
+
+用法（在 ai-backend 目录下）:
+    python benchmarks/bench_import_time.py [--runs 10] [--top 15] [--module app.main] [--json result.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIMER = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def measure(module: str) -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", TIMER.format(module=module)], cwd=BACKEND_DIR
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def top_modules(module: str, top: int):
+    """-X importtime 输出中自身耗时（self）最高的模块"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动导入耗时")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    # 第一次运行会生成 .pyc，不计入
+    measure(args.module)
+    timings = [measure(args.module) * 1000 for _ in range(args.runs)]
+    result = {
+        "module": args.module,
+        "runs": args.runs,
+        # 机器繁忙时中位数波动较大，min 更接近导入本身的开销
+        "min_ms": round(min(timings), 1),
+        "median_ms": round(statistics.median(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "top_self_us": [
+            {"module": name, "self_us": self_us, "cumulative_us": cumulative_us}
+            for self_us, cumulative_us, name in top_modules(args.module, args.top)
+        ],
+    }
+
+    print(f"import {args.module}: min {result['min_ms']} ms, median {result['median_ms']} ms, "
+          f"max {result['max_ms']} ms")
+    print(f"{'self us':>10} {'cumul us':>10}  module")
+    for row in result["top_self_us"]:
+        print(f"{row['self_us']:>10} {row['cumulative_us']:>10}  {row['module']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+列表接口序列化基准：/chat/list 与 /chat/sessions 每个请求的 CPU 开销
+
+在内存 SQLite 上生成一个用户的会话与消息，比较两条路径（都包含查询）：
+    model     原实现：查询 ORM 对象，逐行构造 ChatMessageResponse / ChatSessionResponse 并 .dict()，
+              再由 FastAPI 的 jsonable_encoder + JSONResponse 序列化
+    adapter   现实现：查询列元组，按字段顺序构造字典，由预编译的 TypeAdapter 直接编码为 JSON 字节
+两条路径的响应体逐字节比较（identical）。
+
+用法（在 ai-backend 目录下）:
+    python benchmarks/bench_list_serialization.py [--messages 5000] [--json result.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import warnings
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import BigInteger, create_engine, desc, insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.chat import list_response
+from app.db.database import Base
+from app.models.chat import ChatMessage, ChatSession
+from app.models.user import SysUser
+from app.schemas.auth import BaseResponse
+from app.schemas.chat import (
+    CHAT_MESSAGE_LIST_JSON, CHAT_SESSION_LIST_JSON, ChatMessageResponse, ChatSessionResponse, GetChatListParams
+)
+from app.services.chat_service import ChatService
+
+WORDS = ("数据", "接口", "配置", "请求", "返回", "用户", "会话", "模型", "参数", "示例",
+         "the", "value", "return", "config", "request", "response", "session", "token")
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_bigint(type_, compiler, **kw):
+    # SQLite 只有 INTEGER PRIMARY KEY 自增
+    return "INTEGER"
+
+
+def setup(messages: int, sessions: int, rng: random.Random):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    db = factory()
+    db.add(SysUser(user_id=1, user_name="bench", password="x"))
+    start = datetime(2026, 1, 1)
+    for session_id in range(1, sessions + 1):
+        db.add(ChatSession(
+            id=session_id, title=f"会话 {session_id}", user_id=1, agent_id=1 + session_id % 3,
+            created_at=start, updated_at=start + timedelta(seconds=session_id),
+            message_count=messages // sessions, last_message_at=start + timedelta(seconds=session_id),
+            last_message_preview=" ".join(rng.choice(WORDS) for _ in range(10)),
+        ))
+    db.flush()
+    rows = []
+    for i in range(messages):
+        message_type = "user" if i % 2 == 0 else "assistant"
+        rows.append({
+            "session_id": 1 + i % sessions,
+            "message_type": message_type,
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 80))),
+            "tokens_used": None if message_type == "user" else rng.randint(10, 500),
+            "created_at": start + timedelta(seconds=i, microseconds=rng.randint(0, 999999)),
+        })
+    db.execute(insert(ChatMessage), rows)
+    db.commit()
+    db.close()
+    return factory
+
+
+def render(result) -> bytes:
+    """FastAPI 对没有 response_model 的返回值的处理"""
+    return JSONResponse(jsonable_encoder(result)).body
+
+
+def model_chat_list(db, params: GetChatListParams) -> bytes:
+    query = ChatService(db).chat_list_query(params, 1, (ChatMessage, ChatSession))
+    total = query.count()
+    results = query.order_by(desc(ChatMessage.created_at)).offset(
+        (params.pageNum - 1) * params.pageSize
+    ).limit(params.pageSize).all()
+    message_list = []
+    for msg, session in results:
+        message_list.append(ChatMessageResponse(
+            message_id=msg.id,
+            session_id=msg.session_id,
+            user_id=session.user_id,
+            agent_id=session.agent_id,
+            role=msg.message_type,
+            content=msg.content,
+            tokens=0 if msg.message_type == "user" else (msg.tokens_used or 0),
+            created_at=msg.created_at
+        ).dict())
+    return render(BaseResponse(code=200, msg="获取成功", data={"list": message_list, "total": total}))
+
+
+def model_sessions(db) -> bytes:
+    sessions = db.query(ChatSession).filter(ChatSession.user_id == 1).order_by(desc(ChatSession.updated_at)).all()
+    session_list = []
+    for session in sessions:
+        session_list.append(ChatSessionResponse(
+            session_id=session.id,
+            session_name=session.title,
+            user_id=session.user_id,
+            agent_id=session.agent_id,
+            created_at=session.created_at,
+            updated_at=session.updated_at,
+            message_count=session.message_count or 0,
+            last_message_at=session.last_message_at,
+            last_message_preview=session.last_message_preview
+        ).dict())
+    return render(BaseResponse(code=200, msg="获取成功", data={"list": session_list, "total": len(session_list)}))
+
+
+def adapter_chat_list(db, params: GetChatListParams) -> bytes:
+    return list_response(ChatService(db).get_chat_list(params, 1), CHAT_MESSAGE_LIST_JSON).body
+
+
+def adapter_sessions(db) -> bytes:
+    return list_response(ChatService(db).get_sessions(1), CHAT_SESSION_LIST_JSON).body
+
+
+def measure(factory, runner, iterations: int, repeat: int):
+    """返回 (每次请求的CPU微秒数, 响应体)"""
+    best = None
+    body = None
+    for _ in range(repeat):
+        start = time.process_time()
+        for _ in range(iterations):
+            db = factory()
+            body = runner(db)
+            db.close()
+        elapsed = (time.process_time() - start) / iterations * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main():
+    # 原实现使用 .dict()（Pydantic V2 中已弃用）
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    parser = argparse.ArgumentParser(description="列表接口序列化基准")
+    parser.add_argument("--messages", type=int, default=5000, help="消息条数")
+    parser.add_argument("--sessions", type=int, default=100, help="会话数（/chat/sessions 返回全部）")
+    parser.add_argument("--iterations", type=int, default=200, help="每轮请求次数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复轮数（取最小值）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    factory = setup(args.messages, args.sessions, random.Random(args.seed))
+    cases = []
+    for size in (10, 100):
+        params = GetChatListParams(pageNum=2, pageSize=size)
+        cases.append((f"/chat/list size={size}",
+                      lambda db, params=params: model_chat_list(db, params),
+                      lambda db, params=params: adapter_chat_list(db, params)))
+    cases.append((f"/chat/sessions n={args.sessions}", model_sessions, adapter_sessions))
+
+    results = []
+    print(f"{'request':>24} {'model us':>9} {'adapter us':>11} {'saved':>7} {'bytes':>8} {'identical':>10}")
+    for name, model, adapter in cases:
+        model_us, model_body = measure(factory, model, args.iterations, args.repeat)
+        adapter_us, adapter_body = measure(factory, adapter, args.iterations, args.repeat)
+        result = {
+            "request": name,
+            "model_us": model_us,
+            "adapter_us": adapter_us,
+            "saved_ratio": (model_us - adapter_us) / model_us,
+            "bytes": len(adapter_body),
+            "identical": model_body == adapter_body,
+        }
+        results.append(result)
+        print(f"{name:>24} {model_us:>9.0f} {adapter_us:>11.0f} {result['saved_ratio']:>7.1%} "
+              f"{result['bytes']:>8} {str(result['identical']):>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+消息压缩基准：存储节省 vs 读取延迟
+
+生成包含 Markdown 与代码块的模拟助手回复，比较不压缩 / zlib / zstd 三种格式下
+每条消息的存储字节数和编码、解码耗时（即写入与读取时 CompressedText 额外的CPU开销）。
+
+用法（在 ai-backend 目录下）:
+    python benchmarks/bench_message_compression.py [--count 2000] [--json result.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.types import FORMAT_ZLIB, FORMAT_ZSTD, decode_content, encode_content, zstandard
+
+SIZES = (1024, 4 * 1024, 16 * 1024, 64 * 1024)
+
+WORDS = ("数据", "接口", "配置", "请求", "返回", "用户", "会话", "模型", "参数", "示例",
+         "the", "value", "return", "config", "request", "response", "session", "token")
+
+CODE = '''```python
+def handle(request, session_id: int) -> dict:
+    result = service.process(request.payload, session_id=session_id)
+    if not result.ok:
+        raise ValueError(f"failed: {result.error}")
+    return {"code": 200, "data": result.data}
+```
+'''
+
+
+def make_reply(size: int, rng: random.Random) -> str:
+    parts = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.3:
+            block = CODE.replace("handle", rng.choice(WORDS) + "_handler")
+        else:
+            block = "- " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))) + "\n"
+        parts.append(block)
+        length += len(block.encode("utf-8"))
+    return "".join(parts)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def bench(texts, threshold, codec):
+    stored = 0
+    encode_times = []
+    decode_times = []
+    for text in texts:
+        start = time.perf_counter()
+        data = encode_content(text, threshold, codec)
+        encode_times.append(time.perf_counter() - start)
+        stored += len(data)
+
+        start = time.perf_counter()
+        decode_content(data)
+        decode_times.append(time.perf_counter() - start)
+    return {
+        "stored_bytes": stored,
+        "encode_us_p50": percentile(encode_times, 0.5) * 1e6,
+        "decode_us_p50": percentile(decode_times, 0.5) * 1e6,
+        "decode_us_p99": percentile(decode_times, 0.99) * 1e6,
+        "decode_us_mean": statistics.mean(decode_times) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="消息压缩基准")
+    parser.add_argument("--count", type=int, default=2000, help="每种大小生成的消息数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    codecs = [("raw", None), ("zlib", FORMAT_ZLIB)]
+    if zstandard is not None:
+        codecs.append(("zstd", FORMAT_ZSTD))
+
+    results = []
+    print(f"{'size':>8} {'codec':>6} {'ratio':>7} {'enc p50us':>10} {'dec p50us':>10} {'dec p99us':>10}")
+    for size in SIZES:
+        texts = [make_reply(size, rng) for _ in range(args.count)]
+        raw_bytes = sum(len(t.encode("utf-8")) for t in texts)
+        for name, codec in codecs:
+            # raw：阈值设为无穷大，只测编码与解码本身的开销
+            threshold = float("inf") if codec is None else 0
+            result = bench(texts, threshold, codec or FORMAT_ZLIB)
+            result.update(size=size, codec=name, raw_bytes=raw_bytes,
+                          ratio=result["stored_bytes"] / raw_bytes)
+            results.append(result)
+            print(f"{size:>8} {name:>6} {result['ratio']:>7.3f} {result['encode_us_p50']:>10.1f} "
+                  f"{result['decode_us_p50']:>10.1f} {result['decode_us_p99']:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+语义搜索基准：单个用户 100 万条消息时的查询延迟
+
+在临时目录中按 app/utils/vector_index.py 的格式写入 --rows 条随机单位向量（float32），
+查询向量由默认的 HashingEmbedder 生成，测量：
+    embed       文本向量化吞吐（条/秒）
+    search      一次查询的 top-k（每批 1 个与 16 个查询），p50 / p95 毫秒
+    append      增量追加 2 条消息（向量化 + 写文件 + 替换 meta.json）
+检索为内存中的分块矩阵乘法，首轮之后数据位于页缓存；冷读取取决于磁盘，不在此测量。
+默认 100 万行约占 1GB 磁盘。
+
+用法（在 ai-backend 目录下）:
+    python benchmarks/bench_semantic_search.py [--rows 1000000] [--json result.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.utils.embedding import HashingEmbedder
+from app.utils.vector_index import VectorIndex
+
+WORDS = ("发票", "报销", "合同", "接口", "配置", "请求", "返回", "用户", "会话", "模型", "参数", "部署",
+         "invoice", "config", "request", "response", "session", "token", "deploy", "password")
+
+# 每次写入的行数，限制生成随机向量时的内存占用
+WRITE_BATCH = 100000
+
+
+def sample_texts(count: int, rng: random.Random):
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))) for _ in range(count)]
+
+
+def build_index(path: str, rows: int, dim: int, name: str) -> VectorIndex:
+    index = VectorIndex(path)
+    rng = np.random.default_rng(42)
+    with index.lock():
+        meta = index.reset(name, dim)
+        for start in range(0, rows, WRITE_BATCH):
+            size = min(WRITE_BATCH, rows - start)
+            vectors = rng.standard_normal((size, dim), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            meta = index.append(meta, list(range(start + 1, start + size + 1)), vectors, None)
+        index.append(meta, [], None, rows)
+    return index
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语义搜索基准")
+    parser.add_argument("--rows", type=int, default=1000000, help="索引中的消息数")
+    parser.add_argument("--dim", type=int, default=256, help="向量维度")
+    parser.add_argument("--k", type=int, default=40, help="每个查询取回的候选数（默认 limit=20 × 2）")
+    parser.add_argument("--queries", type=int, default=30, help="每种批大小的测量次数")
+    parser.add_argument("--dir", help="索引目录（默认临时目录，结束后删除）")
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    embedder = HashingEmbedder(args.dim)
+    texts = sample_texts(2000, rng)
+    embedder.embed(texts[:10])
+    start = time.perf_counter()
+    embedder.embed(texts)
+    embed_rate = len(texts) / (time.perf_counter() - start)
+    print(f"embed: {embed_rate:,.0f} 条/秒（{len(texts)} 条，平均 {sum(map(len, texts)) / len(texts):.0f} 字符）")
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as path:
+        start = time.perf_counter()
+        index = build_index(path, args.rows, args.dim, embedder.name)
+        print(f"build: {args.rows:,} 行，{time.perf_counter() - start:.1f} 秒，"
+              f"{os.path.getsize(index._data_files(index.read_meta())[0]) / 2 ** 20:,.0f} MiB")
+
+        results = {"rows": args.rows, "dim": args.dim, "k": args.k, "embed_per_second": embed_rate, "search": []}
+        meta = index.read_meta()
+        # 预热：映射文件并读入页缓存
+        index.search(embedder.embed(texts[:1]), args.k, meta)
+
+        print(f"{'batch':>6} {'p50 ms':>8} {'p95 ms':>8} {'per query ms':>13}")
+        for batch in (1, 16):
+            samples = []
+            for _ in range(args.queries):
+                queries = rng.sample(texts, batch)
+                start = time.perf_counter()
+                index.search(embedder.embed(queries), args.k, meta)
+                samples.append((time.perf_counter() - start) * 1000)
+            p50, p95 = percentiles(samples)
+            results["search"].append({"batch": batch, "p50_ms": p50, "p95_ms": p95, "per_query_ms": p50 / batch})
+            print(f"{batch:>6} {p50:>8.1f} {p95:>8.1f} {p50 / batch:>13.1f}")
+
+        samples = []
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            with index.lock():
+                meta = index.append(meta, [0, 0], embedder.embed(rng.sample(texts, 2)), meta["seq"] + 1)
+            samples.append((time.perf_counter() - start) * 1000)
+        p50, p95 = percentiles(samples)
+        results["append"] = {"p50_ms": p50, "p95_ms": p95}
+        print(f"append 2 条: p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+SSE 透传基准：每 MB 流式数据的 CPU 开销
+
+生成模拟的 Dify 流式响应（message 事件 + 可选的工作流节点事件 + message_end），
+按 --chunk-size 切块后分别送入两条路径，统计进程 CPU 时间：
+    normalize    DifyAdapter.parse_stream_response 逐行 json.loads 取出文本，
+                 再编码为新的 "data: <text>" 帧（/chat/send 默认路径）
+    passthrough  DifyAdapter.stream_passthrough 原样转发字节，旁路扫描 answer 与用量
+两条路径提取的回答全文应一致（answer_match）。
+
+用法（在 ai-backend 目录下）:
+    python benchmarks/bench_sse_passthrough.py [--mb 20] [--workflow-ratio 0.1] [--json result.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.adapters.dify_adapter import DifyAdapter
+
+CONFIG = {"base_url": "http://bench.invalid", "api_key": "bench"}
+
+WORDS = ("数据", "接口", "配置", "请求", "返回", "用户", "会话", "模型", "参数", "示例",
+         "the", "value", "return", "config", "request", "response", "session", "token")
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def aiter_bytes(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def make_stream(total_bytes: int, workflow_ratio: float, rng: random.Random):
+    """返回 (SSE字节, 回答全文)"""
+    conversation_id = "5f1c6c1e-1111-4c2b-9d1e-0a3c5e7f9b21"
+    message_id = "8d2b1a3c-2222-4e5f-8a7b-1c2d3e4f5a6b"
+    frames = []
+    answer = []
+    size = 0
+    while size < total_bytes:
+        if rng.random() < workflow_ratio:
+            event = {
+                "event": "node_finished", "task_id": message_id, "workflow_run_id": message_id,
+                "data": {"node_id": str(rng.randint(1, 99)), "node_type": "llm", "status": "succeeded",
+                         "outputs": {"text": " ".join(rng.choice(WORDS) for _ in range(200))},
+                         "elapsed_time": rng.random()},
+            }
+        else:
+            text = "".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+            answer.append(text)
+            event = {"event": "message", "task_id": message_id, "message_id": message_id,
+                     "conversation_id": conversation_id, "answer": text,
+                     "created_at": 1700000000}
+        frame = f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+        frames.append(frame)
+        size += len(frame)
+    end = {"event": "message_end", "task_id": message_id, "message_id": message_id,
+           "conversation_id": conversation_id,
+           "metadata": {"usage": {"prompt_tokens": 12, "completion_tokens": len(answer),
+                                  "total_tokens": 12 + len(answer)}}}
+    frames.append(f"data: {json.dumps(end)}\n\n".encode("utf-8"))
+    return b"".join(frames), "".join(answer)
+
+
+def split(data: bytes, chunk_size: int):
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+async def run_normalize(chunks):
+    adapter = DifyAdapter(CONFIG)
+    parts = []
+    sent = 0
+    async for text in adapter.parse_stream_response(FakeResponse(chunks)):
+        parts.append(text)
+        sent += len(f"data: {text}\n\n".encode("utf-8"))
+    return "".join(parts), sent
+
+
+async def run_passthrough(chunks):
+    adapter = DifyAdapter(CONFIG)
+    sent = 0
+    async for chunk in adapter.stream_passthrough(FakeResponse(chunks)):
+        sent += len(chunk)
+    return adapter.scanner.answer, sent
+
+
+def measure(runner, chunks, repeat):
+    cpu = []
+    result = None
+    for _ in range(repeat):
+        start = time.process_time()
+        result = asyncio.run(runner(chunks))
+        cpu.append(time.process_time() - start)
+    return min(cpu), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE 透传基准")
+    parser.add_argument("--mb", type=float, default=20, help="模拟流的大小（MB）")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="每次读取的字节数")
+    parser.add_argument("--workflow-ratio", type=float, default=0.0, help="工作流节点事件占比")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取最小值）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="结果写入JSON文件")
+    args = parser.parse_args()
+
+    data, answer = make_stream(int(args.mb * 1024 * 1024), args.workflow_ratio, random.Random(args.seed))
+    chunks = split(data, args.chunk_size)
+    mb = len(data) / (1024 * 1024)
+
+    results = []
+    print(f"{'path':>12} {'cpu ms/MB':>10} {'MB/s':>8} {'out MB':>8} {'answer_match':>13}")
+    for name, runner in (("normalize", run_normalize), ("passthrough", run_passthrough)):
+        cpu, (text, sent) = measure(runner, chunks, args.repeat)
+        result = {
+            "path": name,
+            "input_mb": mb,
+            "output_mb": sent / (1024 * 1024),
+            "cpu_ms_per_mb": cpu * 1000 / mb,
+            "mb_per_cpu_second": mb / cpu if cpu else None,
+            "answer_match": text == answer,
+        }
+        results.append(result)
+        print(f"{name:>12} {result['cpu_ms_per_mb']:>10.1f} {result['mb_per_cpu_second']:>8.1f} "
+              f"{result['output_mb']:>8.2f} {str(result['answer_match']):>13}")
+
+    print(f"透传 CPU 开销为规范化路径的 {results[1]['cpu_ms_per_mb'] / results[0]['cpu_ms_per_mb']:.1%}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+/chat/send 端到端压测
+
+并发打开 N 个流式对话，统计：
+    - TTFT（请求发出到收到第一个 data 事件）与 token 间隔（ITL）的 p50/p90/p99
+    - 吞吐（流/秒、token/秒）、错误数
+    - 被测进程的 CPU 时间与内存（Linux 下读取 /proc），折算为每核可承载的并发流数与每个流的内存
+
+结果写成 JSON，可用 --compare 与之前的结果对比，判断改动是否造成回退。
+
+准备：数据库已执行 `alembic upgrade head`。压测会创建用户 loadtest 和三个 loadtest-* 智能体，
+指向模拟上游（stub_upstream.py）。
+
+用法（在 ai-backend 目录下）:
+    # 自动启动模拟上游与后端进程
+    python benchmarks/loadtest/run_load.py --spawn --platform dify --concurrency 100 --requests 1000 \\
+        --json results/dify-c100.json
+    # 对已运行的服务压测（--server-pid 用于采集CPU/内存）
+    python benchmarks/loadtest/run_load.py --base-url http://127.0.0.1:8000 --stub-url http://127.0.0.1:9100
+    # 与基线对比
+    python benchmarks/loadtest/run_load.py --spawn --json new.json --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform as platform_module
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, BACKEND_DIR)
+
+LOADTEST_USER = "loadtest"
+PLATFORMS = ("dify", "coze", "n8n")
+
+# 对比时关注的指标：(路径, 越大越好)
+COMPARE_KEYS = (
+    ("ttft_ms.p50", False), ("ttft_ms.p99", False),
+    ("itl_ms.p50", False), ("itl_ms.p99", False),
+    ("streams_per_second", True), ("tokens_per_second", True),
+    ("streams_per_core", True), ("memory_per_stream_kb", False),
+    ("errors", False),
+)
+
+
+def seed(stub_url: str) -> Dict[str, Any]:
+    """创建压测用户与指向模拟上游的智能体，返回令牌与各平台智能体ID"""
+    from app.core.security import SecurityManager
+    from app.db.database import SessionLocal
+    from app.models.agent import AiAgentConfig
+    from app.models.user import SysUser
+
+    agents = {
+        "dify": {"base_url": f"{stub_url}/dify/v1", "api_key": "stub"},
+        "coze": {"base_url": stub_url + "/coze", "api_key": "stub", "access_token": "stub", "bot_id": "stub"},
+        "n8n": {"base_url": stub_url, "api_key": "stub", "agent_key": f"{stub_url}/n8n/webhook"},
+    }
+
+    db = SessionLocal()
+    try:
+        user = db.query(SysUser).filter(SysUser.user_name == LOADTEST_USER).first()
+        if user is None:
+            user = SysUser(
+                user_name=LOADTEST_USER,
+                nick_name="压测用户",
+                password=SecurityManager.get_password_hash(os.urandom(16).hex()),
+            )
+            db.add(user)
+
+        agent_ids = {}
+        for platform_type, fields in agents.items():
+            name = f"loadtest-{platform_type}"
+            agent = db.query(AiAgentConfig).filter(AiAgentConfig.agent_name == name).first()
+            if agent is None:
+                agent = AiAgentConfig(agent_name=name, platform_type=platform_type)
+                db.add(agent)
+            for key, value in fields.items():
+                setattr(agent, key, value)
+            agent.is_active = True
+            agent.is_stream = True
+            db.flush()
+            agent_ids[platform_type] = agent.agent_id
+        db.commit()
+
+        token = SecurityManager.create_access_token({"sub": LOADTEST_USER})
+        return {"token": token, "agents": agent_ids}
+    finally:
+        db.close()
+
+
+class ProcessSampler:
+    """周期读取 /proc/<pid> 的 CPU 时间与 RSS（非 Linux 时不采集）"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.peak_rss_kb = 0
+        self._task = None
+
+    @property
+    def available(self) -> bool:
+        return self.pid is not None and os.path.exists(f"/proc/{self.pid}/stat")
+
+    def cpu_seconds(self) -> Optional[float]:
+        if not self.available:
+            return None
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime、stime 分别是第14、15个字段（去掉 pid 与 comm 后下标为 11、12）
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_kb(self) -> Optional[int]:
+        if not self.available:
+            return None
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+        return None
+
+    async def _run(self):
+        while True:
+            rss = self.rss_kb()
+            if rss:
+                self.peak_rss_kb = max(self.peak_rss_kb, rss)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.available:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None, "count": 0}
+    values = sorted(values)
+
+    def pick(pct):
+        return round(values[min(len(values) - 1, int(len(values) * pct))], 3)
+
+    return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99),
+            "max": round(values[-1], 3), "count": len(values)}
+
+
+async def run_stream(client: httpx.AsyncClient, base_url: str, token: str, agent_id: int,
+                     prompt: str) -> Dict[str, Any]:
+    """发起一个流式对话，记录每个 data 事件的到达时间"""
+    started = time.perf_counter()
+    arrivals: List[float] = []
+    error = None
+    body = {"agent_id": str(agent_id), "stream": True, "messages": [{"role": "user", "content": prompt}]}
+    try:
+        async with client.stream("POST", f"{base_url}/chat/send", json=body,
+                                 headers={"Authorization": f"Bearer {token}"}) as response:
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+            else:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    if line.startswith('data: {"error"'):
+                        error = json.loads(line[6:]).get("error")
+                        break
+                    arrivals.append(time.perf_counter())
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    return {"started": started, "finished": time.perf_counter(), "arrivals": arrivals, "error": error}
+
+
+async def run_load(args, token: str, agent_ids: Dict[str, int], server_pid: Optional[int]) -> Dict[str, Any]:
+    platforms = PLATFORMS if args.platform == "all" else (args.platform,)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    sampler = ProcessSampler(server_pid)
+    results: List[Dict[str, Any]] = []
+    issued = 0
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        # 预热：建立连接、触发首次导入与连接池初始化
+        for platform_type in platforms:
+            await run_stream(client, args.base_url, token, agent_ids[platform_type], "warmup")
+
+        baseline_rss = sampler.rss_kb()
+        cpu_before = sampler.cpu_seconds()
+        sampler.start()
+
+        async def worker():
+            nonlocal issued
+            while issued < args.requests:
+                index = issued
+                issued += 1
+                agent_id = agent_ids[platforms[index % len(platforms)]]
+                results.append(await run_stream(client, args.base_url, token, agent_id, f"load {index}"))
+
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - wall_started
+
+        await sampler.stop()
+        cpu_after = sampler.cpu_seconds()
+
+    ttft, itl = [], []
+    tokens = 0
+    stream_seconds = 0.0
+    errors = [r["error"] for r in results if r["error"]]
+    for result in results:
+        arrivals = result["arrivals"]
+        stream_seconds += result["finished"] - result["started"]
+        if result["error"] or not arrivals:
+            continue
+        tokens += len(arrivals)
+        ttft.append((arrivals[0] - result["started"]) * 1000)
+        itl.extend((b - a) * 1000 for a, b in zip(arrivals, arrivals[1:]))
+
+    cpu_seconds = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    summary = {
+        "streams": len(results),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_seconds": round(wall, 3),
+        "ttft_ms": percentiles(ttft),
+        "itl_ms": percentiles(itl),
+        "streams_per_second": round(len(results) / wall, 2),
+        "tokens_per_second": round(tokens / wall, 1),
+        "server_cpu_seconds": round(cpu_seconds, 3) if cpu_seconds is not None else None,
+        # 平均并发流数 / 占用的核数 = 一个核满载时可承载的并发流数
+        "streams_per_core": round(stream_seconds / cpu_seconds, 1) if cpu_seconds else None,
+        "server_rss_baseline_kb": baseline_rss,
+        "server_rss_peak_kb": sampler.peak_rss_kb or None,
+        "memory_per_stream_kb": (
+            round((sampler.peak_rss_kb - baseline_rss) / args.concurrency, 1)
+            if baseline_rss and sampler.peak_rss_kb else None
+        ),
+    }
+    return summary
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"服务未就绪: {url}")
+
+
+def spawn(args) -> List[subprocess.Popen]:
+    """启动模拟上游与后端（单 worker，便于采集进程指标）"""
+    stub_port = args.stub_url.rsplit(":", 1)[1]
+    stub = subprocess.Popen([
+        sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "loadtest", "stub_upstream.py"),
+        "--port", stub_port, "--tokens", str(args.tokens), "--token-rate", str(args.token_rate),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--disconnect-rate", str(args.disconnect_rate),
+        "--seed", "42",
+    ])
+    app_port = args.base_url.rsplit(":", 1)[1]
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", app_port, "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        # 压测用单个账号高并发发送，关闭限流
+        env={**os.environ, "RATE_LIMIT_ENABLED": "false"},
+    )
+    processes = [stub, backend]
+    try:
+        wait_ready(args.stub_url + "/docs")
+        wait_ready(args.base_url + "/")
+    except RuntimeError:
+        for process in processes:
+            process.terminate()
+        raise
+    return processes
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def lookup(data: Dict[str, Any], path: str):
+    for key in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\n与基线对比（{baseline.get('git_commit')} @ {baseline.get('timestamp')}）:")
+    for path, higher_is_better in COMPARE_KEYS:
+        old = lookup(baseline["results"], path)
+        new = lookup(current["results"], path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        worse = change < 0 if higher_is_better else change > 0
+        marker = "  <-- 退化" if worse and abs(change) >= 10 else ""
+        print(f"  {path:<22} {old:>10} -> {new:<10} ({change:+.1f}%){marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat/send 端到端压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="后端地址")
+    parser.add_argument("--stub-url", default="http://127.0.0.1:9100", help="模拟上游地址")
+    parser.add_argument("--spawn", action="store_true", help="自动启动模拟上游与后端")
+    parser.add_argument("--server-pid", type=int, help="被测后端进程ID（未使用 --spawn 时采集CPU/内存）")
+    parser.add_argument("--platform", choices=PLATFORMS + ("all",), default="dify")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发流数")
+    parser.add_argument("--requests", type=int, default=500, help="总请求数")
+    parser.add_argument("--timeout", type=float, default=120.0, help="单个流的读取超时（秒）")
+    # 以下参数在 --spawn 时传给模拟上游
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="结果写入JSON文件")
+    parser.add_argument("--compare", help="与之前的JSON结果对比")
+    args = parser.parse_args()
+
+    processes = spawn(args) if args.spawn else []
+    server_pid = processes[1].pid if processes else args.server_pid
+    try:
+        seeded = seed(args.stub_url)
+        results = asyncio.run(run_load(args, seeded["token"], seeded["agents"], server_pid))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "host": {"python": platform_module.python_version(), "cpus": os.cpu_count(),
+                 "machine": platform_module.machine()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+        "results": results,
+    }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+模拟 AI 平台上游（压测用）
+
+同一进程同时提供三种协议，行为与真实平台的返回格式一致，适配器无需任何改动：
+    POST /dify/v1/chat-messages   Dify SSE（streaming）/ JSON（blocking）
+    POST /coze/chat               Coze 逐行 JSON 流 / JSON
+    POST /n8n/webhook             n8n webhook，生成完毕后一次性返回文本
+
+可配置输出速率、首字节延迟、抖动和错误注入：
+    --tokens 200 --token-rate 50    每次回复200个token，每秒50个
+    --latency-ms 300 --jitter-ms 50 首字节前等待 300±50ms，token 间隔同样叠加抖动
+    --error-rate 0.01               1% 的请求直接返回 500
+    --disconnect-rate 0.01          1% 的流在中途断开
+
+用法（在 ai-backend 目录下）:
+    python benchmarks/loadtest/stub_upstream.py --port 9100
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+
+class StubConfig:
+    def __init__(self, tokens: int = 200, token_rate: float = 50.0, latency_ms: float = 300.0,
+                 jitter_ms: float = 50.0, error_rate: float = 0.0, disconnect_rate: float = 0.0,
+                 seed: int = None):
+        self.tokens = tokens
+        self.token_rate = token_rate
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.disconnect_rate = disconnect_rate
+        self.rng = random.Random(seed)
+
+    def delay(self, base_seconds: float) -> float:
+        jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms) / 1000
+        return max(0.0, base_seconds + jitter)
+
+    def token_interval(self) -> float:
+        return self.delay(1.0 / self.token_rate) if self.token_rate > 0 else 0.0
+
+    def should_fail(self) -> bool:
+        return self.rng.random() < self.error_rate
+
+    def disconnect_at(self) -> int:
+        """返回在第几个token后断开，-1 表示不断开"""
+        if self.rng.random() < self.disconnect_rate:
+            return self.rng.randint(1, max(1, self.tokens - 1))
+        return -1
+
+    def token(self, index: int) -> str:
+        return f"tok{index} "
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="AI Upstream Stub")
+
+    async def token_stream(render):
+        """按配置的速率输出 token，render(index, text) 返回要发送的字节"""
+        await asyncio.sleep(config.delay(config.latency_ms / 1000))
+        cut = config.disconnect_at()
+        for index in range(config.tokens):
+            if index == cut:
+                # 模拟上游中途断开：抛出异常让服务器直接关闭连接
+                raise ConnectionResetError("stub disconnect")
+            yield render(index, config.token(index))
+            await asyncio.sleep(config.token_interval())
+
+    async def full_text() -> str:
+        await asyncio.sleep(config.delay(config.latency_ms / 1000))
+        if config.token_rate > 0:
+            await asyncio.sleep(config.tokens / config.token_rate)
+        return "".join(config.token(index) for index in range(config.tokens))
+
+    def server_error():
+        return JSONResponse({"message": "stub injected error"}, status_code=500)
+
+    @app.post("/dify/v1/chat-messages")
+    async def dify_chat(request: Request):
+        body = await request.json()
+        if config.should_fail():
+            return server_error()
+        conversation_id = body.get("conversation_id") or str(uuid.uuid4())
+        message_id = str(uuid.uuid4())
+
+        if body.get("response_mode") != "streaming":
+            return {"event": "message", "message_id": message_id,
+                    "conversation_id": conversation_id, "answer": await full_text()}
+
+        def render(index, text):
+            event = {"event": "message", "message_id": message_id,
+                     "conversation_id": conversation_id, "answer": text}
+            return f"data: {json.dumps(event)}\n\n".encode()
+
+        async def events():
+            async for chunk in token_stream(render):
+                yield chunk
+            end = {"event": "message_end", "message_id": message_id, "conversation_id": conversation_id}
+            yield f"data: {json.dumps(end)}\n\n".encode()
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/coze/chat")
+    async def coze_chat(request: Request):
+        body = await request.json()
+        if config.should_fail():
+            return server_error()
+
+        conversation_id = body.get("conversation_id") or str(uuid.uuid4())
+
+        if not body.get("stream"):
+            return {"conversation_id": conversation_id,
+                    "choices": [{"message": {"role": "assistant", "content": await full_text()}}]}
+
+        def render(index, text):
+            chunk = {"conversation_id": conversation_id, "choices": [{"delta": {"content": text}}]}
+            return (json.dumps(chunk) + "\n").encode()
+
+        return StreamingResponse(token_stream(render), media_type="application/x-ndjson")
+
+    @app.post("/n8n/webhook")
+    async def n8n_webhook(request: Request):
+        await request.body()
+        if config.should_fail():
+            return server_error()
+        return PlainTextResponse(await full_text())
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟AI平台上游")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--tokens", type=int, default=200, help="每次回复的token数")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="每秒输出token数，0 表示不限速")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="首字节前的延迟")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="延迟与token间隔的随机抖动")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的请求比例")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="流中途断开的比例")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(args.tokens, args.token_rate, args.latency_ms, args.jitter_ms,
+                        args.error_rate, args.disconnect_rate, args.seed)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+全量重建聊天记录语义搜索索引（SEARCH_INDEX_DIR）
+
+用法: python build_search_index.py [--user 1]
+索引在首次搜索时会自动建立并随消息写入增量更新；升级后预先建好可避免首次搜索变慢，
+也可定期执行以回收已删除、归档消息占用的空间。可在服务运行时执行。
+"""
+
+import argparse
+from sqlalchemy import distinct
+from app.db.database import SessionLocal
+from app.models.chat import ChatSession
+from app.services.search_service import search_available, search_indexer
+
+def main():
+    parser = argparse.ArgumentParser(description="重建语义搜索索引")
+    parser.add_argument("--user", type=int, help="只重建指定用户的索引，默认全部用户")
+    args = parser.parse_args()
+
+    if not search_available():
+        print("语义搜索未启用或未安装 numpy")
+        return
+
+    db = SessionLocal()
+    try:
+        if args.user is not None:
+            user_ids = [args.user]
+        else:
+            user_ids = [user_id for (user_id,) in db.query(distinct(ChatSession.user_id)).order_by(ChatSession.user_id)]
+        total = 0
+        for user_id in user_ids:
+            total += search_indexer.rebuild(db, user_id)
+            db.rollback()
+        print(f"索引重建完成：{len(user_ids)} 个用户，{total} 条消息")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
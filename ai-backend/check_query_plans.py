@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+热点查询执行计划回归检查
+
+对 get_chat_list / get_sessions / 增量同步 / 智能体查询 / 用户查询执行 EXPLAIN，
+若任何一个在热点表上退化为全表扫描则以非零状态退出，可直接用于 CI。
+
+用法: python check_query_plans.py [--strict]
+  默认：全表扫描且没有任何可用索引（possible_keys 为空）时判定失败；
+  --strict：只要出现全表扫描即判定失败（数据量过小时优化器可能主动选择全表扫描）。
+
+请先执行 `alembic upgrade head`，并尽量在有代表性数据的本地库上运行。
+"""
+
+import argparse
+import sys
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+
+from app.db import statements
+from app.db.database import SessionLocal
+from app.models.agent import AiAgentConfig
+from app.models.chat import ChatMessage, ChatSession
+from app.schemas.chat import GetChatListParams
+from app.services.chat_service import ChatService
+
+HOT_TABLES = {"chat_messages", "chat_sessions", "ai_agent_config", "sys_user"}
+
+
+def hot_queries(db) -> List[Tuple[str, Any]]:
+    """与线上代码路径相同的查询构造"""
+    chat_service = ChatService(db)
+    page = GetChatListParams(sessionId=1, pageNum=1, pageSize=10)
+    all_sessions = GetChatListParams(pageNum=1, pageSize=10)
+
+    return [
+        ("get_chat_list(sessionId)", chat_service.chat_list_query(page, 1)
+            .order_by(ChatMessage.created_at.desc()).limit(10).statement),
+        ("get_chat_list(user)", chat_service.chat_list_query(all_sessions, 1)
+            .order_by(ChatMessage.created_at.desc()).limit(10).statement),
+        ("get_sessions", chat_service.sessions_query(1).statement),
+        ("sync sessions", db.query(ChatSession).filter(
+            ChatSession.user_id == 1, ChatSession.sync_seq > 0).order_by(ChatSession.sync_seq).statement),
+        ("sync messages", db.query(ChatMessage).filter(
+            ChatMessage.session_id.in_([1, 2]), ChatMessage.sync_seq > 0)
+            .order_by(ChatMessage.sync_seq, ChatMessage.id).limit(500).statement),
+        ("agent lookup", statements.active_agent(1)),
+        ("active agents", db.query(AiAgentConfig).filter(AiAgentConfig.is_active == True).statement),
+        ("user by name", statements.user_by_name("admin")),
+        ("session conversation", statements.session_conversation(1, 1)),
+    ]
+
+
+def explain_mysql(db, sql: str) -> List[Tuple[str, str]]:
+    problems = []
+    for row in db.execute(text(f"EXPLAIN {sql}")).mappings():
+        table = row.get("table")
+        if table not in HOT_TABLES or row.get("type") != "ALL":
+            continue
+        if row.get("possible_keys"):
+            problems.append(("warn", f"{table}: 全表扫描（可用索引 {row['possible_keys']} 未被选择）"))
+        else:
+            problems.append(("fail", f"{table}: 全表扫描且无可用索引"))
+    return problems
+
+
+def explain_sqlite(db, sql: str) -> List[Tuple[str, str]]:
+    problems = []
+    for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+        detail = row[-1]
+        parts = detail.split()
+        if len(parts) >= 2 and parts[0] == "SCAN" and parts[1] in HOT_TABLES and "USING" not in detail:
+            problems.append(("fail", f"{parts[1]}: {detail}"))
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="热点查询执行计划检查")
+    parser.add_argument("--strict", action="store_true", help="任何全表扫描都判定失败")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        dialect = db.get_bind().dialect
+        if dialect.name == "mysql":
+            db.execute(text("ANALYZE TABLE " + ", ".join(sorted(HOT_TABLES))))
+            explain = explain_mysql
+        elif dialect.name == "sqlite":
+            explain = explain_sqlite
+        else:
+            print(f"不支持的数据库: {dialect.name}")
+            return 2
+
+        failed = False
+        results: Dict[str, List[Tuple[str, str]]] = {}
+        for name, statement in hot_queries(db):
+            sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+            results[name] = explain(db, sql)
+
+        for name, problems in results.items():
+            if not problems:
+                print(f"[OK]   {name}")
+                continue
+            for level, message in problems:
+                is_failure = level == "fail" or args.strict
+                failed = failed or is_failure
+                print(f"[{'FAIL' if is_failure else 'WARN'}] {name}: {message}")
+
+        return 1 if failed else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+后台压缩存量长消息（需先执行 alembic upgrade 0005_compressed_message_content）
+
+按ID分批读取 chat_messages，把超过 MESSAGE_COMPRESS_THRESHOLD 且尚未压缩的内容
+改写为压缩格式；可随时中断，下次用 --start-id 续跑。
+
+用法: python compress_messages.py [--batch-size 500] [--sleep 0.1] [--start-id 0]
+"""
+
+import argparse
+import time
+
+from sqlalchemy import LargeBinary, column, select, table
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.types import CompressedText, decode_content, encode_content, is_compressed
+
+# 绕过 CompressedText，直接读写原始字节
+messages = table("chat_messages", column("id"), column("content", LargeBinary()))
+
+def main():
+    parser = argparse.ArgumentParser(description="后台压缩存量长消息")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的消息数")
+    parser.add_argument("--sleep", type=float, default=0.1, help="批次间隔（秒），降低对线上库的压力")
+    parser.add_argument("--start-id", type=int, default=0, help="从该ID之后开始处理")
+    args = parser.parse_args()
+
+    content_type = CompressedText()
+    db = SessionLocal()
+    last_id = args.start_id
+    scanned = compressed = saved = 0
+    try:
+        while True:
+            rows = db.execute(
+                select(messages.c.id, messages.c.content)
+                .where(messages.c.id > last_id)
+                .order_by(messages.c.id)
+                .limit(args.batch_size)
+            ).all()
+            if not rows:
+                break
+
+            for message_id, content in rows:
+                if len(content) <= settings.MESSAGE_COMPRESS_THRESHOLD or is_compressed(content):
+                    continue
+                encoded = encode_content(decode_content(content), content_type.threshold, content_type.codec)
+                if len(encoded) < len(content):
+                    db.execute(messages.update().where(messages.c.id == message_id).values(content=encoded))
+                    compressed += 1
+                    saved += len(content) - len(encoded)
+
+            db.commit()
+            scanned += len(rows)
+            last_id = rows[-1][0]
+            print(f"已扫描 {scanned} 条（最后ID {last_id}），压缩 {compressed} 条，节省 {saved / 1024 / 1024:.1f} MB")
+            time.sleep(args.sleep)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""初始表结构（与原 Base.metadata.create_all 建出的表一致）
+
+已有数据库请先执行 `alembic stamp 0001_initial` 再升级。
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_initial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sys_user",
+        sa.Column("user_id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("user_name", sa.String(30), nullable=False),
+        sa.Column("nick_name", sa.String(30)),
+        sa.Column("password", sa.String(100), nullable=False),
+        sa.Column("email", sa.String(50)),
+        sa.Column("phonenumber", sa.String(11)),
+        sa.Column("sex", sa.CHAR(1)),
+        sa.Column("avatar", sa.String(100)),
+        sa.Column("status", sa.CHAR(1)),
+        sa.Column("del_flag", sa.CHAR(1)),
+        sa.Column("login_ip", sa.String(50)),
+        sa.Column("login_date", sa.DateTime()),
+        sa.Column("create_by", sa.String(64)),
+        sa.Column("create_time", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("update_by", sa.String(64)),
+        sa.Column("update_time", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("remark", sa.String(500)),
+    )
+    op.create_index("ix_sys_user_user_id", "sys_user", ["user_id"])
+    op.create_index("ix_sys_user_user_name", "sys_user", ["user_name"], unique=True)
+    op.create_index("ix_sys_user_email", "sys_user", ["email"], unique=True)
+
+    op.create_table(
+        "ai_platform_type",
+        sa.Column("platform_type", sa.String(20), primary_key=True),
+        sa.Column("platform_name", sa.String(50), nullable=False),
+        sa.Column("description", sa.Text()),
+    )
+
+    op.create_table(
+        "ai_agent_config",
+        sa.Column("agent_id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("agent_name", sa.String(100), nullable=False),
+        sa.Column("platform_type", sa.String(20), nullable=False),
+        sa.Column("agent_key", sa.String(100)),
+        sa.Column("description", sa.Text()),
+        sa.Column("base_url", sa.String(255), nullable=False),
+        sa.Column("api_key", sa.String(255), nullable=False),
+        sa.Column("access_token", sa.String(255)),
+        sa.Column("bot_id", sa.String(100)),
+        sa.Column("webhook_url", sa.String(255)),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_default", sa.Boolean()),
+        sa.Column("is_stream", sa.Boolean()),
+        sa.Column("user_id", sa.BigInteger()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+    op.create_table(
+        "chat_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("sys_user.user_id"), nullable=False),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("session_type", sa.String(50)),
+        sa.Column("ai_platform", sa.String(50)),
+        sa.Column("ai_platform_app_id", sa.String(255)),
+        sa.Column("config", sa.JSON()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+        sa.Column("agent_id", sa.BigInteger(), nullable=False),
+        sa.Column("ai_platform_id", sa.Integer()),
+    )
+
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "session_id", sa.Integer(),
+            sa.ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("message_type", sa.String(20), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("message_metadata", sa.JSON()),
+        sa.Column("platform_response_id", sa.String(255)),
+        sa.Column("tokens_used", sa.Integer()),
+        sa.Column("processing_time", sa.Integer()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("chat_messages")
+    op.drop_table("chat_sessions")
+    op.drop_table("ai_agent_config")
+    op.drop_table("ai_platform_type")
+    op.drop_index("ix_sys_user_email", table_name="sys_user")
+    op.drop_index("ix_sys_user_user_name", table_name="sys_user")
+    op.drop_index("ix_sys_user_user_id", table_name="sys_user")
+    op.drop_table("sys_user")
@@ -0,0 +1,51 @@
+"""聊天统计汇总表与会话冗余计数
+
+Revision ID: 0002_stats_and_session_counters
+Revises: 0001_initial
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_stats_and_session_counters"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_statistics",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("scope", sa.String(10), nullable=False),
+        sa.Column("scope_key", sa.String(32), nullable=False),
+        *[
+            sa.Column(name, sa.BigInteger(), nullable=False, server_default="0")
+            for name in (
+                "message_count",
+                "user_message_count",
+                "assistant_message_count",
+                "tokens_used",
+                "processing_time_sum",
+                "processing_time_count",
+            ) + tuple(f"latency_bucket_{i}" for i in range(8))
+        ],
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.UniqueConstraint("scope", "scope_key", name="uk_chat_statistics_scope"),
+    )
+
+    op.add_column(
+        "chat_sessions",
+        sa.Column("message_count", sa.Integer(), nullable=False, server_default="0")
+    )
+    op.add_column("chat_sessions", sa.Column("last_message_at", sa.DateTime()))
+    op.add_column("chat_sessions", sa.Column("last_message_preview", sa.String(255)))
+
+
+def downgrade() -> None:
+    op.drop_column("chat_sessions", "last_message_preview")
+    op.drop_column("chat_sessions", "last_message_at")
+    op.drop_column("chat_sessions", "message_count")
+    op.drop_table("chat_statistics")
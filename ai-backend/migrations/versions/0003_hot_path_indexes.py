@@ -0,0 +1,34 @@
+"""热点查询索引
+
+- chat_messages(session_id, created_at)：按会话分页读取聊天记录
+- chat_sessions(user_id, updated_at)：用户会话列表
+- ai_agent_config(is_active)：可用智能体列表
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_stats_and_session_counters
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+
+revision = "0003_hot_path_indexes"
+down_revision = "0002_stats_and_session_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "idx_chat_messages_session_created", "chat_messages", ["session_id", "created_at"]
+    )
+    op.create_index(
+        "idx_chat_sessions_user_updated", "chat_sessions", ["user_id", "updated_at"]
+    )
+    op.create_index("idx_ai_agent_config_active", "ai_agent_config", ["is_active"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_ai_agent_config_active", table_name="ai_agent_config")
+    op.drop_index("idx_chat_sessions_user_updated", table_name="chat_sessions")
+    op.drop_index("idx_chat_messages_session_created", table_name="chat_messages")
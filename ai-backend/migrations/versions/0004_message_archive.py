@@ -0,0 +1,37 @@
+"""已归档会话的消息位置索引
+
+Revision ID: 0004_message_archive
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_message_archive"
+down_revision = "0003_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_message_archive",
+        sa.Column(
+            "session_id", sa.Integer(),
+            sa.ForeignKey("chat_sessions.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("segment", sa.String(64), nullable=False),
+        sa.Column("offset", sa.BigInteger(), nullable=False),
+        sa.Column("length", sa.Integer(), nullable=False),
+        sa.Column("codec", sa.String(10), nullable=False),
+        sa.Column("message_count", sa.Integer(), nullable=False),
+        sa.Column("last_message_at", sa.DateTime()),
+        sa.Column("last_message_preview", sa.String(255)),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("chat_message_archive")
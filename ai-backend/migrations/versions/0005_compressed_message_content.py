@@ -0,0 +1,86 @@
+"""chat_messages.content 改为二进制列以支持压缩存储
+
+原 TEXT 内容按 UTF-8 字节原样保留，无需转换即可读取；
+存量长消息的压缩由 compress_messages.py 在后台分批完成。
+
+MySQL 修改列类型需要复制整表并阻塞写入：数据量超过 ONLINE_ALTER_MIN_ROWS 时
+本迁移不直接执行 ALTER，需先用 pt-online-schema-change / gh-ost 在线变更列类型，
+再执行本迁移（检测到列已是 LONGBLOB 时跳过 ALTER，见 DEPLOYMENT.md）。
+
+Revision ID: 0005_compressed_message_content
+Revises: 0004_message_archive
+Create Date: 2026-10-19
+"""
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+revision = "0005_compressed_message_content"
+down_revision = "0004_message_archive"
+branch_labels = None
+depends_on = None
+
+BLOB = sa.LargeBinary().with_variant(mysql.LONGBLOB(), "mysql")
+
+# 超过该行数（information_schema 估算值）时不在迁移中直接 ALTER
+ONLINE_ALTER_MIN_ROWS = 100000
+
+ONLINE_ALTER_HINT = (
+    "chat_messages 约有 {rows} 行，直接修改列类型会长时间阻塞写入。请先在线变更：\n"
+    "  pt-online-schema-change --alter \"MODIFY content LONGBLOB NOT NULL\" "
+    "D=<数据库名>,t=chat_messages --execute\n"
+    "完成后重新执行 alembic upgrade head"
+)
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode() and op.get_bind().dialect.name == "mysql":
+        data_type, rows = op.get_bind().execute(sa.text(
+            "SELECT c.DATA_TYPE, t.TABLE_ROWS FROM information_schema.COLUMNS c "
+            "JOIN information_schema.TABLES t "
+            "ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME "
+            "WHERE c.TABLE_SCHEMA = DATABASE() AND c.TABLE_NAME = 'chat_messages' "
+            "AND c.COLUMN_NAME = 'content'"
+        )).one()
+        if data_type.lower() == "longblob":
+            # 已通过在线变更工具修改
+            return
+        if (rows or 0) > ONLINE_ALTER_MIN_ROWS:
+            raise RuntimeError(ONLINE_ALTER_HINT.format(rows=rows))
+
+    op.alter_column(
+        "chat_messages", "content",
+        type_=BLOB, existing_type=sa.Text(), existing_nullable=False
+    )
+
+
+def downgrade() -> None:
+    from app.db.types import decode_content, is_compressed
+
+    # 回退前先把压缩内容解压为原始 UTF-8
+    bind = op.get_bind()
+    messages = sa.table("chat_messages", sa.column("id"), sa.column("content", sa.LargeBinary()))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(messages.c.id, messages.c.content)
+            .where(messages.c.id > last_id)
+            .order_by(messages.c.id)
+            .limit(1000)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for message_id, content in rows:
+            if is_compressed(content) or (content and content[0] == 0):
+                bind.execute(
+                    messages.update().where(messages.c.id == message_id)
+                    .values(content=decode_content(content).encode("utf-8"))
+                )
+
+    op.alter_column(
+        "chat_messages", "content",
+        type_=sa.Text(), existing_type=BLOB, existing_nullable=False
+    )
@@ -0,0 +1,43 @@
+"""异步对话任务表
+
+Revision ID: 0006_chat_jobs
+Revises: 0005_compressed_message_content
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+revision = "0006_chat_jobs"
+down_revision = "0005_compressed_message_content"
+branch_labels = None
+depends_on = None
+
+BLOB = sa.LargeBinary().with_variant(mysql.LONGBLOB(), "mysql")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_jobs",
+        sa.Column("id", sa.String(32), primary_key=True),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("sys_user.user_id"), nullable=False),
+        sa.Column("agent_id", sa.BigInteger(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("request", sa.JSON(), nullable=False),
+        sa.Column("result", BLOB),
+        sa.Column("error", sa.Text()),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("callback_url", sa.String(1024)),
+        sa.Column("callback_status", sa.Integer()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime()),
+        sa.Column("finished_at", sa.DateTime()),
+    )
+    op.create_index("idx_chat_jobs_user_created", "chat_jobs", ["user_id", "created_at"])
+    op.create_index("idx_chat_jobs_status", "chat_jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_table("chat_jobs")
@@ -0,0 +1,54 @@
+"""增量同步：用户变更序号、会话/消息同步序号与会话墓碑
+
+Revision ID: 0007_chat_sync
+Revises: 0006_chat_jobs
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_chat_sync"
+down_revision = "0006_chat_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_sync_seq",
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("sys_user.user_id"), primary_key=True),
+        sa.Column("seq", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "chat_session_tombstones",
+        sa.Column("session_id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("seq", sa.BigInteger(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "idx_chat_session_tombstones_user_seq", "chat_session_tombstones", ["user_id", "seq"]
+    )
+
+    # 已有数据的序号为 0，客户端首次同步前先通过列表接口加载历史
+    op.add_column(
+        "chat_sessions",
+        sa.Column("sync_seq", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "chat_messages",
+        sa.Column("sync_seq", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.create_index("idx_chat_sessions_user_sync", "chat_sessions", ["user_id", "sync_seq"])
+    op.create_index("idx_chat_messages_session_sync", "chat_messages", ["session_id", "sync_seq"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_chat_messages_session_sync", table_name="chat_messages")
+    op.drop_index("idx_chat_sessions_user_sync", table_name="chat_sessions")
+    op.drop_column("chat_messages", "sync_seq")
+    op.drop_column("chat_sessions", "sync_seq")
+    op.drop_table("chat_session_tombstones")
+    op.drop_table("chat_sync_seq")
@@ -0,0 +1,23 @@
+"""会话保存AI平台返回的会话ID
+
+Revision ID: 0008_platform_conversation_id
+Revises: 0007_chat_sync
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_platform_conversation_id"
+down_revision = "0007_chat_sync"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chat_sessions", sa.Column("platform_conversation_id", sa.String(255)))
+
+
+def downgrade() -> None:
+    op.drop_column("chat_sessions", "platform_conversation_id")
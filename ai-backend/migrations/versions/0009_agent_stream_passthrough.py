@@ -0,0 +1,26 @@
+"""智能体SSE透传开关
+
+Revision ID: 0009_agent_stream_passthrough
+Revises: 0008_platform_conversation_id
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_agent_stream_passthrough"
+down_revision = "0008_platform_conversation_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "ai_agent_config",
+        sa.Column("stream_passthrough", sa.Boolean(), nullable=True, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("ai_agent_config", "stream_passthrough")
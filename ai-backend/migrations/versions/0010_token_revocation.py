@@ -0,0 +1,33 @@
+"""令牌吊销表
+
+Revision ID: 0010_token_revocation
+Revises: 0009_agent_stream_passthrough
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_token_revocation"
+down_revision = "0009_agent_stream_passthrough"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sys_token_revocation",
+        sa.Column("jti", sa.String(64), primary_key=True),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("idx_sys_token_revocation_expires", "sys_token_revocation", ["expires_at"])
+    op.create_index("idx_sys_token_revocation_revoked", "sys_token_revocation", ["revoked_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_sys_token_revocation_revoked", table_name="sys_token_revocation")
+    op.drop_index("idx_sys_token_revocation_expires", table_name="sys_token_revocation")
+    op.drop_table("sys_token_revocation")
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+按 chat_messages 修复 chat_sessions 上的冗余计数
+（message_count / last_message_at / last_message_preview）
+
+用法: python reconcile_session_counters.py [--batch-size 500]
+"""
+
+import argparse
+from app.db.database import SessionLocal
+from app.services.session_counters import reconcile_session_counters
+
+def main():
+    parser = argparse.ArgumentParser(description="修复会话冗余计数")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的会话数")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        fixed = reconcile_session_counters(db, batch_size=args.batch_size)
+        print(f"会话计数修复完成，共修正 {fixed} 个会话")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+测试公共夹具
+
+数据库相关的测试使用内存 SQLite（不需要 MySQL）：建表后绑定到 SessionLocal，
+服务代码中的 SessionLocal() 与测试共用同一个连接。
+"""
+
+import pytest
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401  注册所有模型
+from app.db.database import Base, SessionLocal
+from app.models.chat import ChatSession
+from app.models.user import SysUser
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_bigint(type_, compiler, **kw):
+    # SQLite 只有 INTEGER PRIMARY KEY 才自增
+    return "INTEGER"
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+
+    @event.listens_for(engine, "connect")
+    def _enable_foreign_keys(connection, record):
+        connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(engine)
+    SessionLocal.configure(bind=engine)
+    yield engine
+    # 恢复为首次使用时再绑定 MySQL 引擎
+    SessionLocal.configure(bind=None)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_session(db):
+    """创建用户（不存在时）与会话，返回会话ID"""
+
+    def _make_session(user_id: int, session_id: int, agent_id: int = 1) -> int:
+        if db.get(SysUser, user_id) is None:
+            db.add(SysUser(user_id=user_id, user_name=f"user{user_id}", password="x"))
+            db.flush()
+        db.add(ChatSession(id=session_id, user_id=user_id, title="测试会话", agent_id=agent_id))
+        db.commit()
+        return session_id
+
+    return _make_session
@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app.core.config import settings
+from app.models.chat import ChatMessage, ChatMessageArchive, ChatSession
+from app.services import archive_service
+from app.services.archive_service import ArchiveService, read_archived_messages
+from app.services.write_behind import save_messages
+from app.utils.archive_segment import SegmentReader
+
+OLD = datetime(2025, 1, 1, 9, 0)
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "ARCHIVE_CODEC", "gzip")
+    monkeypatch.setattr(settings, "ARCHIVE_SEGMENT_MAX_BYTES", 1024 * 1024)
+    reader = SegmentReader(str(tmp_path))
+    monkeypatch.setattr(archive_service, "segment_reader", reader)
+    yield tmp_path
+    reader.close()
+
+
+def message(session_id, content, created_at=OLD):
+    return {
+        "session_id": session_id, "user_id": 1, "agent_id": 1,
+        "message_type": "user", "content": content, "created_at": created_at,
+    }
+
+
+def archived_contents(db, session_id):
+    db.expire_all()
+    return [message["content"] for message in read_archived_messages(db.get(ChatMessageArchive, session_id))]
+
+
+def test_inactive_sessions_move_to_segments(db, make_session, archive_dir):
+    make_session(1, 1)
+    make_session(1, 2)
+    save_messages(db, [message(1, "a"), message(1, "b"), message(2, "c")])
+    save_messages(db, [message(2, "recent", datetime.now())])
+
+    assert ArchiveService(db).archive_inactive(older_than_days=30) == (1, 2)
+    assert db.query(ChatMessage).filter(ChatMessage.session_id == 1).count() == 0
+    assert db.query(ChatMessage).filter(ChatMessage.session_id == 2).count() == 2
+    assert archived_contents(db, 1) == ["a", "b"]
+    assert db.get(ChatSession, 1).message_count == 2
+
+    # 归档后又有消息：再次归档时与旧帧合并成一个新帧
+    save_messages(db, [message(1, "c", datetime(2025, 2, 1))])
+    assert ArchiveService(db).archive_inactive(older_than_days=30) == (1, 1)
+    assert archived_contents(db, 1) == ["a", "b", "c"]
+    assert db.get(ChatMessageArchive, 1).message_count == 3
+
+
+def test_compaction_moves_live_frames_and_removes_segment(db, make_session, archive_dir, monkeypatch):
+    make_session(1, 1)
+    make_session(1, 2)
+    save_messages(db, [message(1, f"long message {i} " * 50) for i in range(20)])
+    save_messages(db, [message(2, "kept")])
+    service = ArchiveService(db)
+    service.archive_inactive(older_than_days=30)
+    first = db.get(ChatMessageArchive, 1).segment
+    assert db.get(ChatMessageArchive, 2).segment == first
+
+    # 新帧写入新段，会话 1 在第一个段中的旧帧变为垃圾
+    monkeypatch.setattr(settings, "ARCHIVE_SEGMENT_MAX_BYTES", 1)
+    save_messages(db, [message(1, "more", datetime(2025, 2, 1))])
+    service.archive_inactive(older_than_days=30)
+    old_frame = os.path.getsize(archive_dir / first) - db.get(ChatMessageArchive, 2).length
+    assert db.get(ChatMessageArchive, 1).segment != first
+
+    # 最新段不参与合并
+    assert service.compact_segments(min_garbage=0.5) == (1, old_frame)
+    assert not (archive_dir / first).exists()
+    db.expire_all()
+    assert db.get(ChatMessageArchive, 2).segment not in (first, db.get(ChatMessageArchive, 1).segment)
+    assert archived_contents(db, 2) == ["kept"]
+    assert archived_contents(db, 1)[-1] == "more"
+    assert service.compact_segments(min_garbage=0.5) == (0, 0)
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import httpx
+
+from app.core.config import settings
+from app.core.drain import drain_controller
+from app.core.ratelimit import MemoryBucketStore, RateLimitPolicy, rate_limiter
+from app.models.agent import AiAgentConfig
+from app.models.chat import ChatMessage
+from app.schemas.chat import BatchPrompt
+from app.services.batch_service import BatchRunner
+
+AGENT = AiAgentConfig(
+    agent_id=1, agent_name="dify", platform_type="dify", base_url="http://dify.local/v1",
+    api_key="key", agent_key="", is_stream=True,
+)
+
+
+def dify_stream(query):
+    """每个片段之间让出事件循环，使并发的条目交错解析"""
+    async def body():
+        for i in range(1, 4):
+            event = {"event": "message", "conversation_id": f"conv-{query}", "answer": f"{query}{i}"}
+            data = json.dumps(event).encode()
+            # 一行拆成两块发送，解析缓冲中会留下半行
+            yield b"data: " + data[:10]
+            await asyncio.sleep(0)
+            yield data[10:] + b"\n\n"
+            await asyncio.sleep(0)
+    return body()
+
+
+def handler(request):
+    query = json.loads(request.content)["query"]
+    return httpx.Response(200, content=dify_stream(query), headers={"content-type": "text/event-stream"})
+
+
+def run_batch(runner, prompts, concurrency, db=None, session_id=None):
+    async def scenario():
+        runner.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        lines = []
+        with drain_controller.track(1, stream=False) as handle:
+            async for line in runner.run(prompts, concurrency, handle, db, session_id):
+                lines.append(json.loads(line))
+        await runner.client.aclose()
+        return lines
+
+    lines = asyncio.run(scenario())
+    return {line["id"]: line for line in lines[:-1]}, lines[-1]
+
+
+def test_concurrent_items_do_not_share_parser_state():
+    runner = BatchRunner(AGENT, 1)
+    prompts = [BatchPrompt(id=name, content=name) for name in ("A", "B", "C")]
+    results, summary = run_batch(runner, prompts, 3)
+
+    assert {key: result["content"] for key, result in results.items()} == {
+        "A": "A1A2A3", "B": "B1B2B3", "C": "C1C2C3",
+    }
+    assert summary["succeeded"] == 3 and summary["failed"] == 0
+
+
+def test_each_item_is_charged_to_chat_bucket(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limiter, "store", MemoryBucketStore())
+    monkeypatch.setitem(rate_limiter.policies, "chat", RateLimitPolicy("chat", "user", 2, 60))
+
+    runner = BatchRunner(AGENT, 1, "u:user1")
+    prompts = [BatchPrompt(id=str(i), content="A") for i in range(5)]
+    results, summary = run_batch(runner, prompts, 1)
+
+    assert summary["succeeded"] == 2 and summary["failed"] == 3
+    assert sum(result["error"] == "请求过于频繁，请稍后再试" for result in results.values() if not result["ok"]) == 3
+
+
+def test_persisted_batch_saves_questions_and_answers(db, make_session, monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", False)
+    make_session(1, 1)
+    runner = BatchRunner(AGENT, 1)
+    results, summary = run_batch(runner, [BatchPrompt(id="a", content="A")], 1, db, 1)
+
+    assert summary["session_id"] == 1
+    db.expire_all()
+    assert [(m.message_type, m.content) for m in db.query(ChatMessage).order_by(ChatMessage.id)] == [
+        ("user", "A"), ("assistant", "A1A2A3"),
+    ]
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.models.agent import AiAgentConfig
+from app.models.chat import ChatMessage, ChatSession
+from app.schemas.chat import Message, SendDTO
+from app.services import chat_service
+from app.services.chat_service import ChatService
+
+
+@pytest.fixture
+def dify(db, monkeypatch):
+    """两个 Dify 智能体；记录上游收到的请求体，未带会话ID时返回新的平台会话ID"""
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", False)
+    db.add_all([
+        AiAgentConfig(agent_id=agent_id, agent_name=f"dify{agent_id}", platform_type="dify",
+                      base_url="http://dify.local/v1", api_key="key", agent_key="", is_stream=True)
+        for agent_id in (1, 2)
+    ])
+    db.commit()
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        conversation_id = requests[-1]["conversation_id"] or f"conv-{len(requests)}"
+        body = b"".join(
+            b"data: " + json.dumps(event).encode() + b"\n\n"
+            for event in (
+                {"event": "message", "conversation_id": conversation_id, "answer": "ok"},
+                {"event": "message_end", "conversation_id": conversation_id},
+            )
+        )
+        return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(chat_service, "get_client", lambda platform: client)
+    yield requests
+    asyncio.run(client.aclose())
+
+
+def send(db, user_id, session_id, agent_id=1, content="你好"):
+    send_dto = SendDTO(agent_id=str(agent_id), sessionId=session_id,
+                       messages=[Message(role="user", content=content)])
+
+    async def scenario():
+        return [chunk async for chunk in ChatService(db).send_message(send_dto, user_id)]
+
+    return asyncio.run(scenario())
+
+
+def conversation_id(db, session_id):
+    db.expire_all()
+    return db.get(ChatSession, session_id).platform_conversation_id
+
+
+def test_conversation_id_is_reused_across_turns(db, make_session, dify):
+    make_session(1, 1)
+    assert send(db, 1, 1) == ["ok"]
+    assert conversation_id(db, 1) == "conv-1"
+
+    send(db, 1, 1)
+    # 第二轮沿用第一轮上游返回的会话ID
+    assert [request["conversation_id"] for request in dify] == ["", "conv-1"]
+    assert conversation_id(db, 1) == "conv-1"
+
+
+def test_switching_agent_starts_new_conversation(db, make_session, dify):
+    make_session(1, 1)
+    send(db, 1, 1)
+    send(db, 1, 1, agent_id=2)
+    assert [request["conversation_id"] for request in dify] == ["", ""]
+    assert conversation_id(db, 1) == "conv-1"
+
+
+def test_session_of_other_user_is_rejected(db, make_session, dify):
+    make_session(1, 1)
+    make_session(2, 2)
+    assert send(db, 2, 1) == [json.dumps({"error": "会话不存在"})]
+    assert dify == []
+    assert db.query(ChatMessage).count() == 0
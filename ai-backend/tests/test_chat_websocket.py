@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api import chat
+from app.core.security import SecurityManager
+from app.services import chat_mux
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(chat.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_token_is_sent_in_first_frame(db, make_session, client):
+    make_session(1, 1)
+    token = SecurityManager.create_access_token({"sub": "user1"})
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.send_text(json.dumps(["auth", token]))
+        ws.send_text("garbage")
+        # 认证通过后进入多路复用协议
+        assert json.loads(ws.receive_text()) == ["err", None, "帧格式错误", 400]
+
+
+@pytest.mark.parametrize("frame", [
+    json.dumps(["auth", "bad"]),
+    json.dumps(["send", 1, {}]),
+    "garbage",
+])
+def test_invalid_first_frame_closes_connection(db, client, frame):
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.send_text(frame)
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_text()
+    assert closed.value.code == 1008
+
+
+def test_missing_auth_frame_times_out(db, client, monkeypatch):
+    monkeypatch.setattr(chat_mux, "AUTH_TIMEOUT", 0.05)
+    with client.websocket_connect("/chat/ws") as ws:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_text()
+    assert closed.value.code == 1008
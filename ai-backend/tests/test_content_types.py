@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from app.db import types
+from app.db.types import FORMAT_RAW, FORMAT_ZLIB, FORMAT_ZSTD, decode_content, encode_content, is_compressed
+from app.models.chat import ChatMessage
+from app.schemas.chat import GetChatListParams
+from app.services import chat_service
+from app.services.chat_service import ChatService
+
+CODECS = [FORMAT_ZLIB]
+if types.zstandard is not None:
+    CODECS.append(FORMAT_ZSTD)
+
+LONG_TEXT = "发票报销流程说明 invoice reimbursement " * 200
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("text", [
+    "",
+    "hello",
+    "中文内容",
+    "\x00以标记字节开头",
+    "\x01\x02",
+    LONG_TEXT,
+])
+def test_round_trip(text, codec):
+    data = encode_content(text, 256, codec)
+    assert decode_content(data) == text
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_long_text_is_compressed_with_tag(codec):
+    data = encode_content(LONG_TEXT, 256, codec)
+    assert data[0] == codec
+    assert is_compressed(data)
+    assert len(data) < len(LONG_TEXT.encode("utf-8"))
+
+
+def test_short_text_is_stored_raw():
+    # 未压缩的内容与历史数据一致，按原始 UTF-8 存储
+    assert encode_content("hello", 256, FORMAT_ZLIB) == b"hello"
+
+
+def test_text_starting_with_tag_is_escaped():
+    data = encode_content("\x01abc", 256, FORMAT_ZLIB)
+    assert data == bytes((FORMAT_RAW,)) + b"\x01abc"
+    assert not is_compressed(data)
+
+
+def test_incompressible_text_is_stored_raw():
+    # 超过阈值但压缩后不更短：不加压缩标记
+    text = "abcdefghijklmnopqrstuvwxyz"
+    assert encode_content(text, 4, FORMAT_ZLIB) == text.encode("utf-8")
+
+
+def test_legacy_values_pass_through():
+    assert decode_content(None) is None
+    assert decode_content("旧的文本列") == "旧的文本列"
+    assert decode_content(b"plain") == "plain"
+
+
+def test_compressed_column_round_trip(db, make_session):
+    make_session(1, 1)
+    db.add_all([
+        ChatMessage(session_id=1, message_type="assistant", content=LONG_TEXT, created_at=datetime.now()),
+        ChatMessage(session_id=1, message_type="user", content="short", created_at=datetime.now()),
+    ])
+    db.commit()
+    db.expire_all()
+
+    assert [message.content for message in db.query(ChatMessage).order_by(ChatMessage.id)] == [LONG_TEXT, "short"]
+    raw = db.connection().exec_driver_sql("SELECT content FROM chat_messages ORDER BY id").scalars().all()
+    assert is_compressed(raw[0])
+    assert raw[1] == b"short"
+
+
+@pytest.mark.skipif(types.zstandard is None, reason="未安装 zstandard")
+def test_zstd_is_safe_across_threads():
+    texts = [f"线程{i} " * 2000 for i in range(8)]
+
+    def round_trip(text):
+        return all(decode_content(encode_content(text, 256, FORMAT_ZSTD)) == text for _ in range(20))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert all(pool.map(round_trip, texts))
+
+
+def test_zstd_content_without_zstandard(monkeypatch):
+    monkeypatch.setattr(types, "zstandard", None)
+    with pytest.raises(RuntimeError, match="zstandard"):
+        decode_content(bytes((FORMAT_ZSTD,)) + b"\x28\xb5\x2f\xfd")
+
+
+def test_compressed_search_is_bounded(db, make_session, monkeypatch):
+    monkeypatch.setattr(types.settings, "MESSAGE_COMPRESSED_SEARCH_MAX_SCAN", 3)
+    monkeypatch.setattr(chat_service, "COMPRESSED_SEARCH_BATCH", 2)
+    make_session(1, 1)
+    db.add_all([
+        ChatMessage(session_id=1, message_type="assistant", content=f"{i:02d}{LONG_TEXT}", created_at=datetime.now())
+        for i in range(5)
+    ])
+    db.commit()
+
+    matched = ChatService(db)._compressed_matches(GetChatListParams(content="invoice"), 1)
+    # 只扫描最新的 3 条压缩消息
+    assert matched == [5, 4, 3]
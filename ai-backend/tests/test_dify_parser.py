@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from app.adapters.dify_adapter import DifyAdapter
+from app.utils.dify_parser import DifyParser, DifySSEScanner
+
+EVENTS = [
+    {"event": "workflow_started", "conversation_id": "conv-1", "data": {"id": "run-1"}},
+    {"event": "node_started", "data": {"id": "node-1", "title": "LLM"}},
+    {"event": "message", "conversation_id": "conv-1", "answer": "你好"},
+    {"event": "message", "conversation_id": "conv-1", "answer": "，带\"引号\"与\\反斜杠\n换行"},
+    {"event": "agent_message", "conversation_id": "conv-1", "answer": " emoji 😀"},
+    {"event": "message", "conversation_id": "conv-1", "answer": ""},
+    {"event": "node_finished", "data": {"id": "node-1", "outputs": {"answer": "不应计入"}}},
+    {"event": "message_end", "conversation_id": "conv-1",
+     "metadata": {"usage": {"prompt_tokens": 3, "completion_tokens": 5, "total_tokens": 8}}},
+]
+
+
+def sse_stream(separators=(", ", ": ")):
+    return b"".join(
+        b"data: " + json.dumps(event, ensure_ascii=False, separators=separators).encode("utf-8") + b"\n\n"
+        for event in EVENTS
+    )
+
+
+def chunked(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def parse_with_adapter(chunks):
+    """非透传模式的解析结果（DifyParser + DifyAdapter 的事件取值）"""
+    adapter = DifyAdapter({"base_url": "http://dify.local/v1", "api_key": "k", "agent_key": "a"})
+    parser = DifyParser()
+    parts, conversation_id = [], None
+    for chunk in chunks:
+        for event in parser.parse_chunk(chunk):
+            conversation_id = conversation_id or adapter._event_conversation_id(event)
+            text = adapter._event_text(event)
+            if text:
+                parts.append(text)
+    return "".join(parts), conversation_id
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 100000])
+@pytest.mark.parametrize("separators", [(", ", ": "), (",", ":")])
+def test_scanner_matches_parser(size, separators):
+    chunks = chunked(sse_stream(separators), size)
+    scanner = DifySSEScanner()
+    for chunk in chunks:
+        scanner.feed(chunk)
+
+    answer, conversation_id = parse_with_adapter(chunks)
+    assert scanner.answer == answer == "你好，带\"引号\"与\\反斜杠\n换行 emoji 😀"
+    assert scanner.conversation_id == conversation_id == "conv-1"
+    assert scanner.total_tokens == 8
+    assert not scanner.partial
+
+
+def test_scanner_reports_partial_line():
+    scanner = DifySSEScanner()
+    data = sse_stream()
+    scanner.feed(data[:-5])
+    assert scanner.partial
+    scanner.feed(data[-5:])
+    assert not scanner.partial
+
+
+def test_scanner_drops_oversized_line():
+    scanner = DifySSEScanner(max_line_size=16)
+    scanner.feed(b'data: {"event": "message", "answer": "' + b"x" * 64)
+    assert not scanner.partial
+    scanner.feed(b'data: {"event": "message", "answer": "ok"}\n')
+    assert scanner.answer == "ok"
@@ -0,0 +1,73 @@
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app.models.chat import ChatMessage, ChatSession
+from app.services.export_service import export_user_history, import_user_history
+from app.services.write_behind import save_messages
+
+
+def message(session_id, message_type, content, minute):
+    return {
+        "session_id": session_id, "user_id": 1, "agent_id": 1, "message_type": message_type,
+        "content": content, "tokens_used": 3, "created_at": datetime(2026, 1, 1, 9, minute),
+    }
+
+
+def seed(db, make_session):
+    make_session(1, 1)
+    make_session(1, 2, agent_id=2)
+    make_session(2, 3)
+    save_messages(db, [
+        message(1, "user", "你好", 0),
+        message(1, "assistant", "长回复" * 2000, 1),
+        message(2, "user", "第二个会话", 2),
+        {**message(3, "user", "其他用户", 3), "user_id": 2},
+    ])
+
+
+def history(db, user_id):
+    db.expire_all()
+    sessions = db.query(ChatSession).filter(ChatSession.user_id == user_id).order_by(ChatSession.id).all()
+    return [
+        (session.agent_id, session.message_count, [
+            (m.message_type, m.content, m.tokens_used, m.created_at)
+            for m in db.query(ChatMessage).filter(ChatMessage.session_id == session.id).order_by(ChatMessage.id)
+        ])
+        for session in sessions
+    ]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_export_import_round_trip(db, make_session, compress):
+    seed(db, make_session)
+    exported = b"".join(export_user_history(1, compress=compress, batch_size=1))
+    if compress:
+        assert exported[:2] == b"\x1f\x8b"
+        exported = gzip.decompress(exported)
+    types = [json.loads(line)["type"] for line in exported.splitlines()]
+    assert types == ["header", "session", "message", "message", "session", "message"]
+
+    make_session(5, 10)
+    result = import_user_history(db, 5, io.BytesIO(exported), batch_size=2)
+    assert result == {"sessions": 2, "messages": 3, "skipped": 0}
+    imported = history(db, 5)[1:]
+    assert imported == history(db, 1)
+
+
+def test_invalid_file_writes_nothing(db, make_session):
+    seed(db, make_session)
+    exported = b"".join(export_user_history(1))
+    broken = exported + b'{"type": "message", "session_id": 1}\n'
+
+    make_session(5, 10)
+    with pytest.raises(ValueError, match="第 7 行"):
+        import_user_history(db, 5, io.BytesIO(broken))
+    assert len(history(db, 5)) == 1
+
+    with pytest.raises(EOFError):
+        import_user_history(db, 5, io.BytesIO(gzip.compress(exported)[:-20]))
+    assert len(history(db, 5)) == 1
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.models.agent import AiAgentConfig
+from app.models.chat import ChatJob, ChatMessage
+from app.schemas.chat import JobSubmitDTO, Message
+from app.services import chat_service, job_service
+from app.services.job_service import STALE_RUNNING_AFTER, _claim, create_job, execute_job, reset_stale_jobs
+
+
+@pytest.fixture
+def upstream(db, monkeypatch):
+    """非流式 Dify 智能体，记录上游收到的请求数"""
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", False)
+    db.add(AiAgentConfig(agent_id=1, agent_name="dify", platform_type="dify",
+                         base_url="http://dify.local/v1", api_key="key", agent_key="", is_stream=False))
+    db.commit()
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"answer": "回答", "conversation_id": "conv-1"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(chat_service, "get_client", lambda platform: client)
+    yield calls
+    asyncio.run(client.aclose())
+
+
+def submit(db, user_id, session_id=None):
+    dto = JobSubmitDTO(agent_id="1", sessionId=session_id, messages=[Message(role="user", content="问题")])
+    return create_job(db, dto, user_id, 1).id
+
+
+def job(db, job_id):
+    db.expire_all()
+    return db.get(ChatJob, job_id)
+
+
+def test_only_one_claim_wins(db, make_session):
+    make_session(1, 1)
+    job_id = submit(db, 1)
+    assert _claim(db, job_id)
+    assert not _claim(db, job_id)
+    assert job(db, job_id).attempts == 1
+
+
+def test_stale_running_jobs_are_recovered(db, make_session):
+    make_session(1, 1)
+    stale, fresh = submit(db, 1), submit(db, 1)
+    assert _claim(db, stale) and _claim(db, fresh)
+    db.query(ChatJob).filter(ChatJob.id == stale).update(
+        {"started_at": datetime.now() - STALE_RUNNING_AFTER - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    assert reset_stale_jobs(db) == [stale]
+    assert (job(db, stale).status, job(db, fresh).status) == ("pending", "running")
+    assert _claim(db, stale)
+    assert job(db, stale).attempts == 2
+
+
+def test_execute_job_saves_messages_and_result(db, make_session, upstream):
+    make_session(1, 1)
+    job_id = submit(db, 1)
+    asyncio.run(execute_job(job_id))
+
+    finished = job(db, job_id)
+    assert (finished.status, finished.result) == ("succeeded", "回答")
+    assert finished.request["userMessageSaved"]
+    session_id = finished.request["sessionId"]
+    assert [(m.message_type, m.content) for m in db.query(ChatMessage).filter(
+        ChatMessage.session_id == session_id).order_by(ChatMessage.id)] == [("user", "问题"), ("assistant", "回答")]
+
+    # 已完成的任务不会被再次执行
+    asyncio.run(execute_job(job_id))
+    assert len(upstream) == 1
+
+
+def test_rerun_does_not_save_user_message_twice(db, make_session, upstream):
+    make_session(1, 1)
+    job_id = submit(db, 1, session_id=1)
+    # 模拟上一次执行已保存用户消息后进程退出
+    db.query(ChatJob).filter(ChatJob.id == job_id).update(
+        {"request": dict(job(db, job_id).request, userMessageSaved=True)}
+    )
+    db.commit()
+    asyncio.run(execute_job(job_id))
+    assert [m.message_type for m in db.query(ChatMessage).order_by(ChatMessage.id)] == ["assistant"]
+
+
+def test_job_on_other_users_session_fails(db, make_session, upstream):
+    make_session(1, 1)
+    make_session(2, 2)
+    job_id = submit(db, 2, session_id=1)
+    asyncio.run(execute_job(job_id))
+
+    assert (job(db, job_id).status, job(db, job_id).error) == ("failed", "会话不存在")
+    assert upstream == []
+    assert db.query(ChatMessage).count() == 0
+
+
+def test_recover_resubmits_pending_jobs(db, make_session, monkeypatch):
+    make_session(1, 1)
+    pending = submit(db, 1)
+    submitted = []
+    monkeypatch.setattr(job_service.job_executor, "submit", submitted.append)
+    assert asyncio.run(job_service.job_executor.recover()) == 1
+    assert submitted == [pending]
@@ -0,0 +1,26 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import metrics
+from app.core.config import settings
+
+
+def get_metrics(headers=None):
+    app = FastAPI()
+    app.include_router(metrics.router)
+    return TestClient(app).get("/metrics", headers=headers or {})
+
+
+def test_metrics_require_admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert get_metrics().status_code == 403
+    assert get_metrics({"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = get_metrics({"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "chat_active_streams" in response.text
+
+
+def test_metrics_disabled_without_admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert get_metrics().status_code == 404
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware
+from app.schemas.chat import GetChatListParams
+from app.services.chat_service import ChatService
+from app.services.write_behind import save_messages
+
+LONG = "很长的回答" * 100
+
+
+def seed(db, make_session):
+    make_session(1, 1)
+    save_messages(db, [
+        {"session_id": 1, "user_id": 1, "agent_id": 1, "message_type": message_type,
+         "content": content, "tokens_used": 7, "created_at": datetime(2026, 1, 1, 9, minute)}
+        for minute, (message_type, content) in enumerate([("user", "短问题"), ("assistant", LONG)])
+    ])
+
+
+def chat_list(db, **kwargs):
+    return ChatService(db).get_chat_list(GetChatListParams(sessionId=1, pageNum=1, pageSize=10), 1, **kwargs)
+
+
+def test_fields_select_requested_keys(db, make_session):
+    seed(db, make_session)
+    full = chat_list(db).data["list"]
+    projected = chat_list(db, fields="role, tokens,role").data["list"]
+    assert projected == [{"role": item["role"], "tokens": item["tokens"]} for item in full]
+    assert [item["tokens"] for item in projected] == [7, 0]
+
+
+def test_preview_length_truncates_content(db, make_session):
+    seed(db, make_session)
+    items = chat_list(db, fields="content", preview_length=5).data["list"]
+    assert items == [{"content": LONG[:5], "truncated": True}, {"content": "短问题"}]
+    # 只给 previewLength 时返回全部字段
+    assert set(chat_list(db, preview_length=5).data["list"][1]) == {
+        "message_id", "session_id", "user_id", "agent_id", "role", "content", "content_type", "tokens", "created_at",
+    }
+
+
+def test_invalid_projection_parameters(db, make_session):
+    seed(db, make_session)
+    assert chat_list(db, fields="password").code == 400
+    assert chat_list(db, preview_length=0).code == 400
+
+
+def compression_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/big")
+    async def big():
+        return {"content": LONG}
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/sse")
+    async def sse():
+        async def events():
+            yield "data: " + LONG + "\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_large_json_is_compressed():
+    client = compression_client()
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(LONG.encode("utf-8"))
+    assert response.json() == {"content": LONG}
+
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "gzip;q=0"}).headers
+
+
+def test_small_and_streaming_responses_pass_through():
+    client = compression_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    response = client.get("/sse", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "data: " + LONG + "\n\n"
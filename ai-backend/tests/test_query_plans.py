@@ -0,0 +1,53 @@
+"""
+热点查询执行计划回归测试（与 check_query_plans.py --strict 相同的判定）
+
+SQLite 用例基于模型建表（conftest 的 db 夹具），总会运行；
+MySQL 用例需要已执行 `alembic upgrade head` 的库（DB_HOST 等配置），连接不上时跳过。
+"""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.db.database import get_engine
+from check_query_plans import HOT_TABLES, explain_mysql, explain_sqlite, hot_queries
+
+
+@pytest.fixture(scope="module")
+def mysql_db():
+    try:
+        connection = get_engine().connect()
+    except (ImportError, SQLAlchemyError) as e:
+        pytest.skip(f"未配置可用的 MySQL: {e}")
+    if connection.dialect.name != "mysql":
+        connection.close()
+        pytest.skip("执行计划测试只在 MySQL 上运行")
+
+    db = Session(bind=connection)
+    db.execute(text("ANALYZE TABLE " + ", ".join(sorted(HOT_TABLES))))
+    yield db
+    db.close()
+    connection.close()
+
+
+def test_hot_queries_never_scan_hot_tables(mysql_db):
+    dialect = mysql_db.get_bind().dialect
+    problems = {}
+    for name, statement in hot_queries(mysql_db):
+        sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        found = explain_mysql(mysql_db, sql)
+        if found:
+            problems[name] = [message for _, message in found]
+    assert not problems, f"热点表出现全表扫描（type=ALL）: {problems}"
+
+
+def test_hot_queries_use_indexes_on_sqlite(db):
+    dialect = db.get_bind().dialect
+    problems = {}
+    for name, statement in hot_queries(db):
+        sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        found = explain_sqlite(db, sql)
+        if found:
+            problems[name] = [message for _, message in found]
+    assert not problems, f"热点表出现全表扫描: {problems}"
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.core import ratelimit
+from app.core.ratelimit import MemoryBucketStore, RateLimitPolicy, build_policies
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    return clock
+
+
+def take(store, key, policy, times=1):
+    return [asyncio.run(store.take(key, policy))[0] for _ in range(times)]
+
+
+def test_burst_up_to_capacity_then_reject(clock):
+    store = MemoryBucketStore()
+    policy = RateLimitPolicy("chat", "user", 3, 60)
+    assert take(store, "chat:u:a", policy, 4) == [True, True, True, False]
+
+
+def test_bucket_refills_at_rate(clock):
+    store = MemoryBucketStore()
+    policy = RateLimitPolicy("chat", "user", 3, 60)
+    take(store, "chat:u:a", policy, 3)
+
+    clock.now += 19
+    assert take(store, "chat:u:a", policy) == [False]
+    clock.now += 1
+    assert take(store, "chat:u:a", policy, 2) == [True, False]
+
+    # 补满后不超过容量
+    clock.now += 3600
+    assert take(store, "chat:u:a", policy, 4) == [True, True, True, False]
+
+
+def test_identities_have_separate_buckets(clock):
+    store = MemoryBucketStore()
+    policy = RateLimitPolicy("login", "ip", 1, 60)
+    assert take(store, "login:ip:1.1.1.1", policy, 2) == [True, False]
+    assert take(store, "login:ip:2.2.2.2", policy) == [True]
+
+
+def test_remaining_tokens(clock):
+    store = MemoryBucketStore()
+    policy = RateLimitPolicy("chat", "user", 3, 60)
+    assert asyncio.run(store.take("k", policy)) == (True, 2)
+
+
+def test_sweep_drops_refilled_buckets(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "SWEEP_EVERY", 3)
+    store = MemoryBucketStore()
+    policy = RateLimitPolicy("chat", "user", 3, 60)
+    take(store, "a", policy)
+    clock.now += 3600
+    take(store, "b", policy)
+    take(store, "c", policy)
+    assert set(store._buckets) == {"b", "c"}
+
+
+def test_policy_overrides():
+    policies = build_policies("chat=60/30, login=20/60")
+    assert (policies["chat"].capacity, policies["chat"].period, policies["chat"].scope) == (60, 30, "user")
+    assert policies["login"].capacity == 20
+    assert policies["batch"].capacity == ratelimit.DEFAULT_POLICIES["batch"][1]
+
+
+@pytest.mark.parametrize("overrides", ["unknown=1/1", "chat=10", "chat=0/60", "chat=a/b"])
+def test_invalid_policy_overrides(overrides):
+    with pytest.raises(ValueError):
+        build_policies(overrides)
@@ -0,0 +1,83 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from app.core import revocation, security
+from app.core.revocation import BloomFilter, TokenRevocationList
+from app.core.security import ALGORITHM, SECRET_KEY, SecurityManager
+from app.models.user import SysTokenRevocation
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    keys = [uuid.uuid4().hex for _ in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+    # 按容量填满时误判率约为 BLOOM_ERROR_RATE
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 100
+
+
+def test_revoked_until_purged():
+    revoked = TokenRevocationList()
+    now = time.time()
+    revoked.add("expired", now - 1)
+    revoked.add("live", now + 3600)
+    assert revoked.is_revoked("expired") and revoked.is_revoked("live")
+    assert not revoked.is_revoked("other")
+    assert not revoked.is_revoked(None)
+
+    assert revoked.purge(now) == 1
+    assert not revoked.is_revoked("expired")
+    assert revoked.is_revoked("live")
+    assert len(revoked) == 1
+
+
+def test_filter_is_rebuilt_beyond_capacity(monkeypatch):
+    monkeypatch.setattr(revocation, "BLOOM_CAPACITY", 4)
+    revoked = TokenRevocationList()
+    jtis = [f"jti-{i}" for i in range(10)]
+    for jti in jtis:
+        revoked.add(jti, time.time() + 3600)
+    assert revoked._bloom.capacity >= len(jtis)
+    assert all(revoked.is_revoked(jti) for jti in jtis)
+
+
+def test_revoke_persists_and_loads_in_other_process(db):
+    expires = time.time() + 3600
+    revoked = TokenRevocationList()
+    assert revoked.revoke(db, "jti-1", 1, expires)
+    # 重复登出不报错
+    assert revoked.revoke(db, "jti-1", 1, expires)
+    assert not revoked.revoke(db, None, 1, expires)
+    assert revoked.is_revoked("jti-1")
+
+    db.add(SysTokenRevocation(jti="jti-old", user_id=1, expires_at=datetime.now() - timedelta(hours=1)))
+    db.commit()
+
+    other = TokenRevocationList()
+    assert asyncio.run(other.load()) == 1
+    assert other.is_revoked("jti-1")
+    assert not other.is_revoked("jti-old")
+
+
+def test_revoked_token_is_rejected(db, make_session, monkeypatch):
+    make_session(1, 1)
+    revoked = TokenRevocationList()
+    monkeypatch.setattr(security, "revocation_list", revoked)
+    token = SecurityManager.create_access_token({"sub": "user1"})
+    assert SecurityManager.get_current_user(db, token).user_id == 1
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    revoked.revoke(db, payload["jti"], 1, payload["exp"])
+    with pytest.raises(HTTPException):
+        SecurityManager.get_current_user(db, token)
+    # 其他令牌不受影响
+    assert SecurityManager.get_current_user(db, SecurityManager.create_access_token({"sub": "user1"}))
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from app.models.chat import ChatMessage, ChatMessageArchive, ChatSession
+from app.services.session_counters import PREVIEW_LENGTH, reconcile_session_counters
+from app.services.write_behind import save_messages
+
+
+def message(session_id, content, created_at):
+    return {
+        "session_id": session_id, "user_id": 1, "agent_id": 1,
+        "message_type": "user", "content": content, "created_at": created_at,
+    }
+
+
+def counters(db, session_id):
+    db.expire_all()
+    session = db.get(ChatSession, session_id)
+    return session.message_count, session.last_message_at, session.last_message_preview
+
+
+def test_counters_follow_writes_out_of_order(db, make_session):
+    make_session(1, 1)
+    save_messages(db, [message(1, "b", datetime(2026, 1, 1, 10)), message(1, "a" * 300, datetime(2026, 1, 1, 9))])
+    # 较早的消息晚提交时不覆盖最后一条消息
+    save_messages(db, [message(1, "old", datetime(2026, 1, 1, 8))])
+    assert counters(db, 1) == (3, datetime(2026, 1, 1, 10), "b")
+
+    save_messages(db, [message(1, "c" * 300, datetime(2026, 1, 1, 11))])
+    assert counters(db, 1) == (4, datetime(2026, 1, 1, 11), "c" * PREVIEW_LENGTH)
+
+
+def test_reconcile_fixes_drifted_sessions(db, make_session):
+    make_session(1, 1)
+    make_session(1, 2)
+    make_session(1, 3)
+    save_messages(db, [message(1, "a", datetime(2026, 1, 1, 9)), message(1, "b", datetime(2026, 1, 1, 10))])
+    save_messages(db, [message(2, "x", datetime(2026, 1, 1, 9))])
+
+    # 绕过写入路径删除消息、篡改计数
+    last = db.query(ChatMessage.id).filter(ChatMessage.session_id == 1).order_by(ChatMessage.id.desc()).first()
+    db.query(ChatMessage).filter(ChatMessage.id == last.id).delete()
+    db.query(ChatSession).filter(ChatSession.id == 2).update({"message_count": 42})
+    db.commit()
+
+    assert reconcile_session_counters(db, batch_size=2) == 2
+    assert counters(db, 1) == (1, datetime(2026, 1, 1, 9), "a")
+    assert counters(db, 2) == (1, datetime(2026, 1, 1, 9), "x")
+    assert counters(db, 3) == (0, None, None)
+    assert reconcile_session_counters(db) == 0
+
+
+def test_reconcile_counts_archived_messages(db, make_session):
+    make_session(1, 1)
+    db.add(ChatMessageArchive(
+        session_id=1, segment="seg", offset=0, length=1, codec="zlib", message_count=5,
+        last_message_at=datetime(2026, 1, 1, 8), last_message_preview="archived",
+        archived_at=datetime(2026, 2, 1),
+    ))
+    db.commit()
+    assert reconcile_session_counters(db) == 1
+    assert counters(db, 1) == (5, datetime(2026, 1, 1, 8), "archived")
+
+    # 归档后又有新消息：计数相加，最后一条取热表中的消息
+    save_messages(db, [message(1, "new", datetime(2026, 3, 1))])
+    db.query(ChatSession).filter(ChatSession.id == 1).update({"message_count": 0})
+    db.commit()
+    assert reconcile_session_counters(db) == 1
+    assert counters(db, 1) == (6, datetime(2026, 3, 1), "new")
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from app.models.statistics import ChatStatistics
+from app.services.stats_service import StatsService, latency_bucket
+from app.services.write_behind import save_messages
+
+DAY = datetime(2026, 10, 18, 9, 0)
+
+
+def message(session_id, user_id, agent_id, message_type, processing_time=None, tokens_used=None, created_at=DAY):
+    return {
+        "session_id": session_id,
+        "user_id": user_id,
+        "agent_id": agent_id,
+        "message_type": message_type,
+        "content": "x",
+        "processing_time": processing_time,
+        "tokens_used": tokens_used,
+        "created_at": created_at,
+    }
+
+
+def seed(db, make_session):
+    make_session(1, 1, agent_id=7)
+    make_session(2, 2, agent_id=7)
+    save_messages(db, [
+        message(1, 1, 7, "user"),
+        message(1, 1, 7, "assistant", processing_time=800, tokens_used=10),
+    ])
+    # 第二批累加到已存在的汇总行上
+    save_messages(db, [
+        message(1, 1, 7, "user"),
+        message(1, 1, 7, "assistant", processing_time=40000, tokens_used=5),
+        message(2, 2, 7, "assistant", processing_time=300, created_at=datetime(2026, 10, 19, 9, 0)),
+    ])
+
+
+def test_latency_bucket_bounds():
+    assert [latency_bucket(t) for t in (0, 500, 501, 60000, 60001)] == [0, 0, 1, 6, 7]
+
+
+def test_writes_accumulate_per_scope(db, make_session):
+    seed(db, make_session)
+    stats = StatsService(db)
+
+    user = stats.get_stats("user", "1")
+    assert (user["messageCount"], user["userMessageCount"], user["assistantMessageCount"]) == (4, 2, 2)
+    assert user["tokensUsed"] == 15
+    assert user["avgProcessingTime"] == (800 + 40000) / 2
+    assert user["latencyHistogram"]["le_1000"] == 1
+    assert user["latencyHistogram"]["le_60000"] == 1
+
+    assert stats.get_stats("agent", "7")["messageCount"] == 5
+    assert stats.get_stats("day", "2026-10-18")["messageCount"] == 4
+    assert stats.get_stats("day", "2026-10-19")["latencyHistogram"]["le_500"] == 1
+    assert stats.get_stats("user", "99")["messageCount"] == 0
+
+
+def test_backfill_matches_incremental_rollups(db, make_session):
+    seed(db, make_session)
+    stats = StatsService(db)
+    scopes = [("user", "1"), ("user", "2"), ("agent", "7"), ("day", "2026-10-18"), ("day", "2026-10-19")]
+    incremental = {key: stats.get_stats(*key) for key in scopes}
+
+    db.query(ChatStatistics).update({"message_count": 0, "tokens_used": 0})
+    db.commit()
+    assert stats.backfill(batch_size=2) == len(scopes)
+    db.expire_all()
+
+    for key in scopes:
+        rebuilt = stats.get_stats(*key)
+        incremental[key].pop("updatedAt")
+        rebuilt.pop("updatedAt")
+        assert rebuilt == incremental[key], key
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+from app.models.chat import ChatSession
+from app.services.sync_service import current_seq, get_changes
+from app.services.write_behind import save_messages
+
+
+def write(db, session_id, user_id, *contents):
+    """一次写入（一个事务，分配一个序号）"""
+    save_messages(db, [
+        {
+            "session_id": session_id,
+            "user_id": user_id,
+            "agent_id": 1,
+            "message_type": "user",
+            "content": content,
+            "created_at": datetime.now(),
+        }
+        for content in contents
+    ])
+
+
+def contents(changes):
+    return [message["content"] for message in changes["messages"]]
+
+
+def test_changes_since_watermark(db, make_session):
+    make_session(1, 1)
+    write(db, 1, 1, "a", "b")
+    watermark = current_seq(db, 1)
+
+    changes = get_changes(db, 1, 0)
+    assert contents(changes) == ["a", "b"]
+    assert [session["session_id"] for session in changes["sessions"]] == [1]
+    assert changes["next"] == watermark and not changes["hasMore"]
+
+    unchanged = get_changes(db, 1, watermark)
+    assert unchanged["next"] == watermark
+    assert unchanged["sessions"] == [] and unchanged["messages"] == []
+
+
+def test_paging_cuts_at_seq_boundary(db, make_session):
+    make_session(1, 1)
+    write(db, 1, 1, "a", "b")
+    write(db, 1, 1, "c", "d")
+    write(db, 1, 1, "e")
+
+    # limit 落在第二次写入中间：同一序号的消息不拆开
+    first = get_changes(db, 1, 0, limit=3)
+    assert contents(first) == ["a", "b"]
+    assert first["hasMore"]
+
+    second = get_changes(db, 1, first["next"], limit=3)
+    assert contents(second) == ["c", "d", "e"]
+    assert not second["hasMore"]
+
+
+def test_single_write_larger_than_limit_is_returned_whole(db, make_session):
+    make_session(1, 1)
+    write(db, 1, 1, "a", "b", "c")
+
+    changes = get_changes(db, 1, 0, limit=2)
+    assert contents(changes) == ["a", "b", "c"]
+    assert not changes["hasMore"]
+
+
+def test_deleted_session_is_reported_as_tombstone(db, make_session):
+    make_session(1, 1)
+    make_session(1, 2)
+    write(db, 1, 1, "a")
+    since = current_seq(db, 1)
+
+    db.delete(db.get(ChatSession, 1))
+    db.commit()
+
+    changes = get_changes(db, 1, since)
+    assert changes["deletedSessionIds"] == [1]
+    assert changes["sessions"] == [] and changes["messages"] == []
+    assert changes["next"] == current_seq(db, 1)
+
+
+def test_changes_are_scoped_to_user(db, make_session):
+    make_session(1, 1)
+    make_session(2, 2)
+    write(db, 2, 2, "other")
+
+    changes = get_changes(db, 1, 0)
+    assert [session["session_id"] for session in changes["sessions"]] == [1]
+    assert changes["messages"] == []
+
+
+def test_since_ahead_of_server_requests_reset(db, make_session):
+    make_session(1, 1)
+    watermark = current_seq(db, 1)
+
+    changes = get_changes(db, 1, watermark + 10)
+    assert changes["reset"]
+    assert changes["next"] == watermark
@@ -0,0 +1,36 @@
+import json
+
+from app.core import tracing
+from app.core.tracing import JsonLinesExporter, Span, Trace, new_trace
+
+SAMPLED = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def test_inbound_sampled_flag_is_not_trusted_by_default(monkeypatch):
+    monkeypatch.setattr(tracing.settings, "TRACE_SAMPLE_RATE", 0.0)
+    trace = new_trace(SAMPLED)
+    # 沿用 trace-id，但不因客户端的标记而采样
+    assert trace.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert not trace.sampled
+
+
+def test_inbound_sampled_flag_when_trusted(monkeypatch):
+    monkeypatch.setattr(tracing.settings, "TRACE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(tracing.settings, "TRACE_TRUST_INBOUND_SAMPLED", True)
+    assert new_trace(SAMPLED).sampled
+
+
+def test_exporter_rotates_at_max_bytes(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonLinesExporter(str(path), max_bytes=1000)
+    trace = Trace("t" * 32, True)
+    for i in range(30):
+        item = Span(trace, f"span-{i}", None, {})
+        item.finish()
+        exporter.export([item])
+    exporter.close()
+
+    assert (tmp_path / "traces.jsonl.1").stat().st_size >= 1000
+    assert not path.exists() or path.stat().st_size < 1000
+    lines = (tmp_path / "traces.jsonl.1").read_text(encoding="utf-8").splitlines()
+    assert all(json.loads(line)["trace_id"] == trace.trace_id for line in lines)
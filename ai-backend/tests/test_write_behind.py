@@ -0,0 +1,182 @@
+import asyncio
+import os
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from app.db.database import SessionLocal
+from app.models.chat import ChatMessage, ChatSession
+from app.services import write_behind
+from app.services.write_behind import MessageWriteBehind, _decode_row, _encode_row, flush_pending
+
+
+def message(session_id, user_id, content):
+    return {
+        "session_id": session_id,
+        "user_id": user_id,
+        "agent_id": 1,
+        "message_type": "user",
+        "content": content,
+        "created_at": datetime.now(),
+    }
+
+
+def stored(db):
+    db.expire_all()
+    return [
+        (row.session_id, row.content)
+        for row in db.query(ChatMessage).order_by(ChatMessage.id)
+    ]
+
+
+def unreachable_database():
+    return create_engine("sqlite:////nonexistent/dir/chat.db")
+
+
+def test_flush_writes_rows_and_removes_journal(db, make_session, tmp_path):
+    make_session(1, 1)
+    writer = MessageWriteBehind(str(tmp_path / "journal"), 60, 500)
+
+    async def scenario():
+        writer.start()
+        writer.submit([message(1, 1, "a"), message(1, 1, "b")])
+        assert writer.has_pending(1)
+        assert writer.flush() == 2
+        assert not writer.has_pending(1)
+        assert writer.flush() == 0
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert stored(db) == [(1, "a"), (1, "b")]
+    assert db.get(ChatSession, 1).message_count == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_flush_keeps_rows_for_retry(engine, db, make_session, tmp_path):
+    make_session(1, 1)
+    writer = MessageWriteBehind(str(tmp_path / "journal"), 60, 500)
+
+    async def scenario():
+        writer.start()
+        writer.submit([message(1, 1, "a")])
+        SessionLocal.configure(bind=unreachable_database())
+        with pytest.raises(OperationalError):
+            writer.flush()
+        assert writer.has_pending(1)
+        assert any(name.endswith(".flushing") for name in os.listdir(tmp_path))
+
+        SessionLocal.configure(bind=engine)
+        assert writer.flush() == 1
+        assert not any(name.endswith(".flushing") for name in os.listdir(tmp_path))
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert stored(db) == [(1, "a")]
+
+
+def test_poison_session_goes_to_dead_letter(db, make_session, tmp_path):
+    make_session(1, 1)
+    make_session(2, 2)
+    journal = str(tmp_path / "journal")
+    writer = MessageWriteBehind(journal, 60, 500)
+
+    async def scenario():
+        writer.start()
+        writer.submit([message(1, 1, "a"), message(2, 2, "b"), message(1, 1, "c")])
+        # 消息落库前会话被删除，外键约束使会话 1 的消息无法写入
+        db.delete(db.get(ChatSession, 1))
+        db.commit()
+        assert writer.flush() == 3
+        assert not writer.has_pending(1)
+        assert not writer.has_pending(2)
+        assert writer.flush() == 0
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert stored(db) == [(2, "b")]
+    with open(f"{journal}.deadletter", encoding="utf-8") as f:
+        assert [_decode_row(line)["content"] for line in f] == ["a", "c"]
+
+
+def test_start_adopts_orphan_journal_without_database(engine, db, make_session, tmp_path):
+    make_session(1, 1)
+    journal = str(tmp_path / "journal")
+    orphan = f"{journal}.99999"
+    open(f"{orphan}.lock", "w").close()
+    with open(f"{orphan}.1.flushing", "w", encoding="utf-8") as f:
+        f.write(_encode_row(message(1, 1, "a")) + "\n")
+    with open(f"{orphan}.log", "w", encoding="utf-8") as f:
+        # 崩溃时留下的半行会被跳过
+        f.write(_encode_row(message(1, 1, "b")) + "\n" + '{"session_id": 1, "cont')
+    writer = MessageWriteBehind(journal, 60, 500)
+
+    async def scenario():
+        SessionLocal.configure(bind=unreachable_database())
+        writer.start()
+        assert writer.has_pending(1)
+        assert not any(name.startswith("journal.99999") for name in os.listdir(tmp_path))
+
+        SessionLocal.configure(bind=engine)
+        assert writer.flush() == 2
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert stored(db) == [(1, "a"), (1, "b")]
+
+
+def test_restart_in_same_process_adopts_previous_journal(engine, db, make_session, tmp_path):
+    # 容器重启后进程号相同（PID 1）：崩溃前未落库的日志仍要被接管
+    make_session(1, 1)
+    journal = str(tmp_path / "journal")
+    crashed = MessageWriteBehind(journal, 60, 500)
+
+    async def crash():
+        crashed.start()
+        crashed.submit([message(1, 1, "lost-A")])
+        crashed._segments.append(crashed._rotate_journal())
+        crashed.submit([message(1, 1, "lost-B")])
+        crashed._task.cancel()
+        crashed._journal.close()
+        crashed._lock_file.close()
+
+    writer = MessageWriteBehind(journal, 60, 500)
+
+    async def restart():
+        writer.start()
+        writer.submit([message(1, 1, "new")])
+        assert writer.flush() == 3
+        await writer.stop()
+
+    asyncio.run(crash())
+    asyncio.run(restart())
+    assert stored(db) == [(1, "lost-A"), (1, "lost-B"), (1, "new")]
+    assert os.listdir(tmp_path) == []
+
+
+def test_flush_pending_runs_off_the_event_loop(db, make_session, tmp_path, monkeypatch):
+    make_session(1, 1)
+    writer = MessageWriteBehind(str(tmp_path / "journal"), 60, 500)
+    monkeypatch.setattr(write_behind, "message_writer", writer)
+    flush_threads = []
+
+    def flush():
+        flush_threads.append(threading.get_ident())
+        return MessageWriteBehind.flush(writer)
+
+    monkeypatch.setattr(writer, "flush", flush)
+
+    async def scenario():
+        writer.start()
+        writer.submit([message(1, 1, "a")])
+        await flush_pending(2)
+        assert flush_threads == []
+        await flush_pending(1)
+        assert flush_threads and flush_threads[0] != threading.get_ident()
+        assert not writer.has_pending(1)
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert stored(db) == [(1, "a")]